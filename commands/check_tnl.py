@@ -15,7 +15,8 @@ class CmdCheckTNL(Command):
     key = "CheckTNL"
 
     def func(self):
-        exp_needed = self.caller.db.tnl - self.caller.db.exp
+        state = self.caller.state
+        exp_needed = state.tnl - state.exp
         if exp_needed > 0:
             self.caller.msg(f"|035You need |500{exp_needed}|035 more experience points to level up.")
         else:
@@ -6,6 +6,7 @@ Commands describe the input the account can do to the game.
 """
 
 from evennia.commands.command import Command as BaseCommand
+from typeclasses.characterstate import CharacterState
 
 # from evennia import default_cmds
 
@@ -38,6 +39,14 @@ class Command(BaseCommand):
             text = f"|035{text}"
         super().msg(text=text, **kwargs)
 
+    def at_post_cmd(self):
+        """
+        Writes back the character state changed by the command in one write.
+        """
+        state = getattr(self.caller, "state", None)
+        if isinstance(state, CharacterState):
+            state.flush()
+
 
 # -------------------------------------------------------------
 #
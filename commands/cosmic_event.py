@@ -0,0 +1,65 @@
+from commands.command import Command
+from commands.util_tools import docstring_prefix
+from world.world_space.events import EVENT_TYPES, get_event_scheduler
+
+
+@docstring_prefix("|035")
+class CmdCosmicEvent(Command):
+    """
+    CosmicEvent command:
+
+    Usage:
+      CosmicEvent
+      CosmicEvent |w<kind> [<seconds>]|035
+      CosmicEvent |wcancel <id>|035
+
+    Lists the waiting cosmic events, schedules an event into the sector you are in,
+    firing in <seconds> or right away, or cancels a waiting event.
+    Kinds are storm and singularity_shower.
+    """
+
+    key = "CosmicEvent"
+    locks = "cmd:perm(Developer)"
+
+    def parse(self):
+        args = self.args.strip().split()
+        self.action = args[0] if args else None
+        self.number = int(args[1]) if len(args) == 2 and args[1].isdigit() else None
+        self.valid = len(args) <= 1 or self.number is not None
+
+    def func(self):
+        scheduler = get_event_scheduler()
+        if scheduler is None:
+            self.caller.msg("|500The cosmic event scheduler is not running.|n")
+            return
+        if not self.valid:
+            self.caller.msg("Usage: CosmicEvent [<kind> [<seconds>] | cancel <id>]")
+            return
+
+        if self.action is None:
+            events = [event for event in scheduler.pending() if not event["ending"]]
+            if not events:
+                self.caller.msg("No cosmic events are waiting.")
+                return
+            lines = ["|035Waiting cosmic events:"]
+            for event in events:
+                lines.append(f"  |050#{event['id']} |055{event['kind']}|035 in sector |050{event['coords']}")
+            self.caller.msg("\n".join(lines))
+            return
+
+        if self.action == "cancel":
+            if self.number is not None and scheduler.cancel(self.number):
+                self.caller.msg(f"|035Cosmic event |050#{self.number}|035 cancelled.")
+            else:
+                self.caller.msg("|500No such cosmic event is waiting.|n")
+            return
+
+        location = self.caller.location
+        if self.action not in EVENT_TYPES:
+            self.caller.msg(f"|500Unknown cosmic event. Kinds are {', '.join(EVENT_TYPES)}.|n")
+            return
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        event_id = scheduler.schedule(self.action, location, self.number or 0)
+        self.caller.msg(f"|035Cosmic event |050#{event_id} |055{self.action}|035 scheduled for this sector.")
@@ -22,6 +22,8 @@ from commands.level_up import CmdLevelUp
 from commands.give_exp import CmdAdjustEXP
 from commands.resource_updown import CmdResourceUpDown
 from commands.check_tnl import CmdCheckTNL
+from commands.cosmic_event import CmdCosmicEvent
+from commands.space_edit import CmdSpaceEdit
 
 from commands.gamble import CmdGamble # TESTING
 class CharacterCmdSet(default_cmds.CharacterCmdSet):
@@ -41,7 +43,7 @@ class CharacterCmdSet(default_cmds.CharacterCmdSet):
         #
         # any commands you add below will overload the default ones.
         #
-        commands = [CmdStats, CmdResources, CmdLevelUp, CmdCheckTNL, CmdResourceUpDown, CmdAdjustEXP, CmdGamble]
+        commands = [CmdStats, CmdResources, CmdLevelUp, CmdCheckTNL, CmdResourceUpDown, CmdAdjustEXP, CmdCosmicEvent, CmdSpaceEdit, CmdGamble]
         for i in range(len(commands)):
             self.add(commands[i])
 
@@ -41,25 +41,28 @@ class CmdGamble(Command):
         
         self.set_mult = 2
         if self.valid:
-            matter = self.caller.db.resources["Matter"]
+            state = self.caller.state
+            matter = state.resources["Matter"]
             if self.give_or_take():
-                big_payout = True if randint(0,self.caller.db.level) == 1 else False # Bias towards newer players
+                big_payout = True if randint(0,state.level) == 1 else False # Bias towards newer players
                 if not big_payout: payout = int(self.wager * self.payout_multiplier)
                 else:  payout = int(self.wager * self.payout_multiplier) * randint(2,randint(5,20))
                 matter += payout
+                state.change_resources({"Matter": payout}, reason="Gamble payout")
                 if not big_payout: self.caller.msg(f"|500C|050O|005N|505G|550R|555A|055T|345S|522!|255!|314!|035 You have won a payout of |050{payout}|035 and now have {matter} |055Matter")
                 if big_payout: self.caller.msg(f"|500C|050O|005N|505G|550R|555A|055T|345S|522!|255!|314!|035 You have won with a |500BIG|035 payout of |050{payout}|035 and now have {matter} |055Matter")
             else:
                 matter -= self.wager
+                state.change_resources({"Matter": -self.wager}, reason="Gamble wager")
                 self.caller.msg(f"|500Better luck next time!/n You have lost {self.wager} |055Matter and now have {matter}")
-            self.caller.db.resources["Matter"] = matter 
         else:
             self.caller.msg("|035Please contact |505Orbital Odds|035 Customer Service or try |wGamble <Value>|035 with a real number input.  Unfortunately at this time we are not accepting imaginary numbers nor theoretical ones.  For all complaints, please contact |505Orbital Odds|035 Terminal Customer Complaints.")
     
     
     def give_or_take(self) -> bool:
-        player_luck = self.caller.db.stats["luck"]
-        player_level = self.caller.db.level
+        state = self.caller.state
+        player_luck = state.stats["luck"]
+        player_level = state.level
 
         # Set 'p' to 100 times the player's level, capped at 10000
         p = min(100 * player_level, 100000)
@@ -70,8 +73,8 @@ class CmdGamble(Command):
         house = randint(1, p)
 
         # Calculate the player's chance based on level, failed rolls, and luck
-        player = (player_level * self.caller.db.failed_rolls + player_luck 
-                if player_level <= self.caller.db.max_level and self.wager > 1000 
+        player = (player_level * state.failed_rolls + player_luck 
+                if player_level <= state.max_level and self.wager > 1000 
                 else player_level + player_luck)
 
         self.caller.msg(f"player is {player} and {house} is house.")
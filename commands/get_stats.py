@@ -55,11 +55,12 @@ class CmdStats(Command):
 
 
     def display_stats(self):
-        stats = self.caller.get_stats()
-        stat_points = self.caller.db.stat_points
-        exp = self.caller.get_exp()
-        tnl = self.caller.get_tnl()
-        level = self.caller.db.level
+        state = self.caller.state
+        stats = state.stats
+        stat_points = state.stat_points
+        exp = state.exp
+        tnl = state.tnl
+        level = state.level
         
         # Initialize the EvTable for stats with an additional column for cost
         stats_table = EvTable("|005Neurological Traits", "|252Value", "|252Cost", border="cells", header_line_char="=")
@@ -90,10 +91,11 @@ class CmdStats(Command):
           
            
     def stat_up(self, stat, value):
-        current_stats = self.caller.db.stats
-        stat_points = self.caller.db.stat_points
-        resources = self.caller.db.resources
-        level = self.caller.db.level
+        state = self.caller.state
+        current_stats = state.stats
+        stat_points = state.stat_points
+        resources = state.resources
+        level = state.level
         # Check if the stat is a valid stat name
         if stat not in current_stats:
             self.caller.msg(f"{stat}|035 is not a valid stat.")
@@ -110,27 +112,21 @@ class CmdStats(Command):
         elif stat_points < value:
             self.caller.msg(f"Not enough stat points to increase |050{stat}|035 by |500{value}|035. You are short by |050{value - stat_points}|035 stat points.")
         else:
-            # If there are enough resources, proceed to increase the stat
-            for i in range(value):
-                cost = self.calculate_cost(stat, current_stats[stat] + i, level)
-                current_stats[stat] += 1
-                stat_points -= 1
-                resources['Matter'] -= cost
-
-            # Update the caller's resources and stat points
-            self.caller.db.stats = current_stats
-            self.caller.db.stat_points = stat_points
-            self.caller.db.resources = resources
+            # If there are enough resources, raise the stat and spend the Matter and stat points in one transaction
+            if not state.transaction({stat: value, "stat_points": -value, "Matter": -total_cost}, reason=f"Stats {stat} {value}"):
+                self.caller.msg(f"Your Matter or stat points changed while raising |050{stat}|035, nothing was spent. Please try again.")
+                return
 
             # Inform the caller of the new stat value, total cost, and remaining resources
-            self.caller.msg(f"Raised |050{stat}|035 to: |050{current_stats[stat]}|035, costing |050{total_cost}|035 matter. |035(|500{value}|035 stat points used, |050{stat_points}|035 left, |050{resources['Matter']}|035 matter remaining.)")
+            self.caller.msg(f"Raised |050{stat}|035 to: |050{state.stats[stat]}|035, costing |050{total_cost}|035 matter. |035(|500{value}|035 stat points used, |050{state.stat_points}|035 left, |050{state.resources['Matter']}|035 matter remaining.)")
 
 
     def reset_stats(self):
         default_stat_value = 1
-        refunded_points = sum(value - default_stat_value for value in self.caller.db.stats.values())
+        state = self.caller.state
+        refunded_points = sum(value - default_stat_value for value in state.stats.values())
 
-        self.caller.db.stats = {stat: default_stat_value for stat in self.caller.db.stats}
-        self.caller.db.stat_points += refunded_points
+        state.stats = {stat: default_stat_value for stat in state.stats}
+        state.stat_points += refunded_points
 
-        self.caller.msg(f"All stats have been reset. |050{self.caller.db.stat_points} |035points available.")
+        self.caller.msg(f"All stats have been reset. |050{state.stat_points} |035points available.")
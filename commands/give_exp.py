@@ -1,6 +1,7 @@
 from commands.command import Command
 from evennia.utils.search import search_object
 from commands.util_tools import docstring_prefix
+from typeclasses.characterstate import CharacterState
 
 
 @docstring_prefix("|035")
@@ -47,19 +48,26 @@ class CmdAdjustEXP(Command):
         if not self.valid:
             return  # Exit if parsing failed
 
-        # Check if the player object has a 'db' attribute and 'exp' attribute within it
-        if not hasattr(self.player, 'db') or not hasattr(self.player.db, 'exp'):
+        # Check if the player object has a character state holding EXP
+        state = getattr(self.player, 'state', None)
+        if not isinstance(state, CharacterState):
             self.caller.msg(f"|500{self.player.key} does not have any EXP attribute to adjust.|n")
             return
 
         # Adjust the player's EXP
         if self.action == 'add':
-            self.player.db.exp += self.amount
+            state.exp += self.amount
             change = "increased"
             color = "|050"
         else:
-            self.player.db.exp -= self.amount
+            state.exp -= self.amount
             change = "decreased"
             color = "|500"
+        # The player's state is only flushed after the command when they are the caller,
+        # and a player nobody is playing keeps no state loaded
+        if self.player.sessions.count():
+            state.flush()
+        else:
+            state.unload()
 
         self.caller.msg(f"|050{self.player.key}'s|n EXP {change} by {color}{self.amount}.")
@@ -9,20 +9,30 @@ class CmdLevelUp(Command):
 
   |025Usage:
     |035Levelup
+    Levelup |w<levels>|035
 
-  Increases your |025level|035 if your |025experience|035 meets the next |025level|035 requirements |025(TNL)|035.
+  Increases your |025level|035 as far as your |025experience|035 meets the next |025level|035 requirements |025(TNL)|035,
+  or by at most |w<levels>|035 levels.
   """
 
   key = "Level up"
 
+  def parse(self):
+    args = self.args.strip()
+    self.max_levels = int(args) if args.isdigit() and int(args) > 0 else None
+
   def func(self):
     pos_tnl = "|050"
     neg_tnl = "|500"
-    if self.caller.db.exp >= self.caller.db.tnl: 
-        resources_gained = self.caller.level_up()
-        self.caller.msg(f"|035Level increased to: |055{self.caller.db.level}|035, "
-                        f"{pos_tnl}{self.caller.db.tnl}|035 EXP remaining to next level. "
+    state = self.caller.state
+    old_level = state.level
+    if state.level >= state.max_level:
+        self.caller.msg(f"|035You are already at the highest level, |055{state.max_level}|035.")
+    elif state.exp >= state.tnl: 
+        resources_gained = self.caller.level_up(self.max_levels)
+        self.caller.msg(f"|035Level increased to: |055{state.level}|035 (|050+{state.level - old_level}|035), "
+                        f"{pos_tnl}{state.tnl}|035 EXP remaining to next level. "
                         f"|055Resources gained: {resources_gained}")
     else:
-        self.caller.msg(f"|035Not enough experience to level up. |025Current: |050{self.caller.db.exp} "
-                        f"|025Needed:{neg_tnl}{self.caller.db.tnl - self.caller.db.exp}")
\ No newline at end of file
+        self.caller.msg(f"|035Not enough experience to level up. |025Current: |050{state.exp} "
+                        f"|025Needed:{neg_tnl}{state.tnl - state.exp}")
@@ -2,6 +2,7 @@ from commands.command import Command
 from evennia.utils import utils
 from evennia.utils.search import search_object
 from commands.util_tools import docstring_prefix
+from typeclasses.characterstate import CharacterState
 
 
 @docstring_prefix("|035")
@@ -51,16 +52,23 @@ class CmdResourceUpDown(Command):
         character = self.character[0]  # search_object returns a list
 
         # Check if the resource exists in the character's resources
-        if not hasattr(character.db, 'resources') or self.resource not in character.db.resources:
+        state = getattr(character, 'state', None)
+        if not isinstance(state, CharacterState) or self.resource not in state.resources:
             self.caller.msg(f"|rThe resource {self.resource} does not exist for {character.key}.|n")
             return
 
         # Perform the action
         if self.action == "up":
-            character.resource_up(self.resource, self.value)
+            character.resource_up(self.resource, self.value, reason=f"ResourceManager by {self.caller.key}")
             self.caller.msg(f"|gIncreased {self.resource} by {self.value} for {character.key}.|n")
         elif self.action == "down":
-            character.resource_down(self.resource, self.value)
+            character.resource_down(self.resource, self.value, reason=f"ResourceManager by {self.caller.key}")
             self.caller.msg(f"|rDecreased {self.resource} by {self.value} for {character.key}.|n")
         else:
-            self.caller.msg("|rInvalid action. Use 'up' or 'down'.|n")
\ No newline at end of file
+            self.caller.msg("|rInvalid action. Use 'up' or 'down'.|n")
+        # The character's state is only flushed after the command when they are the caller,
+        # and a character nobody is playing keeps no state loaded
+        if character.sessions.count():
+            state.flush()
+        else:
+            state.unload()
\ No newline at end of file
@@ -0,0 +1,43 @@
+from commands.command import Command
+from commands.util_tools import docstring_prefix
+from world.world_space.spacegrid import DEFAULT_GLYPH
+
+
+@docstring_prefix("|035")
+class CmdSpaceEdit(Command):
+    """
+    SpaceEdit command:
+
+    Usage:
+      SpaceEdit |w<row> <col> <element>|035
+
+    Changes a cell of the space map of the sector you are in. An element is a glyph
+    with an optional colour code in front, like |w||500*|035, and |wo|035 clears the cell.
+    Changes are kept as overrides of the sector until its map is rerolled.
+    """
+
+    key = "SpaceEdit"
+    locks = "cmd:perm(Developer)"
+
+    def parse(self):
+        args = self.args.strip().split()
+        self.valid = len(args) == 3 and args[0].isdigit() and args[1].isdigit() and len(args[2]) in (1, 5)
+        if self.valid:
+            self.row, self.col, self.element = int(args[0]), int(args[1]), args[2]
+
+    def func(self):
+        location = self.caller.location
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        if not self.valid:
+            self.caller.msg("Usage: SpaceEdit <row> <col> <element>")
+            return
+        if not location.change_map([(self.row, self.col, self.element)]):
+            self.caller.msg("|500That cell is outside the sector.|n")
+            return
+        what = "cleared" if self.element[-1] == DEFAULT_GLYPH else f"set to {self.element}|035"
+        self.caller.msg(f"|035Cell |050{self.row}, {self.col}|035 {what}.")
+        for obj in location.contents:
+            if obj.has_account:
+                location.send_map_update(obj, redraw=obj is self.caller)
@@ -17,6 +17,8 @@ at_server_cold_stop()
 
 """
 from evennia.server.sessionhandler import SESSIONS
+from world.world_space.galaxy import get_galaxy
+from typeclasses.characterstate import flush_all
 
 def at_server_init():
     """
@@ -57,6 +59,8 @@ def at_server_reload_stop():
     
     # Announce to all connected sessions
     SESSIONS.announce_all(message)
+    get_galaxy().flush()
+    flush_all()
 
 
 def at_server_cold_start():
@@ -72,4 +76,5 @@ def at_server_cold_stop():
     This is called only when the server goes down due to a shutdown or
     reset.
     """
-    pass
+    get_galaxy().flush()
+    flush_all()
@@ -26,6 +26,23 @@ as argument.
 
 """
 
+
+def spacemap(session, *args, **kwargs):
+    """
+    Lets a client ask for space map updates as deltas. Clients that send
+    `spacemap {"delta": true}` (`Spacemap {"delta": true}` over GMCP) receive
+    the cells that changed after a Space Search as a `spacemap_delta` message
+    instead of a full redraw of the map.
+
+    Args:
+        session (Session): The active Session.
+        args (list): Ignored.
+        kwargs (dict): `delta` turns delta updates on or off.
+
+    """
+    session.protocol_flags["SPACEMAP_DELTA"] = bool(kwargs.get("delta", True))
+
+
 # def oob_echo(session, *args, **kwargs):
 #     """
 #     Example echo function. Echoes args, kwargs sent to it.
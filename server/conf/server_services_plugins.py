@@ -13,6 +13,8 @@ can be added to it). The function should not return anything. Plugin
 services are started last in the Server startup process.
 
 """
+from django.conf import settings
+from world.world_space.pregen import make_service
 
 
 def start_plugin_services(server):
@@ -21,4 +23,7 @@ def start_plugin_services(server):
 
     server - a reference to the main server application.
     """
-    pass
+    # Pre-generate sector maps in worker processes, off the reactor thread
+    if settings.SPACE_PREGEN_WORKERS > 0:
+        service = make_service(settings.SPACE_PREGEN_WORKERS, settings.SPACE_PREGEN_BUFFER)
+        service.setServiceParent(getattr(server, "services", server))
@@ -24,6 +24,8 @@ put secret game- or server-specific settings in secret_settings.py.
 
 """
 
+import os
+
 # Use the defaults from Evennia unless explicitly overridden
 from evennia.settings_default import *
 
@@ -38,6 +40,101 @@ SERVER_HOSTNAME="localhost"
 TIME_ZONE="Etc/GMT-7"
 USE_TZ=True
 
+# Character progression and resources are kept in their own table
+INSTALLED_APPS += ["world.progression.apps.ProgressionConfig"]
+# Record every change to the resources of characters in the ledger
+# entries table, with the reason it was made.
+PROGRESSION_AUDIT_LOG = False
+
+######################################################################
+# StarGazer space settings
+######################################################################
+
+# Seed of the procedural galaxy. Every sector map is derived from this
+# seed, the sector coordinates and the sector epoch, so changing it
+# gives every sector a different map.
+SPACE_GALAXY_SEED = 20240601
+
+# Size of a sector of space in cells. Generation, searching and
+# rendering all use these, up to 65535 cells per side.
+SPACE_SECTOR_WIDTH = 75
+SPACE_SECTOR_HEIGHT = 25
+
+# Seconds between saves of the space maps changed in memory. A crash
+# loses at most this much space map history.
+SPACEMAP_FLUSH_INTERVAL = 60
+
+# The galaxy keeps sector state in chunks of SPACE_GALAXY_CHUNK_SIZE
+# sectors per side, loaded when players come near. Chunks nobody has
+# visited for SPACE_GALAXY_IDLE_TIME seconds are saved and unloaded,
+# and the loaded chunks are kept within SPACE_GALAXY_MEMORY_BUDGET bytes.
+SPACE_GALAXY_CHUNK_SIZE = 8
+SPACE_GALAXY_IDLE_TIME = 600
+SPACE_GALAXY_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# File the galaxy saves sector state and maps in, one fixed size record
+# per sector with SPACE_SECTOR_STORE_OVERRIDES override slots. Set it to
+# None to keep sector state in Attributes instead.
+SPACE_SECTOR_STORE = os.path.join(GAME_DIR, "server", "sectors.dat")
+SPACE_SECTOR_STORE_OVERRIDES = 64
+
+# Worker processes that generate the next map of each sector ahead of
+# time, and the most maps kept waiting. Set the workers to 0 to build
+# every map on the reactor thread when it is needed.
+SPACE_PREGEN_WORKERS = 2
+SPACE_PREGEN_BUFFER = 256
+
+# Seconds in which Space Searches in one room share a single map
+# regeneration. Every searcher still gets their own result and loot.
+SPACE_SEARCH_TICK = 1.0
+
+# Most Space Searches one Autopilot run may fly, and the seconds a
+# character has to wait between runs.
+SPACE_AUTOPILOT_MAX_SEARCHES = 100
+SPACE_AUTOPILOT_COOLDOWN = 30
+
+# Ships parked in space keep searching while their pilot is away, one
+# search every SPACE_OFFLINE_SEARCH_INTERVAL seconds for each point of
+# piloting. At most SPACE_OFFLINE_MAX_TIME seconds away are paid out.
+SPACE_OFFLINE_SEARCH_INTERVAL = 60
+SPACE_OFFLINE_MAX_TIME = 24 * 60 * 60
+
+# Average seconds between the storms and singularity showers the cosmic
+# event scheduler sends into random sectors by itself. Set it to 0 to
+# only have the events scheduled with the CosmicEvent command.
+SPACE_COSMIC_EVENT_INTERVAL = 30 * 60
+
+# Rendered space map frames shared between players looking at the same
+# part of the same map. Frames are dropped once there are more than
+# SPACE_FRAME_CACHE_SIZE of them or their text grows past
+# SPACE_FRAME_CACHE_CHARS characters, least recently used first, and
+# after SPACE_FRAME_CACHE_MAX_AGE seconds.
+SPACE_FRAME_CACHE_SIZE = 256
+SPACE_FRAME_CACHE_CHARS = 4000000
+SPACE_FRAME_CACHE_MAX_AGE = 300
+
+# Seconds between writes of character progression and resources changed
+# outside of commands. Changes made by commands are written when the
+# command ends.
+CHARACTER_STATE_FLUSH_INTERVAL = 30
+
+GLOBAL_SCRIPTS = {
+    "spacemap_flusher": {
+        "typeclass": "world.world_space.mapstore.SpaceMapFlusher",
+        "interval": SPACEMAP_FLUSH_INTERVAL,
+        "persistent": True,
+    },
+    "character_state_flusher": {
+        "typeclass": "typeclasses.characterstate.CharacterStateFlusher",
+        "interval": CHARACTER_STATE_FLUSH_INTERVAL,
+        "persistent": True,
+    },
+    "cosmic_events": {
+        "typeclass": "world.world_space.events.CosmicEventScheduler",
+        "persistent": True,
+    },
+}
+
 ######################################################################
 # Settings given in secret_settings.py override those in this file.
 ######################################################################
@@ -1,7 +1,15 @@
+from time import time
+from django.conf import settings
 from django.utils.translation import gettext as _
 from evennia.objects.objects import DefaultCharacter
+from evennia.utils.utils import lazy_property
 from typeclasses.objects import ObjectParent
-import random
+from typeclasses.characterstate import CharacterState
+from world.progression.models import CharacterProgression
+from world.progression.leveling import levels_reachable, pity_floor, tnl_for
+from world.progression.loot import LEVEL_LOOT, TROVE_MATTER
+from world.world_space.accrual import offline_searches, sample_offline_gains
+from world.world_space.geometry import get_geometry
 
 class Character(ObjectParent, DefaultCharacter):
     """
@@ -17,8 +25,16 @@ class Character(ObjectParent, DefaultCharacter):
                                  Echoes "Account has disconnected" to the room.
     - at_pre_puppet: Just before Account re-connects, retrieves the character's prelogout_location Attribute and moves it back on the grid.
     - at_post_puppet: Echoes "AccountName has entered the game" to the room.
+                      Pays out what the ship mined while it was parked in space.
+
+    The progression and resources of the character are kept in self.state, a CharacterState
+    loaded when the character is puppeted and written back after every command.
     """
 
+    @lazy_property
+    def state(self):
+        return CharacterState(self)
+
     def at_post_puppet(self, **kwargs):
         """
         Called just after the Account re-connects to this Character. Sends a welcome message to the Account
@@ -34,49 +50,97 @@ class Character(ObjectParent, DefaultCharacter):
             )
 
         self.location.for_contents(message, exclude=[self], from_obj=self)
-        y = self.db.y
-        failed_rolls = self.db.failed_rolls
-        x = self.db.x
-        if failed_rolls == 0:
-            y = 1
-        else:
-            if (1 * failed_rolls * 1000) <= x * 0.9:
-                y = 1 * failed_rolls * 1000
-            else:
-                y = x * 0.9
-        self.db.y = y
+        state = self.state
+        state.load()
+        state.y = self.pity_floor()
+        self.accrue_offline()
+        state.flush()
+
+    def at_post_unpuppet(self, account=None, session=None, **kwargs):
+        """
+        Called just after the Account disconnects from this Character. Remembers when the
+        ship was parked and whether it was left in space, where it keeps mining.
+        """
+        location = self.location
+        self.db.parked_at = time()
+        self.db.parked_in_space = bool(location and location.tags.has("is_in_space", category="space_room"))
+        self.state.unload()
+        super().at_post_unpuppet(account=account, session=session, **kwargs)
+
+    def pity_floor(self):
+        """
+        Returns the lowest number the loot rolls of a level up can draw, raised by failed
+        rolls to at most 90% of the highest.
+
+        Returns:
+            int: The floor of the loot rolls.
+        """
+        state = self.state
+        return pity_floor(state.failed_rolls, state.max_random_number_in_drop_generation)
+
+    def accrue_offline(self):
+        """
+        Pays out the Space Searches the ship flew while it was parked in space. The searches
+        are counted from the time away and the piloting stat, and their matter and
+        singularities are drawn in one step rather than flown one by one.
+        """
+        parked_at = self.db.parked_at
+        parked_in_space = self.db.parked_in_space
+        self.db.parked_at = None
+        self.db.parked_in_space = False
+        if not parked_at or not parked_in_space:
+            return
+        elapsed = time() - parked_at
+        searches = offline_searches(
+            elapsed,
+            self.state.stats["piloting"],
+            settings.SPACE_OFFLINE_SEARCH_INTERVAL,
+            settings.SPACE_OFFLINE_MAX_TIME,
+        )
+        if not searches:
+            return
+        matter, singularities = sample_offline_gains(searches, get_geometry().cells())
+
+        self.state.change_resources({"Matter": matter, "Singularities": singularities}, reason="Offline mining")
+
+        lines = [f"|035While you were away your ship flew |050{searches}|035 searches and gathered |050{matter}|035 Matter."]
+        if singularities:
+            lines.append(f"|055It stumbled upon |050{singularities}|055 strange and magnificent space fields.\n|500+{singularities} Gravity Wells")
+        self.msg("\n".join(lines))
 
     def at_object_creation(self):
         """
-        Called when the Character object is first created. Initializes the character's stats, experience, level,
-        resources, and other related attributes.
+        Called when the Character object is first created. Initializes the character's stats, experience, level
+        and resources in its CharacterProgression row, and its other attributes.
         """
-        self.db.stats = {
-            "piloting": 1,
-            "fortitude": 1,
-            "intelligence": 1,
-            "luck": 1
-        }
-        self.db.stat_points = 0
-        self.db.level = 1
-        self.db.exp = 0
-        self.db.tnl = (self.db.level * 2) * self.db.level * 100
-        self.db.max_level = 10000
+        level = 1
+        CharacterProgression.objects.update_or_create(
+            character_id=self.id,
+            defaults={
+                # Stats
+                "piloting": 1,
+                "fortitude": 1,
+                "intelligence": 1,
+                "luck": 1,
+                "stat_points": 0,
+                "level": level,
+                "exp": 0,
+                "tnl": (level * 2) * level * 100,
+                "max_level": 10000,
+                "failed_rolls": 0,
+                "max_random_number_in_drop_generation": 1000000,
+                # Matter is the base currency.  Antimatter is uncommon currency.  
+                # Singularities are rare currency.  Gravity Wells are extremely rare.
+                # Dimensions are dropped with a 1 in 1 billion drop rate.
+                "matter": 0,
+                "anti_matter": 0,
+                "singularities": 0,
+                "gravity_wells": 0,
+                "dimensions": 0,
+            },
+        )
         self.db.has_home = False
         self.db.home_location = None
-        self.db.failed_rolls = 0
-        self.db.max_random_number_in_drop_generation = 1000000
-        # Matter is the base currency.  Antimatter is uncommon currency.  
-        # Singularities are rare currency.  Gravity Wells are extremely rare.
-        # Dimensions are dropped with a 1 in 1 billion drop rate.
-        
-        self.db.resources = {
-            "Matter": 0,
-            "Anti-matter": 0,
-            "Singularities": 0,
-            "Gravity Wells": 0,
-            "Dimensions": 0
-        }
 
     def get_stats(self):
         """
@@ -85,7 +149,7 @@ class Character(ObjectParent, DefaultCharacter):
         Returns:
             dict: A dictionary containing the character's main stats.
         """
-        return self.db.stats
+        return self.state.stats
 
     def get_exp(self):
         """
@@ -94,7 +158,7 @@ class Character(ObjectParent, DefaultCharacter):
         Returns:
             int: The character's experience points.
         """
-        return self.db.exp
+        return self.state.exp
 
     def get_tnl(self):
         """
@@ -103,7 +167,7 @@ class Character(ObjectParent, DefaultCharacter):
         Returns:
             int: Experience points required to level up.
         """
-        return self.db.tnl
+        return self.state.tnl
 
     def get_resources(self):
         """
@@ -112,90 +176,62 @@ class Character(ObjectParent, DefaultCharacter):
         Returns:
             dict: A dictionary containing the character's resources.
         """
-        return self.db.resources
+        return self.state.resources
 
-    def level_up(self):
+    def level_up(self, max_levels=None):
         """
-        Perform a level up on the character if experience points are sufficient. 
-        Adjusts level, experience points, and other attributes accordingly. 
-        Generates a string detailing the resources gained during the level up.
+        Perform every level up the character's experience points pay for, or up to max_levels of them.
+        The reachable level is solved for in closed form, the loot of every level gained is rolled together from LEVEL_LOOT,
+        and level, experience points, stat points and resources are changed in one write.
+        Generates a string detailing the resources gained during the level ups.
+
+        Args:
+            max_levels (int, optional): Gain at most this many levels.
 
         Returns:
-            str: A string detailing the resources gained during the level up.
+            str: A string detailing the resources gained during the level ups.
         """
-        exp = self.db.exp
-        tnl = self.db.tnl
-        level = self.db.level
-        max_level = self.db.max_level
-        resources_gained = {}
-        failed_rolls = self.db.failed_rolls
-        x = self.db.max_random_number_in_drop_generation
-        y = self.db.y = 1
-        if failed_rolls == 0:
-            y = 1
-        else:
-            if (1 * failed_rolls * 1000) <= x * 0.9:
-                y = 1 * failed_rolls * 1000
-            else:
-                y = x * 0.9
-        self.db.y = y
-
-        if exp >= tnl:
-            # Increase level by 1, or set to max level if already at max
-            new_level = min(level + 1, max_level)
-            self.db.level = new_level
-
-            # Reset experience to the amount over the required tnl
-            self.db.exp = exp - tnl
-
-            # Calculate the new tnl for the next level
-            self.db.tnl = (new_level * 2) * new_level * 100
-
-            # Add stat points for leveling up
-            self.db.stat_points += 1
-            
-            # Increase matter by a random number between 1 and level
-            matter_increase = random.randint(1, self.db.level)
-            self.resource_up("Matter", matter_increase)
-            resources_gained["|555Matter"] = f"{matter_increase}"
-
-            # Generate two random numbers between Y and X where Y is calculated based on failed rolls
-            rand_num1 = random.randint(y, x)
-            rand_num2 = random.randint(y, x)
-            
-            if rand_num1 != rand_num2:
-                raise_pity_roll = 1 > (random.randint(0, 2))
-                if raise_pity_roll:
-                    self.db.failed_rolls += 1
-                    self.msg("|wThe |055goddess of pity|w has shown their light to you, you feel you'll find |rgreater treasures|w moving forward.")
-                    
-            # If both numbers are within 1% of each other, increase singularity by 1 and reset failed_rolls
-            if abs(rand_num1 - rand_num2) <= (x * 0.01):
-                self.resource_up("Singularities", 1)
-                resources_gained["|500Singularities"] = "|5001|n"
-                self.db.failed_rolls = 0
-                self.msg("|055Pity's |wlight has paid off, and her |050luck |wleaves you.")
-            
-            # If they are within 75% of each other, increase anti-matter
-            if abs(rand_num1 - rand_num2) <= (x * 0.75):
-                anti_matter_increase = random.randint(1, self.db.level)
-                self.resource_up("Anti-matter", anti_matter_increase)
-                resources_gained["|505Anti-matter"] = f"|005{anti_matter_increase}|n"
-
-            # If they are within 25% of each other, increase gravity well by 1
-            if abs(rand_num1 - rand_num2) <= (x * 0.25):
-                self.resource_up("Gravity Wells", 1)
-                resources_gained["|111Gravity Wells"] = "|5501|n"
-
-            # If they are within 1.5% of each other, increase matter significantly
-            if abs(rand_num1 - rand_num2) <= (x * 0.015):
-                min_amount = 1000000
-                max_amount = 1000000000
-                matter_massive_increase = random.randint(min_amount, self.db.level * max_amount)
-                self.resource_up("Matter", matter_massive_increase)
-                treasure_or_stash = "|505TREASURE TROVE|035" if matter_massive_increase >= (max_amount * 0.5) else "|303legendary stash|035"
-                resources_gained["|555Matter"] += f" and a {treasure_or_stash} of |500{matter_massive_increase}|035 Matter|500!|050!|005!|n"
-                
+        state = self.state
+        level = state.level
+        x = state.max_random_number_in_drop_generation
+        levels, exp_left = levels_reachable(level, state.exp, state.tnl, state.max_level, max_levels)
+        if not levels:
+            return ""
+
+        loot = LEVEL_LOOT.roll(level + 1, levels, state.failed_rolls, x)
+        new_level = level + levels
+        state.level = new_level
+        state.exp = exp_left
+        state.tnl = tnl_for(new_level)
+        state.stat_points += levels
+        state.failed_rolls = loot.failed_rolls
+        state.y = self.pity_floor()
+        state.change_resources(loot.resources, reason="Level up")
+
+        if loot.raised:
+            self.msg("|wThe |055goddess of pity|w has shown their light to you, you feel you'll find |rgreater treasures|w moving forward.")
+        if loot.resets:
+            self.msg("|055Pity's |wlight has paid off, and her |050luck |wleaves you.")
+
+        resources = loot.resources
+        resources_gained = {"|555Matter": f"{resources.get('Matter', 0)}"}
+        if resources.get("Singularities"):
+            resources_gained["|500Singularities"] = f"|500{resources['Singularities']}|n"
+        if resources.get("Anti-matter"):
+            resources_gained["|505Anti-matter"] = f"|005{resources['Anti-matter']}|n"
+        if resources.get("Gravity Wells"):
+            resources_gained["|111Gravity Wells"] = f"|550{resources['Gravity Wells']}|n"
+        massive = [amount for _, tier, _, amount in loot.found if tier == "massive_matter"]
+        troves = sum(1 for amount in massive if amount >= TROVE_MATTER)
+        stashes = len(massive) - troves
+        finds = []
+        if troves:
+            finds.append(f"|500{troves}|035 |505TREASURE TROVE{'S' if troves > 1 else ''}|035")
+        if stashes:
+            finds.append(f"|500{stashes}|035 |303legendary stash{'es' if stashes > 1 else ''}|035")
+        if finds:
+            resources_gained["|555Matter"] += f" including {' and '.join(finds)} of Matter|500!|050!|005!|n"
+
         # Format the resources gained into a string to return
         resources_gained_str = ', '.join(f"{resource} |050{amount}" for resource, amount in resources_gained.items())
         return resources_gained_str
@@ -205,11 +241,12 @@ class Character(ObjectParent, DefaultCharacter):
         Perform a down level on the character if experience points fall below the tnl for the previous level.
         Adjusts level accordingly.
         """
-        exp = self.db.exp
-        level = self.db.level
+        state = self.state
+        exp = state.exp
+        level = state.level
         if exp > ((level - 1) * 2) * (level - 1) * 100:
             level -= 1 if level > 1 else 1
-        self.db.level = level
+        state.level = level
 
     def stat_up(self, stat, inc_value):
         """
@@ -220,8 +257,9 @@ class Character(ObjectParent, DefaultCharacter):
             stat (str): The name of the stat to increase.
             inc_value (int): The increment value by which to increase the stat.
         """
-        current_stats = self.db.stats
-        stat_points = self.db.stat_points
+        state = self.state
+        current_stats = state.stats
+        stat_points = state.stat_points
 
         if stat in current_stats:
             if stat_points >= inc_value:
@@ -234,27 +272,27 @@ class Character(ObjectParent, DefaultCharacter):
             # Invalid stat name
             print(f"|035Invalid stat: |500{stat}")
 
-        self.db.stats = current_stats
-        self.db.stat_points = stat_points
+        state.mark_dirty("stats")
+        state.stat_points = stat_points
 
-    def resource_up(self, resource, resource_inc_value):
+    def resource_up(self, resource, resource_inc_value, reason=""):
         """
         Increases a specified resource by the increment value.
 
         Args:
             resource (str): The name of the resource to increase.
             resource_inc_value (int): The increment value by which to increase the resource.
+            reason (str, optional): Why the resource changed, for the audit log.
         """
-        if resource in self.db.resources:
-            self.db.resources[resource] += abs(resource_inc_value)
+        self.state.change_resources({resource: abs(resource_inc_value)}, reason=reason)
 
-    def resource_down(self, resource, resource_dec_value):
+    def resource_down(self, resource, resource_dec_value, reason=""):
         """
         Decreases a specified resource by the decrement value.
 
         Args:
             resource (str): The name of the resource to decrease.
             resource_dec_value (int): The decrement value by which to decrease the resource.
+            reason (str, optional): Why the resource changed, for the audit log.
         """
-        if resource in self.db.resources:
-            self.db.resources[resource] -= abs(resource_dec_value)
+        self.state.change_resources({resource: -abs(resource_dec_value)}, reason=reason)
@@ -0,0 +1,249 @@
+"""
+Write-behind state of characters.
+
+The progression and resources of a character are read once, when it is puppeted, from
+its CharacterProgression row into a CharacterState with typed fields. Commands read and
+change the fields in memory, changes mark their fields dirty, and the dirty fields are
+written back together in one UPDATE at the end of every command, by the
+CharacterStateFlusher script on an interval and when the character is unpuppeted or the
+server stops. A command costs at most one write however many fields it touches.
+
+Resources are only ever written back as the amounts they changed by, through the
+ResourceLedger, so gains and spending never overwrite changes made to the same row
+meanwhile. Changes
+that have to succeed or fail together, like spending Matter and stat points on a stat,
+are made with CharacterState.transaction.
+
+Code changing another character than the caller of a command has to flush that
+character's state itself, see CmdAdjustEXP.
+"""
+from evennia.utils import logger
+from typeclasses.scripts import Script
+from world.progression.models import CharacterProgression, RESOURCE_COLUMNS, STAT_COLUMNS
+from world.progression.ledger import get_ledger
+
+# Typed fields of the state
+FIELDS = {
+    "level": int,
+    "exp": int,
+    "tnl": int,
+    "max_level": int,
+    "stat_points": int,
+    "failed_rolls": int,
+    "max_random_number_in_drop_generation": int,
+    "y": int,
+    "stats": dict,
+    "resources": dict,
+}
+
+_LOADED = set()  # States with fields that may still need writing back
+
+
+def _field(name, kind):
+    def getter(self):
+        if not self.loaded:
+            self.load()
+        return self.values[name]
+
+    def setter(self, value):
+        if not self.loaded:
+            self.load()
+        value = kind(value)
+        if self.values[name] != value:
+            self.values[name] = value
+            self.dirty.add(name)
+
+    return property(getter, setter, doc=f"{kind.__name__}: The {name.replace('_', ' ')} of the character.")
+
+
+class CharacterState():
+    """
+    The progression and resources of a character, kept in memory and written back on flush.
+
+    Setting a field marks it dirty. The stats are a dict, changes made to it in place
+    have to be marked with mark_dirty, which writes the whole dict back. Resources are
+    changed with change_resources, which only writes back the amounts they changed by.
+    Setting the resources dict is turned into the amounts each resource changes by.
+
+    Attributes:
+        obj (Character): The character the state belongs to.
+        values (dict): The loaded field values.
+        dirty (set): Names of the fields changed since the last flush.
+        pending (list): (resource, amount, reason) changes not yet written back.
+        loaded (bool): Whether the fields have been read.
+
+    Methods:
+        load(): Reads every field, writing back pending changes first.
+        flush(): Writes the dirty fields back in one write.
+        unload(): Flushes and forgets the fields.
+        mark_dirty(*names): Marks fields changed in place, other than the resources.
+        change_resources(changes, reason): Adds amounts to several resources.
+        transaction(changes, reason): Changes several counters at once in the database.
+    """
+    level = _field("level", int)
+    exp = _field("exp", int)
+    tnl = _field("tnl", int)
+    max_level = _field("max_level", int)
+    stat_points = _field("stat_points", int)
+    failed_rolls = _field("failed_rolls", int)
+    max_random_number_in_drop_generation = _field("max_random_number_in_drop_generation", int)
+    y = _field("y", int)
+    stats = _field("stats", dict)
+    resources = _field("resources", dict)
+
+    @resources.setter
+    def resources(self, value):
+        current = self.resources
+        self.change_resources({resource: int(amount) - current.get(resource, 0) for resource, amount in value.items()})
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.values = {}
+        self.dirty = set()
+        self.pending = []
+        self.loaded = False
+
+    def load(self):
+        """
+        Reads every field from the character, writing back pending changes first.
+        """
+        self.flush()
+        self._reload()
+        self.loaded = True
+        _LOADED.add(self)
+
+    def flush(self):
+        """
+        Writes the dirty fields and pending resource changes back to the character in one
+        write. If the character has no row to write to, they are kept for the next flush.
+
+        Returns:
+            bool: Whether anything was written.
+        """
+        if not self.dirty and not self.pending:
+            return False
+        values = CharacterProgression.state_columns({name: self.values[name] for name in self.dirty})
+        if not get_ledger().apply(self.obj.id, self.pending, values=values, allow_negative=True):
+            logger.log_err(f"Could not write back the state of {self.obj} (#{self.obj.id}), keeping it for the next flush.")
+            return False
+        self.dirty.clear()
+        self.pending = []
+        return True
+
+    def unload(self):
+        """
+        Flushes the state and forgets the fields, they are read again when next used. A
+        state that could not be written back stays loaded for the next flush.
+        """
+        self.flush()
+        if self.dirty or self.pending:
+            return
+        self.values = {}
+        self.loaded = False
+        _LOADED.discard(self)
+
+    def mark_dirty(self, *names):
+        """
+        Marks fields that were changed in place, like the stats dict. The resources are
+        never written back whole, change them with change_resources instead.
+
+        Args:
+            *names (str): Names of the changed fields.
+
+        Raises:
+            KeyError: If there is no such field.
+            ValueError: If the resources are marked.
+        """
+        for name in names:
+            if name not in FIELDS:
+                raise KeyError(f"Unknown character state field {name!r}.")
+            if name == "resources":
+                raise ValueError("Resources are written back as changes, use change_resources.")
+            self.dirty.add(name)
+
+    def change_resources(self, changes, reason=""):
+        """
+        Adds amounts to several resources. Resources the character does not have are ignored.
+
+        Args:
+            changes (dict): Amount to add to each resource, negative to take away.
+            reason (str, optional): Why the resources changed, for the audit log.
+        """
+        resources = self.resources
+        for resource, amount in changes.items():
+            if resource in resources and amount:
+                resources[resource] += amount
+                self.pending.append((resource, amount, reason))
+
+    def transaction(self, changes, reason=""):
+        """
+        Changes several counters at once in the database, and in memory if that worked.
+        The changes are made together or not at all, and not at all if they would take a
+        counter below zero. Pending changes are written back first.
+
+        Args:
+            changes (dict): Amount to add to each counter, a resource like "Matter", a stat
+                            like "luck" or an integer field like "stat_points".
+            reason (str, optional): Why the counters changed, for the audit log.
+
+        Returns:
+            bool: Whether the changes were made.
+        """
+        if not self.loaded:
+            self.load()
+        self.flush()
+        if not get_ledger().transaction(self.obj.id, changes, reason=reason):
+            # Something else changed the row meanwhile, read it again
+            self._reload()
+            return False
+        for name, amount in changes.items():
+            if name in RESOURCE_COLUMNS:
+                self.values["resources"][name] += amount
+            elif name in STAT_COLUMNS:
+                self.values["stats"][name] += amount
+            else:
+                self.values[name] += amount
+        return True
+
+    def _reload(self):
+        values = self._read()
+        # Changes not written back yet stay on top of what was read
+        for name in self.dirty:
+            values[name] = self.values[name]
+        for resource, amount, _ in self.pending:
+            values["resources"][resource] += amount
+        self.values = values
+
+    def _read(self):
+        values = CharacterProgression.for_character(self.obj).state_values()
+        return {name: kind(values[name]) for name, kind in FIELDS.items()}
+
+
+def flush_all():
+    """
+    Writes back the dirty fields of every loaded character state.
+
+    Returns:
+        int: The number of states written.
+    """
+    return sum(state.flush() for state in list(_LOADED))
+
+
+class CharacterStateFlusher(Script):
+    """
+    A global script that writes back the changed character states on an interval, set by
+    CHARACTER_STATE_FLUSH_INTERVAL in the settings, for changes made outside of commands.
+    """
+    def at_script_creation(self):
+        """
+        Called when the script is first created. Marks the script as persistent.
+        """
+        self.key = "character_state_flusher"
+        self.desc = "Saves changed character states to the database."
+        self.persistent = True
+
+    def at_repeat(self):
+        """
+        Called at each interval. Writes back every changed character state.
+        """
+        flush_all()
@@ -1,2 +1,59 @@
 from typeclasses.exits import Exit
+from world.world_space.navigation import get_sector_graph, is_nav_node
 
+
+class SpaceExit(Exit):
+    """
+    Exits between sectors of space. They keep the sector graph used for navigation up to
+    date as they are created, moved, relinked and deleted.
+    """
+
+    def at_object_creation(self):
+        """
+        Called when the exit is first created. Adds the exit to the sector graph.
+        """
+        super().at_object_creation()
+        self.update_sector_graph()
+
+    def at_post_move(self, source_location, move_type="move", **kwargs):
+        """
+        Called after the exit is moved to another room. Moves the exit in the sector graph.
+        """
+        super().at_post_move(source_location, move_type=move_type, **kwargs)
+        self.update_sector_graph()
+
+    def at_object_delete(self):
+        """
+        Called before the exit is deleted. Removes the exit from the sector graph.
+
+        Returns:
+            bool: Whether the exit may be deleted.
+        """
+        graph = get_sector_graph(build=False)
+        if graph is not None:
+            graph.remove_exit(self.id)
+        return super().at_object_delete()
+
+    def relink(self, destination):
+        """
+        Points the exit at another room and updates the sector graph. Use this rather than
+        setting the destination directly, which the graph does not notice.
+
+        Args:
+            destination (Room): The new destination.
+        """
+        self.destination = destination
+        self.update_sector_graph()
+
+    def update_sector_graph(self):
+        """
+        Adds or moves the exit in the sector graph if it links two sectors, and removes it
+        if it no longer does. Nothing is done before the graph has been built.
+        """
+        graph = get_sector_graph(build=False)
+        if graph is None:
+            return
+        if is_nav_node(self.location) and is_nav_node(self.destination):
+            graph.add_exit(self.id, self.location.id, self.destination.id)
+        else:
+            graph.remove_exit(self.id)
@@ -1,88 +1,90 @@
 """
 Handler Module for space descriptions, lists, dicts, db access, etc.
 """
-from random import randint, choice
+from random import choice, choices, Random
+from world.world_space.spacegrid import SpaceGrid, COLOR_INDEXES, SIZE_OF_SPACE, NUM_OF_LINES
+from world.world_space.starfield import StarfieldGenerator, LOOT_TYPES
+from world.world_space.geometry import get_geometry
+
+STARFIELD_RNG = Random()
 
 
 class SpaceDescHandler():
     """
     Manages space descriptions within a virtual environment.
 
-    This class provides methods to set and retrieve descriptions of spaces, represented as strings,
-    and interacts with a database to store and update these descriptions. It also converts space
-    descriptions into a map format for easier manipulation and visualization.
+    This class keeps the description of a space as a SpaceGrid, which stores the glyph and
+    colour of every cell separately. The grid can be changed cell by cell and is only turned
+    into colour coded text when it is displayed.
 
     Attributes:
-        old_desc (list): The current description of the space as a list of strings.
-        new_desc (list): The new description of the space to be updated.
+        grid (SpaceGrid): The current map of the space. A new handler starts with an empty
+                          grid of the configured sector geometry.
 
     Methods:
-        setget_space_desc(new_desc): Updates the space description if new_desc is different from old_desc.
-        setget_spacemap(): Retrieves the space description and converts it into a map format.
+        setget_space_desc(new_desc): Updates the space grid if new_desc is a different grid.
+        setget_spacemap(): Retrieves the current space grid.
         return_spacemap(spacemap_in): Returns a string representation of the space map for display.
         change_map(new_elements): Changes elements in the space map based on new_elements provided.
     """
+    def __init__(self, grid=None, geometry=None):
+        if grid is None:
+            geometry = geometry or get_geometry()
+            grid = SpaceGrid(geometry.width, geometry.height)
+        self.grid = grid
+
     def setget_space_desc(self, new_desc):
         """
-        Updates the space description with a new description if provided and different from the current one.
+        Updates the space grid with a new grid if provided and different from the current one.
 
         Args:
-            new_desc (list): A list of strings representing the new description of the space.
+            new_desc (SpaceGrid): The new map of the space, or "" to keep the current one.
 
         Returns:
-            list: The updated space description as a list of strings.
+            SpaceGrid: The current space grid.
         """
-        size_of_space = 75 # change this in the class below too
-        num_of_lines = 25 # Change this in the class below too
-        self.old_desc = [
-            ["|0550" + "-" * 16 + "0"]
-        ]
-        for _ in range(num_of_lines):
-            self.old_desc.append(["|055!" + "|000o" * size_of_space + "|055!"])
-        self.old_desc.append(["|0550" + "-" * size_of_space + "0|n"])
-        if self.old_desc != new_desc and new_desc != "":
-            return self.new_desc
-        else:
-            return self.old_desc
-        
-        
+        if new_desc != "" and new_desc is not None and new_desc is not self.grid:
+            self.grid = new_desc
+        return self.grid
+
     def setget_spacemap(self):
         """
-        Retrieves the current space description and converts it into a map format.
+        Retrieves the current space grid.
 
         Returns:
-            list: A 2D list representing the space map.
+            SpaceGrid: The current space grid.
         """
-        string_list = self.setget_space_desc(new_desc="")
-        space_map = [list(row) for row in string_list]
-        return space_map
-    
-    
+        return self.setget_space_desc(new_desc="")
+
     def return_spacemap(self, spacemap_in):
         """
         Converts a space map into a string representation for display.
 
         Args:
-            spacemap_in (list): A 2D list representing the space map.
+            spacemap_in (SpaceGrid or list): A space grid, or a 2D list of map rows.
 
         Returns:
             str: A string representation of the space map.
         """
+        if isinstance(spacemap_in, SpaceGrid):
+            return spacemap_in.render()
         return '\n'.join([''.join(row) for row in spacemap_in])
-    
+
     def change_map(self, new_elements):
         """
-        Modifies elements in the space map based on the provided new elements.
+        Modifies cells in the space grid based on the provided new elements.
 
         Args:
             new_elements (list of tuples): A list of tuples where each tuple contains the row index,
                                            column index, and the new element to be placed at that position.
+                                           The element is either a single glyph, which keeps the colour of
+                                           the cell, or a colour prefixed glyph such as "|505*".
 
         """
         for row_index, col_index, new_element in new_elements:
-            if 0 <= row_index < len(self.old_desc) and 0 <= col_index < len(self.old_desc[row_index][0]):
-                row = self.old_desc[row_index][0]
-                self.old_desc[row_index][0] = row[:col_index] + new_element + row[col_index+1:]
+            if self.grid.in_bounds(row_index, col_index):
+                color = COLOR_INDEXES.get(new_element[:-1])
+                self.grid.set_cell(row_index, col_index, new_element[-1], color)
                 
                 
 class SpaceRoomsProvider():
@@ -90,53 +92,61 @@ class SpaceRoomsProvider():
     Provides functionality to dynamically change the space in a virtual environment.
 
     This class uses randomization to alter the elements within the space, simulating a dynamic
-    and changing environment. It leverages the SpaceDescHandler class to update the space
-    descriptions and visualize them as maps.
+    and changing environment. The new space is generated by a StarfieldGenerator, or from the
+    seed of a ProceduralSector when one is given.
 
     Methods:
-        changespace(): Randomly changes elements in the space and returns the updated space map.
+        changespace(): Randomly changes elements in the space and returns the updated space grid.
+        changespace_batch(count): Generates several new spaces in one call.
     """
-    def changespace(self):
+    def __init__(self, generator=None, geometry=None):
+        if generator is None:
+            geometry = geometry or get_geometry()
+            generator = StarfieldGenerator(STARFIELD_RNG, geometry.width, geometry.height)
+        self.generator = generator
+
+    def changespace(self, sector=None):
         """
         Randomly alters elements within the space to simulate a dynamic environment.
 
+        Sector maps are taken ready from the pre-generation service when it has them, and
+        the map of the sector's next epoch is queued so the next search finds it ready.
+
+        Args:
+            sector (ProceduralSector, optional): Build the space of this sector from its seed
+                                                 instead of rolling a random one.
+
         Returns:
-            str: The updated space map as a string representation.
-        """
-        chance_of_change = 1000
-        size_of_space = 75 # change this in the class below too
-        num_of_lines = 25 # Change this in the class below too
-        probability_of_space_object = self.get_random()
-        space_objects = [
-            "*", "'", ".", "`"
-        ]
-        color_prefixes = ["|{}{}{}".format(r, g, b) for r in range(6) for g in range(6) for b in range(6)] # List of all colors
+            tuple: The new SpaceGrid and whether a special event occurred.
+        """
+        if sector is not None:
+            # The pre-generation service needs the server, import it only when sectors are built
+            from world.world_space.pregen import get_pregenerator
+
+            pregenerator = get_pregenerator()
+            if pregenerator is None:
+                return sector.build()
+            # Pre-generated maps have no overrides, so they only stand in for untouched sectors
+            ready = pregenerator.take(sector) if not sector.overrides else None
+            pregenerator.request(sector, sector.epoch + 1)
+            return ready if ready is not None else sector.build()
+        # The generator also checks for the special event
+        return self.generator.generate_map()
+
+    def changespace_batch(self, count):
+        """
+        Generates several new spaces in one call.
 
-        space = [
-            ["|0550" + "-" * size_of_space + "0"]
-        ]
-        for _ in range(num_of_lines):
-            space.append(["!" + "|000o" * size_of_space + "|055!"])
-        space.append(["|0550" + "-" * size_of_space + "0|n"])
-        
-        for row_index, row in enumerate(space):
-            new_row = list(row[0])
-            for col_index, s in enumerate(new_row):
-                if s == 'o' and randint(1, probability_of_space_object) >= chance_of_change:
-                    # Choose a random space object
-                    space_object = choice(space_objects)
-                    # Determine the color based on the space object
-                    color = "|000" if space_object == 'o' else "|055" if s == '-' or s == '!' else choice(color_prefixes)
-                    # Update the char with the new space object and color
-                    new_row[col_index] = color + space_object
-            space[row_index] = [''.join(new_row)]
-        # Check for the special event
-        special_event_occurred = self.get_random() == 2000
-        return SpaceDescHandler().return_spacemap(space), special_event_occurred
+        Args:
+            count (int): Number of spaces to generate.
+
+        Returns:
+            list: A list of (SpaceGrid, bool) tuples as returned by changespace.
+        """
+        return self.generator.generate_batch(count)
 
     def get_random(self) -> int:
-        number = randint(990,1001) if randint(0,100) != 1 else 1010 if randint(0,1) != 1 else 2000
-        return number
+        return self.generator.roll_probability()
     
 class SpaceSearchHandler():
     """
@@ -148,6 +158,9 @@ class SpaceSearchHandler():
     
     Methods:
         search_space(spacemap): Analyzes the spacemap and returns a description of the search results.
+        search_loot(spacemap): Returns the typed loot held by the spacemap.
+        draw_loot(spacemap): Draws one searcher's loot from a spacemap shared with others.
+        found_items(spacemap): Lists every space object found in the spacemap.
     """
     
     def search_space(self, spacemap):
@@ -155,15 +168,17 @@ class SpaceSearchHandler():
         Analyzes the spacemap and returns a description of the search results.
         
         Args:
-            spacemap (list): A 2D list representing the space map.
+            spacemap (SpaceGrid or str): The space grid, or an old text description of the space.
             
         Returns:
             tuple: A tuple containing the search result description and the amount of matter found.
         """
-        size_of_space = 75 # change this in the class below too
-        num_of_lines = 25 # Change this in the class below too
-        # Count the number of objects that are not the default |000o
-        non_default_objects = (size_of_space * num_of_lines) - sum(row.count('o') for row in spacemap)
+        # Count the number of objects that are not the default |000o, the grid keeps this count in its index
+        if isinstance(spacemap, SpaceGrid):
+            non_default_objects = spacemap.count_objects()
+        else:
+            # Text descriptions were always written at the original 75x25 size
+            non_default_objects = (SIZE_OF_SPACE * NUM_OF_LINES) - sum(row.count('o') for row in spacemap)
         
         # If there are no objects other than |000o, return "Nothing Happens"
         if non_default_objects == 0:
@@ -180,4 +195,55 @@ class SpaceSearchHandler():
         # Increase matter by the number of non-default objects found
         matter_found = non_default_objects
         
-        return (message, matter_found)
\ No newline at end of file
+        return (message, matter_found)
+
+    def search_loot(self, spacemap):
+        """
+        Returns the typed loot held by the spacemap, read from its object index.
+
+        Args:
+            spacemap (SpaceGrid): The space grid.
+
+        Returns:
+            dict: The number of objects found of each loot type.
+        """
+        return {
+            LOOT_TYPES.get(glyph, glyph): count
+            for glyph, count in spacemap.index.glyph_counts.items()
+        }
+
+    def draw_loot(self, spacemap):
+        """
+        Draws the loot of one searcher from a spacemap shared with other searchers. The
+        searcher salvages as many objects as the spacemap holds, each picked at random from
+        its object index, so searchers of the same map find the same matter but salvage
+        independently.
+
+        Args:
+            spacemap (SpaceGrid): The space grid.
+
+        Returns:
+            dict: The number of objects salvaged of each loot type.
+        """
+        counts = spacemap.index.glyph_counts
+        glyphs = list(counts)
+        loot = {}
+        for glyph in choices(glyphs, [counts[glyph] for glyph in glyphs], k=spacemap.count_objects()):
+            loot_type = LOOT_TYPES.get(glyph, glyph)
+            loot[loot_type] = loot.get(loot_type, 0) + 1
+        return loot
+
+    def found_items(self, spacemap):
+        """
+        Lists every space object found in the spacemap.
+
+        Args:
+            spacemap (SpaceGrid): The space grid.
+
+        Returns:
+            list: (row, col, loot type, colour index) tuples for every object.
+        """
+        return [
+            (row, col, LOOT_TYPES.get(glyph, glyph), color)
+            for row, col, glyph, color in spacemap.objects()
+        ]
@@ -1,7 +1,23 @@
+from time import monotonic
+from django.conf import settings
 from typeclasses.rooms import Room
 from commands.command import Command
-from evennia import CmdSet
-from typeclasses.spacehandler import SpaceDescHandler, SpaceRoomsProvider, SpaceSearchHandler
+from evennia import CmdSet, search_object
+from evennia.objects.models import ObjectDB
+from typeclasses.spacehandler import SpaceRoomsProvider, SpaceSearchHandler
+from world.world_space.sectors import ProceduralSector
+from world.world_space.galaxy import get_galaxy
+from world.world_space.spacegrid import SpaceGrid, COLOR_CODES
+from world.world_space.starfield import LOOT_TYPES, OBJECT_CLASSES, SPECIAL_EVENT_PROBABILITY
+from world.world_space.geometry import get_geometry
+from world.world_space.viewport import Viewport
+from world.world_space.mapdelta import MapFrame
+from world.world_space.framecache import get_frame_cache, client_capability
+from world.world_space.navigation import get_sector_graph
+from world.world_space.events import apply_event, get_event_scheduler
+
+VIEWPORT_MARGIN = 8  # Screen rows kept free for the room name, exits and prompt
+MIN_VIEWPORT_SIZE = 5
 
 class SpaceRoom(Room):
     """
@@ -10,39 +26,361 @@ class SpaceRoom(Room):
 
     def at_object_creation(self):
         """
-        Called when the object is first created. This method adds the 'is_in_space' tag
-        and assigns the SpaceCmdSet command set to the room.
+        Called when the object is first created. This method adds the 'is_in_space' tag,
+        gives the room its sector coordinates and assigns the SpaceCmdSet command set to the room.
         """
         self.tags.add("is_in_space", category="space_room")
+        self.db.sector_coords = (self.id, 0)
         self.cmdset.add(SpaceCmdSet)
+        graph = get_sector_graph(build=False)
+        if graph is not None:
+            graph.add_node(self.id)
+
+    def at_object_delete(self):
+        """
+        Called before the room is deleted. Removes the sector from the navigation graph.
+
+        Returns:
+            bool: Whether the room may be deleted.
+        """
+        graph = get_sector_graph(build=False)
+        if graph is not None:
+            graph.remove_node(self.id)
+        return super().at_object_delete()
+
+    def get_sector_coords(self):
+        """
+        Returns the coordinates of the sector this room shows. Rooms without sector
+        coordinates use their dbref as their coordinates.
+
+        Returns:
+            tuple: Integer coordinates of the sector.
+        """
+        return tuple(self.db.sector_coords or (self.id, 0))
+
+    def get_sector_state(self):
+        """
+        Returns the live state of the sector this room shows, held by the galaxy. Changes
+        to the live state are saved later with the galaxy chunk holding the sector.
+
+        Returns:
+            SectorState: The state of the sector.
+        """
+        coords = self.get_sector_coords()
+        state = get_galaxy().sector(coords)
+        if state.epoch is None and self.attributes.has("sector_epoch"):
+            # Maps saved on the room itself move into the galaxy the first time they are needed
+            state.epoch = self.db.sector_epoch
+            state.overrides = dict(self.db.sector_overrides or {})
+            get_galaxy().mark_dirty(coords)
+            self.attributes.remove("sector_epoch")
+            self.attributes.remove("sector_overrides")
+        return state
+
+    def get_sector(self):
+        """
+        Returns the procedural sector this room shows.
+
+        Returns:
+            ProceduralSector: The sector of the room at its current epoch.
+        """
+        state = self.get_sector_state()
+        geometry = get_geometry()
+        return ProceduralSector(
+            settings.SPACE_GALAXY_SEED, state.coords, state.epoch or 0, state.overrides, geometry.width, geometry.height
+        )
+
+    def set_sector(self, sector, grid):
+        """
+        Makes a sector and its grid the live map of the room and schedules them to be saved.
+
+        Args:
+            sector (ProceduralSector): The sector to keep.
+            grid (SpaceGrid): The grid built from the sector.
+        """
+        get_galaxy().set_sector(sector.coords, sector.epoch, sector.overrides, grid)
 
     def get_space(self, descr):
         """
-        Retrieves the space map description. If the space map is empty, it returns the
+        Retrieves the space map grid. If the space has not been searched yet, it returns the
         provided description.
+
+        The grid is rebuilt from the sector seed whenever it is not already in memory.
         
         Args:
             descr (str): The fallback description to use if the space map is empty.
         
         Returns:
-            str: The space map description or the provided fallback description.
+            SpaceGrid or str: The space map grid or the provided fallback description.
         """
-        spacedesc = SpaceDescHandler()
-        spacereturn = spacedesc.return_spacemap(spacemap_in="")
-        return spacereturn if spacereturn != "" else descr
+        state = self.get_sector_state()
+        if state.epoch is None:
+            return descr
+        if state.grid is None:
+            grid, _ = SpaceRoomsProvider().changespace(sector=self.get_sector())
+            get_galaxy().set_grid(state.coords, grid)
+            return grid
+        return state.grid
 
     def change_spacemap(self):
         """
-        Updates the space map description for the room.
+        Moves the sector of the room to its next epoch, which rerolls the space map.
+        The new map is kept in memory and saved by the next flush.
         
         Returns:
             bool: Indicates whether a special event occurred during the space map change.
         """
-        spaceroom = SpaceRoomsProvider()
-        new_desc, special_event_occurred = spaceroom.changespace()
-        self.db.desc = new_desc
+        sector = self.get_sector()
+        sector.advance()
+        new_grid, special_event_occurred = SpaceRoomsProvider().changespace(sector=sector)
+        self.set_sector(sector, new_grid)
         return special_event_occurred
 
+    def search_spacemap(self):
+        """
+        Rerolls space for one Space Search. Searches that arrive within SPACE_SEARCH_TICK
+        seconds of the last regeneration share it: the room map is only regenerated and
+        saved once per tick, and later searches in the tick search that same map, drawing
+        their own loot from it with SpaceSearchHandler.draw_loot and rolling their own
+        special event. The cosmic event of the sector only adds to the search that
+        regenerated the map.
+
+        Returns:
+            tuple: The SpaceGrid searched, whether a special event occurred and whether
+                   the room map was regenerated.
+        """
+        now = monotonic()
+        last = self.ndb.spacemap_regenerated_at
+        if last is not None and now - last < settings.SPACE_SEARCH_TICK:
+            grid = self.get_space(None)
+            if grid is not None:
+                # Only the map is shared, every searcher rolls their own special event
+                return grid, SpaceRoomsProvider().get_random() == SPECIAL_EVENT_PROBABILITY, False
+        special_event_occurred = self.change_spacemap()
+        grid = self.get_space(None)
+        self.ndb.spacemap_regenerated_at = now
+        return grid, self.apply_cosmic_event(grid, special_event_occurred), True
+
+    def get_cosmic_event(self):
+        """
+        Returns the kind of cosmic event active in the sector of this room.
+
+        Returns:
+            str or None: The kind of event, see events.EVENT_TYPES, or None if the sector is calm.
+        """
+        scheduler = get_event_scheduler()
+        return scheduler.active_event(self.get_sector_coords()) if scheduler else None
+
+    def apply_cosmic_event(self, grid, special_event_occurred):
+        """
+        Adds the effect of the cosmic event active in the sector to a searched grid.
+
+        Args:
+            grid (SpaceGrid): The grid searched.
+            special_event_occurred (bool): Whether the search already had a special event.
+
+        Returns:
+            bool: Whether the search has a special event.
+        """
+        kind = self.get_cosmic_event()
+        if kind is None or not isinstance(grid, SpaceGrid):
+            return special_event_occurred
+        return apply_event(kind, grid) or special_event_occurred
+
+    def change_map(self, new_elements):
+        """
+        Applies player made changes to the space map and records them as sector overrides
+        so they survive the map being rebuilt.
+
+        Args:
+            new_elements (list of tuples): (row, col, element) tuples as taken by SpaceDescHandler.change_map.
+
+        Returns:
+            list: The (row, col) cells that were changed.
+        """
+        sector = self.get_sector()
+        grid = self.get_space(None)
+        if grid is None:
+            grid, _ = SpaceRoomsProvider().changespace(sector=sector)
+        changed = sector.change_map(new_elements, grid)
+        if changed:
+            self.set_sector(sector, grid)
+        return changed
+
+    def get_ship_position(self, ship):
+        """
+        Returns where a ship is inside the sector. Ships start in the centre of the sector.
+
+        Args:
+            ship (Object): The ship, usually a character.
+
+        Returns:
+            tuple: The (row, col) cell of the ship.
+        """
+        position = ship.ndb.space_position
+        return position if position is not None else get_geometry().centre()
+
+    def move_ship(self, ship, rows, cols):
+        """
+        Moves a ship inside the sector, stopping at the edge of the sector.
+
+        Args:
+            ship (Object): The ship, usually a character.
+            rows (int): Rows to move, negative values move up.
+            cols (int): Columns to move, negative values move left.
+
+        Returns:
+            tuple: The new (row, col) cell of the ship.
+        """
+        geometry = get_geometry()
+        row, col = self.get_ship_position(ship)
+        row = min(max(row + rows, 0), geometry.height - 1)
+        col = min(max(col + cols, 0), geometry.width - 1)
+        ship.ndb.space_position = (row, col)
+        return row, col
+
+    def at_object_receive(self, moved_obj, source_location, **kwargs):
+        """
+        Called when an object arrives in the room. Ships arrive in the centre of the sector,
+        and players arriving get the galaxy chunks around the sector loaded.
+        """
+        super().at_object_receive(moved_obj, source_location, **kwargs)
+        if moved_obj.has_account:
+            get_galaxy().approach(self.get_sector_coords())
+        moved_obj.ndb.space_position = None
+        moved_obj.ndb.space_viewport = None
+        moved_obj.ndb.space_frame = None
+
+    def get_viewport(self, looker):
+        """
+        Returns the looker's viewport, sized to fit on their screen. The looker keeps their
+        viewport between renders so moving only redraws the cells that scroll into view.
+
+        Args:
+            looker (DefaultObject): Object doing the looking.
+
+        Returns:
+            Viewport: The looker's viewport.
+        """
+        screen_width, screen_height = settings.CLIENT_DEFAULT_WIDTH, settings.CLIENT_DEFAULT_HEIGHT
+        sessions = looker.sessions.all()
+        if sessions:
+            screen_width, screen_height = sessions[0].get_client_size()
+        height = max(screen_height - VIEWPORT_MARGIN, MIN_VIEWPORT_SIZE)
+        width = max(screen_width - 2, MIN_VIEWPORT_SIZE)
+        viewport = looker.ndb.space_viewport
+        if viewport is None or (viewport.height, viewport.width) != (height, width):
+            viewport = looker.ndb.space_viewport = Viewport(height, width)
+        return viewport
+
+    def get_map_capability(self, looker, embedded=True):
+        """
+        Returns the frame format the looker's client takes. Frames embedded in the room
+        description still pass through the webclient's own HTML conversion, so webclients
+        get them as xterm256 text.
+
+        Args:
+            looker (DefaultObject): Object doing the looking.
+            embedded (bool, optional): The frame is sent as part of other text.
+
+        Returns:
+            str: One of world.world_space.render.FORMATS.
+        """
+        sessions = looker.sessions.all()
+        capability = client_capability(sessions[0] if sessions else None)
+        if embedded and capability == "html":
+            return "xterm256"
+        return capability
+
+    def render_viewport(self, looker, spacemap, capability=None):
+        """
+        Renders the part of the space map around the looker's ship that fits on their screen.
+        Frames are shared through the frame cache by everyone looking at the same window of
+        the same map with the same kind of client. Lookers that receive map deltas also get
+        the rendered frame remembered.
+
+        Args:
+            looker (DefaultObject): Object doing the looking.
+            spacemap (SpaceGrid): The space map to show.
+            capability (str, optional): The format to render, by default the one the looker's client takes.
+
+        Returns:
+            str: The rendered viewport.
+        """
+        viewport = self.get_viewport(looker)
+        row, col = self.get_ship_position(looker)
+        if capability is None:
+            capability = self.get_map_capability(looker)
+        top, left = viewport.origin_for(spacemap, row, col)
+        key = (self.id, spacemap.serial, spacemap.version, top, left, viewport.height, viewport.width, row, col, capability)
+        rendered = get_frame_cache().get_or_render(key, lambda: viewport.render(spacemap, row, col, capability))
+        if self.wants_map_deltas(looker):
+            looker.ndb.space_frame = MapFrame.from_grid(
+                spacemap, top, left, viewport.height, viewport.width, (row, col)
+            )
+        return rendered
+
+    def wants_map_deltas(self, looker):
+        """
+        Checks if the looker has a client that asked for space map deltas over OOB,
+        see the spacemap inputfunc.
+
+        Args:
+            looker (DefaultObject): Object doing the looking.
+
+        Returns:
+            bool: True if map changes can be sent as deltas.
+        """
+        return any(
+            session.protocol_flags.get("OOB") and session.protocol_flags.get("SPACEMAP_DELTA")
+            for session in looker.sessions.all()
+        )
+
+    def send_map_update(self, looker, redraw=True):
+        """
+        Shows the looker the current space map. Clients that asked for deltas and still show
+        the same window only receive the cells that changed, as a `spacemap_delta` OOB message
+        (`Spacemap.Delta` over GMCP). Everyone else gets the map redrawn with look.
+
+        Args:
+            looker (DefaultObject): Object to update.
+            redraw (bool, optional): Fall back to a full redraw when no delta can be sent.
+
+        Returns:
+            bool: True if a delta was sent.
+        """
+        spacemap = self.get_space(None)
+        previous = looker.ndb.space_frame
+        if spacemap is not None and previous is not None and self.wants_map_deltas(looker):
+            viewport = self.get_viewport(looker)
+            row, col = self.get_ship_position(looker)
+            top, left = viewport.origin_for(spacemap, row, col)
+            frame = MapFrame.from_grid(spacemap, top, left, viewport.height, viewport.width, (row, col))
+            changes = frame.diff(previous)
+            if changes is not None:
+                looker.ndb.space_frame = frame
+                looker.msg(spacemap_delta=((), {"sector": list(self.get_sector_coords()), "cells": changes}))
+                return True
+        if redraw:
+            looker.execute_cmd("look")
+        return False
+
+    def get_display_desc(self, looker, **kwargs):
+        """
+        Renders the space map around the looker's ship for the 'desc' component of the room description.
+
+        Args:
+            looker (DefaultObject): Object doing the looking.
+            **kwargs: Arbitrary data for use when overriding.
+
+        Returns:
+            str: The rendered space map, or the normal description if there is no map yet.
+        """
+        spacemap = self.get_space(None)
+        if spacemap is None:
+            return super().get_display_desc(looker, **kwargs)
+        return self.render_viewport(looker, spacemap)
+
 class CmdSpaceMove(Command):
     """
     This command allows a player to move in space, updating the room's description and handling special events.
@@ -56,31 +394,275 @@ class CmdSpaceMove(Command):
         """
         # Check if the player is in a room with the tag 'is_in_space'
         if self.caller.location.tags.has("is_in_space", category="space_room"):
-            # Call the method to update the room description
-            special_event_occurred = self.caller.location.change_spacemap()
+            # Reroll space, sharing the room map with anyone else searching this tick
+            location = self.caller.location
+            spacemap, special_event_occurred, regenerated = location.search_spacemap()
             # If a special event occurred, handle the resources and message
             if special_event_occurred:
-                self.caller.db.resources["Singularities"] += 1
+                self.caller.state.change_resources({"Singularities": 1}, reason="Space Search")
                 self.caller.msg("|055You stumble upon a strange and magnificent space field.\n|500+1 Gravity Wells")
 
             # Perform a space search and update resources
             space_search_handler = SpaceSearchHandler()
-            spacemap = self.caller.location.get_space(self.caller.location.db.desc)
             search_message, matter_value = space_search_handler.search_space(spacemap)
-            self.caller.db.resources["Matter"] += matter_value
+            self.caller.state.change_resources({"Matter": matter_value}, reason="Space Search")
             self.caller.msg(search_message)
+            if matter_value and isinstance(spacemap, SpaceGrid):
+                if regenerated:
+                    loot = space_search_handler.search_loot(spacemap)
+                else:
+                    loot = space_search_handler.draw_loot(spacemap)
+                self.caller.msg("|035Salvaged: " + ", ".join(f"|050{count} |055{loot_type}" for loot_type, count in sorted(loot.items())))
 
-            # Call the look command for the caller
-            self.caller.execute_cmd("look")
+            # Show the caller the map, and push a new map to anyone else here whose client takes deltas
+            location.send_map_update(self.caller)
+            if regenerated:
+                for obj in location.contents:
+                    if obj is not self.caller and obj.has_account:
+                        location.send_map_update(obj, redraw=False)
         else:
             self.caller.msg("You are not in space.")
 
+class CmdAutopilot(Command):
+    """
+    Autopilot command:
+    Usage:
+      Autopilot <searches>
+    Flies a run of Space Searches on autopilot and reports what they found together.
+    A run holds at most SPACE_AUTOPILOT_MAX_SEARCHES searches, and a new run can only
+    start SPACE_AUTOPILOT_COOLDOWN seconds after the last one.
+    """
+    key = "Autopilot"
+
+    def parse(self):
+        args = self.args.strip()
+        self.searches = int(args) if args.isdigit() else None
+
+    def func(self):
+        location = self.caller.location
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        max_searches = settings.SPACE_AUTOPILOT_MAX_SEARCHES
+        if not self.searches:
+            self.caller.msg(f"Usage: Autopilot <searches>, up to {max_searches} searches a run.")
+            return
+        now = monotonic()
+        ready_at = self.caller.ndb.autopilot_ready_at
+        if ready_at is not None and now < ready_at:
+            self.caller.msg(f"|035Your autopilot is recalibrating for another |050{ready_at - now:.0f}|035 seconds.")
+            return
+        self.caller.ndb.autopilot_ready_at = now + settings.SPACE_AUTOPILOT_COOLDOWN
+        searches = min(self.searches, max_searches)
+
+        # The last search moves the room sector on, the others only roll their own space
+        spacemap, special_event_occurred, regenerated = location.search_spacemap()
+        results = [(spacemap, special_event_occurred)]
+        results.extend(
+            (grid, location.apply_cosmic_event(grid, special))
+            for grid, special in SpaceRoomsProvider().changespace_batch(searches - 1)
+        )
+
+        space_search_handler = SpaceSearchHandler()
+        matter = singularities = 0
+        loot = {}
+        for number, (grid, special) in enumerate(results):
+            singularities += special
+            _, matter_value = space_search_handler.search_space(grid)
+            matter += matter_value
+            if matter_value:
+                # A room map shared with other searchers this tick is salvaged by a draw of its own
+                shared = number == 0 and not regenerated
+                found = space_search_handler.draw_loot(grid) if shared else space_search_handler.search_loot(grid)
+                for loot_type, count in found.items():
+                    loot[loot_type] = loot.get(loot_type, 0) + count
+
+        self.caller.state.change_resources({"Matter": matter, "Singularities": singularities}, reason="Autopilot")
+
+        lines = [f"|035Autopilot flew |050{searches}|035 searches and gathered |050{matter}|035 Matter."]
+        if singularities:
+            lines.append(f"|055You stumbled upon |050{singularities}|055 strange and magnificent space fields.\n|500+{singularities} Gravity Wells")
+        if loot:
+            lines.append("|035Salvaged: " + ", ".join(f"|050{count} |055{loot_type}" for loot_type, count in sorted(loot.items())))
+        if searches < self.searches:
+            lines.append(f"|035The autopilot stops after |050{max_searches}|035 searches a run.")
+        self.caller.msg("\n".join(lines))
+
+        location.send_map_update(self.caller)
+        if regenerated:
+            for obj in location.contents:
+                if obj is not self.caller and obj.has_account:
+                    location.send_map_update(obj, redraw=False)
+
+class CmdSensorScan(Command):
+    """
+    Sensor Scan command:
+    Usage:
+      Sensor Scan [<radius>]
+      Sensor Scan nearest <class>
+    Lists the space objects within <radius> cells of your ship, or finds the nearest
+    object of a class. Classes are singularity, star, comet, dust and debris.
+    """
+    key = "Sensor Scan"
+    default_radius = 10
+    max_radius = 40
+    max_results = 10
+
+    def parse(self):
+        args = self.args.strip().lower().split()
+        self.nearest_class = None
+        self.radius = self.default_radius
+        self.valid = True
+        if args and args[0] == "nearest":
+            self.nearest_class = args[1] if len(args) == 2 else None
+            self.valid = self.nearest_class in OBJECT_CLASSES
+        elif len(args) == 1 and args[0].isdigit():
+            self.radius = min(int(args[0]), self.max_radius)
+        elif args:
+            self.valid = False
+
+    def func(self):
+        location = self.caller.location
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        if not self.valid:
+            self.caller.msg(f"Usage: Sensor Scan [<radius>] or Sensor Scan nearest <{'/'.join(OBJECT_CLASSES)}>")
+            return
+        grid = location.get_space(None)
+        if grid is None:
+            self.caller.msg("Your sensors find nothing but empty space.")
+            return
+        row, col = location.get_ship_position(self.caller)
+        spatial = grid.get_spatial()
+        if self.nearest_class:
+            found = spatial.nearest(row, col, glyphs=OBJECT_CLASSES[self.nearest_class])
+            if found is None:
+                self.caller.msg(f"|035No {self.nearest_class} is in sensor range.")
+            else:
+                self.caller.msg(f"|035Nearest {self.nearest_class}: {self.describe(row, col, *found)}")
+            return
+        found = spatial.within(row, col, self.radius)
+        if not found:
+            self.caller.msg(f"|035Nothing within |050{self.radius}|035 cells of your ship.")
+            return
+        lines = [f"|035Sensors report |050{len(found)}|035 objects within |050{self.radius}|035 cells:"]
+        lines.extend(self.describe(row, col, *obj) for obj in found[:self.max_results])
+        if len(found) > self.max_results:
+            lines.append(f"|035...and |050{len(found) - self.max_results}|035 more.")
+        self.caller.msg("\n".join(lines))
+
+    def describe(self, row, col, distance, obj_row, obj_col, glyph, color):
+        """
+        Describes where a found object is compared to the ship.
+        """
+        rows, cols = obj_row - row, obj_col - col
+        bearing = ", ".join(part for part in (
+            f"{abs(rows)} {'down' if rows > 0 else 'up'}" if rows else "",
+            f"{abs(cols)} {'right' if cols > 0 else 'left'}" if cols else "",
+        ) if part) or "right here"
+        return f"{COLOR_CODES[color]}{glyph}|055 {LOOT_TYPES.get(glyph, glyph)}|035 {distance:.1f} cells ({bearing})"
+
+
+class CmdThrust(Command):
+    """
+    Thrust command:
+    Usage:
+      Thrust <direction> [<cells>]
+    Moves your ship through the sector. Directions are n, s, e, w, ne, nw, se and sw.
+    Your screen follows the ship across sectors too large to show at once.
+    """
+    key = "Thrust"
+    directions = {
+        "n": (-1, 0), "s": (1, 0), "e": (0, 1), "w": (0, -1),
+        "ne": (-1, 1), "nw": (-1, -1), "se": (1, 1), "sw": (1, -1),
+    }
+    max_cells = 25
+
+    def parse(self):
+        args = self.args.strip().lower().split()
+        self.direction = args[0] if args else None
+        self.cells = int(args[1]) if len(args) == 2 and args[1].isdigit() else 1
+        self.valid = self.direction in self.directions and len(args) <= 2
+
+    def func(self):
+        location = self.caller.location
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        if not self.valid:
+            self.caller.msg("Usage: Thrust <n/s/e/w/ne/nw/se/sw> [<cells>]")
+            return
+        spacemap = location.get_space(None)
+        if spacemap is None:
+            self.caller.msg("Your navigation computer has no map of this sector yet. Try a |wSpace Search|035 first.")
+            return
+        rows, cols = self.directions[self.direction]
+        cells = min(self.cells, self.max_cells)
+        location.move_ship(self.caller, rows * cells, cols * cells)
+        for session in self.caller.sessions.all():
+            capability = client_capability(session)
+            frame = location.render_viewport(self.caller, spacemap, capability)
+            # HTML frames are ready for the webclient and must not be converted again
+            options = {"raw": True, "client_raw": True} if capability == "html" else None
+            self.caller.msg(text=(frame, {"type": "spacemap"}), session=session, options=options)
+
+
+class CmdPlotCourse(Command):
+    """
+    Plot Course command:
+    Usage:
+      Plot Course <sector>
+    Plots the shortest course from your sector to another, given by its name or #dbref,
+    and lists the exits to take.
+    """
+    key = "Plot Course"
+    max_steps = 20
+
+    def func(self):
+        location = self.caller.location
+        if not location or not location.tags.has("is_in_space", category="space_room"):
+            self.caller.msg("You are not in space.")
+            return
+        query = self.args.strip()
+        if not query:
+            self.caller.msg("Usage: Plot Course <sector>")
+            return
+        graph = get_sector_graph()
+        targets = [obj for obj in search_object(query) if obj.id in graph.nodes]
+        if not targets:
+            self.caller.msg(f"|035Your navigation computer knows no sector called |055{query}|035.")
+            return
+        if len(targets) > 1:
+            names = ", ".join(f"|055{obj.key}|035 (#{obj.id})" for obj in targets)
+            self.caller.msg(f"|035Several sectors match: {names}. Plot a course to one of their #dbrefs.")
+            return
+        target = targets[0]
+        route = graph.route(location.id, target.id)
+        if route is None:
+            self.caller.msg(f"|035No course leads from here to |055{target.key}|035.")
+            return
+        if not route:
+            self.caller.msg(f"|035You are already in |055{target.key}|035.")
+            return
+        shown = route[:self.max_steps]
+        exit_keys = dict(ObjectDB.objects.filter(id__in=[exit_id for exit_id, _ in shown]).values_list("id", "db_key"))
+        course = " |035>|055 ".join(exit_keys.get(exit_id, "?") for exit_id, _ in shown)
+        if len(route) > len(shown):
+            course += " |035> ..."
+        self.caller.msg(f"|035Course to |055{target.key}|035, |050{len(route)}|035 jumps:\n|055{course}")
+
+
 class SpaceCmdSet(CmdSet):
     """
     Command set containing the space-related commands for a room in space.
     """
     def at_cmdset_creation(self):
         """
-        Called when the command set is first created. Adds the CmdSpaceMove command to the set.
+        Called when the command set is first created. Adds the space commands to the set.
         """
         self.add(CmdSpaceMove)
+        self.add(CmdAutopilot)
+        self.add(CmdSensorScan)
+        self.add(CmdThrust)
+        self.add(CmdPlotCourse)
@@ -0,0 +1,27 @@
+from django.contrib import admin
+from world.progression.models import CharacterProgression, LedgerEntry
+
+
+@admin.register(CharacterProgression)
+class CharacterProgressionAdmin(admin.ModelAdmin):
+    list_display = ("character", "level", "exp", "stat_points", "matter", "anti_matter", "singularities", "gravity_wells", "dimensions")
+    list_filter = ("level",)
+    ordering = ("-level",)
+    search_fields = ("character__db_key",)
+    raw_id_fields = ("character",)
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "character", "name", "amount", "reason")
+    list_filter = ("name",)
+    search_fields = ("character__db_key", "reason")
+    raw_id_fields = ("character",)
+    date_hierarchy = "created_at"
+
+    # The ledger is only ever added to
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
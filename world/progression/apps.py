@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ProgressionConfig(AppConfig):
+    name = "world.progression"
+    label = "progression"
+    verbose_name = "Character progression"
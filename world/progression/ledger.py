@@ -0,0 +1,104 @@
+"""
+Atomic changes to the resources and other counters of characters.
+
+The ResourceLedger changes counters with database side increments, F() expressions,
+so changes made at the same time by gameplay and by admins add up instead of one
+overwriting the other. Several counters change together in one UPDATE, which can be
+made to fail as a whole when it would take a counter below zero. With the audit log
+on, every change is also recorded as a LedgerEntry in the same transaction.
+
+    ledger = get_ledger()
+    ledger.transaction(character.id, {"Matter": -cost, "stat_points": -1, "luck": 1}, reason="Stats luck")
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from world.progression.models import CharacterProgression, LedgerEntry, counter_column
+
+
+class ResourceLedger():
+    """
+    Applies changes to the counters of characters atomically in the database.
+
+    Attributes:
+        audit (bool): Whether every change is recorded as a LedgerEntry.
+
+    Methods:
+        apply(character_id, entries, values, allow_negative): Applies several changes in one UPDATE.
+        transaction(character_id, changes, reason, allow_negative): Applies changes sharing a reason.
+    """
+    def __init__(self, audit=False):
+        self.audit = audit
+
+    def apply(self, character_id, entries, values=None, allow_negative=False):
+        """
+        Applies changes to the counters of a character in one UPDATE.
+
+        Args:
+            character_id (int): Id of the character.
+            entries (list): (counter, amount, reason) tuples. Counters are named like in
+                            counter_column, amounts of the same counter are added up.
+            values (dict, optional): Columns to set to a value in the same UPDATE.
+            allow_negative (bool, optional): Apply the changes even if they take a counter below zero.
+
+        Returns:
+            bool: Whether the changes were applied. Nothing is applied if the character has
+                  no progression row, or if a counter would go below zero when not allowed.
+        """
+        totals = defaultdict(int)
+        for name, amount, _ in entries:
+            totals[counter_column(name)] += amount
+        columns = dict(values or {})
+        rows = CharacterProgression.objects.filter(character_id=character_id)
+        for column, amount in totals.items():
+            if amount:
+                columns[column] = F(column) + amount
+                if amount < 0 and not allow_negative:
+                    rows = rows.filter(**{f"{column}__gte": -amount})
+        if not columns:
+            return True
+        with transaction.atomic():
+            if not rows.update(**columns):
+                return False
+            if self.audit:
+                LedgerEntry.objects.bulk_create([
+                    LedgerEntry(character_id=character_id, name=name, amount=amount, reason=reason[:128])
+                    for name, amount, reason in entries
+                    if amount
+                ])
+        return True
+
+    def transaction(self, character_id, changes, reason="", allow_negative=False):
+        """
+        Applies changes to several counters of a character together.
+
+        Args:
+            character_id (int): Id of the character.
+            changes (dict): Amount to add to each counter, negative to take away.
+            reason (str, optional): Why the counters changed, for the audit log.
+            allow_negative (bool, optional): Apply the changes even if they take a counter below zero.
+
+        Returns:
+            bool: Whether the changes were applied.
+        """
+        return self.apply(
+            character_id, [(name, amount, reason) for name, amount in changes.items()], allow_negative=allow_negative
+        )
+
+
+_LEDGER = None
+
+
+def get_ledger():
+    """
+    Returns the shared ledger, with the audit log set by PROGRESSION_AUDIT_LOG in the settings.
+
+    Returns:
+        ResourceLedger: The shared ledger.
+    """
+    global _LEDGER
+    if _LEDGER is None:
+        from django.conf import settings
+
+        _LEDGER = ResourceLedger(audit=getattr(settings, "PROGRESSION_AUDIT_LOG", False))
+    return _LEDGER
@@ -0,0 +1,86 @@
+"""
+Level ups over many levels at once.
+
+Going from level n to n + 1 costs tnl(n) = 200 * n^2 experience, so going from level L
+up to level L + k costs the leftover tnl of level L plus 200 times a prefix sum of
+squares, which has the closed form n(n + 1)(2n + 1) / 6. The highest level a
+character's experience reaches is solved for directly from it instead of checking
+exp >= tnl one level at a time, and the loot of every level gained is rolled in one
+pass in memory by world.progression.loot, so any number of levels costs one command
+and one write.
+"""
+
+
+def tnl_for(level):
+    """
+    Returns the experience needed to go from a level to the next.
+
+    Args:
+        level (int): The level.
+
+    Returns:
+        int: The experience needed.
+    """
+    return (level * 2) * level * 100
+
+
+def square_sum(n):
+    """
+    Returns 1^2 + 2^2 + ... + n^2.
+
+    Args:
+        n (int): The last square, 0 or more.
+
+    Returns:
+        int: The sum.
+    """
+    return n * (n + 1) * (2 * n + 1) // 6
+
+
+def levels_reachable(level, exp, tnl, max_level, max_levels=None):
+    """
+    Solves for how many levels some experience buys, and the experience left after them.
+
+    Args:
+        level (int): The current level.
+        exp (int): The current experience.
+        tnl (int): The experience still needed for the next level.
+        max_level (int): The highest level there is.
+        max_levels (int, optional): Gain at most this many levels.
+
+    Returns:
+        tuple: The number of levels gained and the experience left.
+    """
+    limit = max_level - level
+    if max_levels is not None:
+        limit = min(limit, max_levels)
+    if limit <= 0 or exp < tnl:
+        return 0, exp
+    # Reaching level m + 1 costs tnl + 200 * (square_sum(m) - square_sum(level)), find the largest m
+    budget = (exp - tnl) // 200 + square_sum(level)
+    m = max(level, int(round((3 * budget) ** (1 / 3))))
+    while m > level and square_sum(m) > budget:
+        m -= 1
+    while square_sum(m + 1) <= budget:
+        m += 1
+    gained = min(m - level + 1, limit)
+    cost = tnl + 200 * (square_sum(level + gained - 1) - square_sum(level))
+    return gained, exp - cost
+
+
+def pity_floor(failed_rolls, highest):
+    """
+    Returns the lowest number the loot rolls of a level up draw, raised by failed rolls
+    to at most 90% of the highest.
+
+    Args:
+        failed_rolls (int): Level ups since the last singularity that raised the pity.
+        highest (int): The highest number the loot rolls draw.
+
+    Returns:
+        int: The floor of the loot rolls.
+    """
+    if failed_rolls == 0:
+        return 1
+    return int(min(1 * failed_rolls * 1000, highest * 0.9))
+
@@ -0,0 +1,232 @@
+"""
+Data driven loot tables for level ups.
+
+A level up draws two numbers between the pity floor y and the highest number x, and the
+closer they are the rarer the loot: every tier of a table is hit when the distance is
+within its fraction of x. For two uniform draws over N = x - y + 1 numbers the chance
+that their distance is at most d has the closed form
+
+    P(|r1 - r2| <= d) = ((2d + 1) N - d (d + 1)) / N^2
+
+so the chance of every combination of tiers is exact and known up front. A level up is
+sampled with one draw over those combinations instead of two draws and a chain of
+comparisons, and the combinations are worked out once per pity floor and reused for
+every level up with the same floor. When the two numbers differ the pity rises with
+pity_chance, and tiers that pay off the pity reset it.
+
+NumPy is not a dependency of the game, so the draws use the standard library.
+"""
+import random
+from bisect import bisect_right
+from math import floor
+from world.progression.leveling import pity_floor
+
+MATTER_TROVE_MIN = 1000000  # Least Matter in a treasure trove or legendary stash
+MATTER_TROVE_MAX = 1000000000  # Most Matter in a trove, per level
+TROVE_MATTER = MATTER_TROVE_MAX * 0.5  # Massive finds this large are treasure troves, smaller ones stashes
+
+# Gains are (low, high, per level): a random amount from low to high, times the level for high if per level
+LEVEL_UP_LOOT = {
+    "base": {"Matter": (1, 1, True)},
+    "tiers": (
+        {"name": "singularity", "within": 0.01, "gains": {"Singularities": (1, 1, False)}, "resets_pity": True},
+        {"name": "massive_matter", "within": 0.015, "gains": {"Matter": (MATTER_TROVE_MIN, MATTER_TROVE_MAX, True)}},
+        {"name": "gravity_well", "within": 0.25, "gains": {"Gravity Wells": (1, 1, False)}},
+        {"name": "anti_matter", "within": 0.75, "gains": {"Anti-matter": (1, 1, True)}},
+    ),
+    "pity_chance": 1 / 3,
+}
+
+
+def within_probability(d, n):
+    """
+    Returns the chance that two uniform draws from n numbers are at most d apart.
+
+    Args:
+        d (int): The distance, 0 or more.
+        n (int): How many numbers the draws are made from.
+
+    Returns:
+        float: The chance between 0 and 1.
+    """
+    d = min(d, n - 1)
+    return ((2 * d + 1) * n - d * (d + 1)) / (n * n)
+
+
+class LootResult():
+    """
+    The loot of several level ups.
+
+    Attributes:
+        levels (int): Number of level ups rolled.
+        resources (dict): The summed amount gained of every resource.
+        hits (dict): How many level ups hit each tier.
+        found (list): (level, tier, resource, amount) for every tier gain.
+        raised (int): How often the pity rose.
+        resets (int): How often the pity was paid off and reset.
+        failed_rolls (int): The pity counter after the last level up.
+    """
+    def __init__(self, levels, failed_rolls):
+        self.levels = levels
+        self.resources = {}
+        self.hits = {}
+        self.found = []
+        self.raised = 0
+        self.resets = 0
+        self.failed_rolls = failed_rolls
+
+
+class LootTable():
+    """
+    A loot table sampled from its exact tier probabilities.
+
+    Attributes:
+        base (dict): Gains of every level up.
+        tiers (tuple): The tiers, each with a name, a "within" fraction of the highest
+                       number, its gains and whether it resets the pity.
+        pity_chance (float): Chance that the pity rises when the two numbers differ.
+
+    Methods:
+        tier_probabilities(y, x): The chance of hitting each tier.
+        outcomes(y, x): The combinations of tiers a level up can hit and their chances.
+        roll(first_level, levels, failed_rolls, highest): Samples several level ups.
+    """
+    def __init__(self, table=LEVEL_UP_LOOT):
+        self.base = dict(table.get("base", {}))
+        self.tiers = tuple(table["tiers"])
+        self.pity_chance = table.get("pity_chance", 0)
+        self._outcomes = {}
+
+    def _distances(self, x):
+        return {tier["name"]: floor(x * tier["within"]) for tier in self.tiers}
+
+    def tier_probabilities(self, y, x):
+        """
+        Returns the exact chance of hitting each tier with the numbers drawn from y to x.
+
+        Args:
+            y (int): The pity floor.
+            x (int): The highest number.
+
+        Returns:
+            dict: The chance of each tier by name.
+        """
+        n = x - y + 1
+        return {name: within_probability(d, n) for name, d in self._distances(x).items()}
+
+    def outcomes(self, y, x):
+        """
+        Returns every combination of tiers a level up can hit with the numbers drawn
+        from y to x, with its chance and the chance that the pity rises with it.
+
+        Args:
+            y (int): The pity floor.
+            x (int): The highest number.
+
+        Returns:
+            list: (chance, tiers hit, pity chance) tuples, the closest draws first.
+        """
+        key = (y, x)
+        if key not in self._outcomes:
+            n = x - y + 1
+            distances = self._distances(x)
+            bounds = sorted({min(d, n - 1) for d in distances.values()})
+            outcomes = []
+            below = 0.0
+            for bound in bounds + [n - 1]:
+                chance = within_probability(bound, n) - below
+                if chance <= 0:
+                    continue
+                tiers = tuple(tier for tier in self.tiers if distances[tier["name"]] >= bound)
+                # Only the closest outcome holds equal draws, which never raise the pity
+                equal = 1 / n if not outcomes else 0
+                outcomes.append((chance, tiers, self.pity_chance * (chance - equal) / chance))
+                below += chance
+            self._outcomes[key] = outcomes
+        return self._outcomes[key]
+
+    def roll(self, first_level, levels, failed_rolls, highest, rng=None):
+        """
+        Samples the loot of several level ups, one draw over the outcomes each.
+
+        Args:
+            first_level (int): The level reached by the first level up.
+            levels (int): Number of level ups.
+            failed_rolls (int): The pity counter before the first level up.
+            highest (int): The highest number the loot rolls draw.
+            rng (Random, optional): The random number generator to roll with.
+
+        Returns:
+            LootResult: The loot of all the level ups.
+        """
+        rng = rng if rng is not None else random
+        draw = rng.random
+        randint = rng.randint
+        result = LootResult(levels, failed_rolls)
+        resources = result.resources
+        hits = result.hits
+        cumulative = {}
+
+        def gain(level, gains, tier=None):
+            for resource, (low, high, per_level) in gains.items():
+                amount = randint(low, high * level if per_level else high)
+                resources[resource] = resources.get(resource, 0) + amount
+                if tier is not None:
+                    result.found.append((level, tier, resource, amount))
+
+        for level in range(first_level, first_level + levels):
+            gain(level, self.base)
+            y = pity_floor(failed_rolls, highest)
+            if y not in cumulative:
+                outcomes = self.outcomes(y, highest)
+                chances, total = [], 0.0
+                for chance, _, _ in outcomes:
+                    total += chance
+                    chances.append(total)
+                cumulative[y] = (chances, outcomes)
+            chances, outcomes = cumulative[y]
+            _, tiers, raise_chance = outcomes[min(bisect_right(chances, draw() * chances[-1]), len(outcomes) - 1)]
+
+            if raise_chance and draw() < raise_chance:
+                failed_rolls += 1
+                result.raised += 1
+            for tier in tiers:
+                name = tier["name"]
+                hits[name] = hits.get(name, 0) + 1
+                gain(level, tier["gains"], name)
+                if tier.get("resets_pity"):
+                    failed_rolls = 0
+                    result.resets += 1
+        result.failed_rolls = failed_rolls
+        return result
+
+
+def simulate(table, first_level, levels, highest, trials, failed_rolls=0, rng=None):
+    """
+    Averages many rolls of a loot table, for balancing.
+
+    Args:
+        table (LootTable): The table to roll.
+        first_level (int): The level reached by the first level up.
+        levels (int): Number of level ups per trial.
+        highest (int): The highest number the loot rolls draw.
+        trials (int): Number of trials.
+        failed_rolls (int, optional): The pity counter before every trial.
+        rng (Random, optional): The random number generator to roll with.
+
+    Returns:
+        dict: The mean "resources" and tier "hits" of a trial.
+    """
+    resources, hits = {}, {}
+    for _ in range(trials):
+        result = table.roll(first_level, levels, failed_rolls, highest, rng)
+        for totals, counts in ((resources, result.resources), (hits, result.hits)):
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+    return {
+        "resources": {key: value / trials for key, value in resources.items()},
+        "hits": {key: value / trials for key, value in hits.items()},
+    }
+
+
+LEVEL_LOOT = LootTable(LEVEL_UP_LOOT)
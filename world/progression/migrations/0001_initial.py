@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("objects", "__first__"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CharacterProgression",
+            fields=[
+                (
+                    "character",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="progression",
+                        serialize=False,
+                        to="objects.objectdb",
+                    ),
+                ),
+                ("level", models.PositiveIntegerField(db_index=True, default=1)),
+                ("exp", models.BigIntegerField(default=0)),
+                ("tnl", models.BigIntegerField(default=200)),
+                ("max_level", models.PositiveIntegerField(default=10000)),
+                ("stat_points", models.IntegerField(default=0)),
+                ("failed_rolls", models.PositiveIntegerField(default=0)),
+                ("max_random_number_in_drop_generation", models.BigIntegerField(default=1000000)),
+                (
+                    "y",
+                    models.BigIntegerField(default=1, help_text="Lowest number the loot rolls of a level up draw."),
+                ),
+                ("piloting", models.IntegerField(default=1)),
+                ("fortitude", models.IntegerField(default=1)),
+                ("intelligence", models.IntegerField(default=1)),
+                ("luck", models.IntegerField(default=1)),
+                ("matter", models.BigIntegerField(db_index=True, default=0)),
+                ("anti_matter", models.BigIntegerField(default=0)),
+                ("singularities", models.BigIntegerField(default=0)),
+                ("gravity_wells", models.BigIntegerField(default=0)),
+                ("dimensions", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "character progression",
+                "verbose_name_plural": "character progression",
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+"""
+Moves the progression Attributes of existing characters into their CharacterProgression
+rows. The Attributes themselves are left in place, but nothing reads them any more.
+"""
+from collections import defaultdict
+from django.db import migrations
+
+SCALAR_FIELDS = (
+    "level", "exp", "tnl", "max_level", "stat_points", "failed_rolls",
+    "max_random_number_in_drop_generation", "y",
+)
+STAT_COLUMNS = {
+    "piloting": "piloting",
+    "fortitude": "fortitude",
+    "intelligence": "intelligence",
+    "luck": "luck",
+}
+RESOURCE_COLUMNS = {
+    "Matter": "matter",
+    "Anti-matter": "anti_matter",
+    "Singularities": "singularities",
+    "Gravity Wells": "gravity_wells",
+    "Dimensions": "dimensions",
+}
+KEYS = SCALAR_FIELDS + ("stats", "resources")
+
+
+def columns(values):
+    row = {name: int(values[name]) for name in SCALAR_FIELDS if values.get(name) is not None}
+    for attribute, mapping in (("stats", STAT_COLUMNS), ("resources", RESOURCE_COLUMNS)):
+        stored = values.get(attribute) or {}
+        for key, column in mapping.items():
+            if key in stored:
+                row[column] = int(stored[key])
+    return row
+
+
+def attributes_to_progression(apps, schema_editor):
+    ObjectDB = apps.get_model("objects", "ObjectDB")
+    CharacterProgression = apps.get_model("progression", "CharacterProgression")
+    Link = ObjectDB._meta.get_field("db_attributes").remote_field.through
+
+    # Only characters have resources, other objects may use the same keys for other things
+    characters = Link.objects.filter(attribute__db_key="resources", attribute__db_category__isnull=True)
+    links = Link.objects.filter(
+        objectdb_id__in=characters.values("objectdb_id"),
+        attribute__db_key__in=KEYS,
+        attribute__db_category__isnull=True,
+    ).values_list("objectdb_id", "attribute__db_key", "attribute__db_value")
+
+    values = defaultdict(dict)
+    for character_id, key, value in links.iterator():
+        values[character_id][key] = value
+    CharacterProgression.objects.bulk_create(
+        [CharacterProgression(character_id=character_id, **columns(stored)) for character_id, stored in values.items()],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("progression", "0001_initial"),
+        ("objects", "__latest__"),
+        ("typeclasses", "__latest__"),
+    ]
+
+    operations = [
+        migrations.RunPython(attributes_to_progression, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,217 @@
+"""
+The progression and resources of characters in their own table.
+
+Level, experience, stat points, stats and resources used to be pickled Attributes, so
+any question over many characters meant loading all of them. Here every value is a
+column, the ones asked about most are indexed, and questions like "every character
+above level 500" or "total Matter held" are single queries:
+
+    CharacterProgression.objects.above_level(500)
+    CharacterProgression.objects.totals()
+
+Characters read and write their row through their CharacterState, and counters like
+the resources are changed with database side increments through the ResourceLedger,
+which can also record every change as a LedgerEntry.
+"""
+from django.db import models
+from django.db.models import Sum
+
+# CharacterState fields kept in a column of the same name
+SCALAR_FIELDS = (
+    "level", "exp", "tnl", "max_level", "stat_points", "failed_rolls",
+    "max_random_number_in_drop_generation", "y",
+)
+# Keys of the stats and resources dicts, and the columns they are kept in
+STAT_COLUMNS = {
+    "piloting": "piloting",
+    "fortitude": "fortitude",
+    "intelligence": "intelligence",
+    "luck": "luck",
+}
+RESOURCE_COLUMNS = {
+    "Matter": "matter",
+    "Anti-matter": "anti_matter",
+    "Singularities": "singularities",
+    "Gravity Wells": "gravity_wells",
+    "Dimensions": "dimensions",
+}
+
+
+def counter_column(name):
+    """
+    Returns the column holding a counter, named like the CharacterState fields, the stats
+    or the resources.
+
+    Args:
+        name (str): A resource like "Matter", a stat like "luck" or a field like "stat_points".
+
+    Returns:
+        str: The column name.
+
+    Raises:
+        KeyError: If there is no such counter.
+    """
+    if name in RESOURCE_COLUMNS:
+        return RESOURCE_COLUMNS[name]
+    if name in STAT_COLUMNS:
+        return STAT_COLUMNS[name]
+    if name in SCALAR_FIELDS:
+        return name
+    raise KeyError(f"Unknown progression counter {name!r}.")
+
+
+def attribute_columns(get):
+    """
+    Returns the columns of a character from its old progression Attributes.
+
+    Args:
+        get (callable): Returns the value of an Attribute by key, or None if it is not set.
+
+    Returns:
+        dict: Column values for the Attributes that are set.
+    """
+    columns = {}
+    for name in SCALAR_FIELDS:
+        value = get(name)
+        if value is not None:
+            columns[name] = int(value)
+    for attribute, mapping in (("stats", STAT_COLUMNS), ("resources", RESOURCE_COLUMNS)):
+        values = get(attribute) or {}
+        for key, column in mapping.items():
+            if key in values:
+                columns[column] = int(values[key])
+    return columns
+
+
+class ProgressionManager(models.Manager):
+    """
+    Queries over the progression of many characters.
+    """
+    def above_level(self, level):
+        """
+        Returns the progression of every character above a level.
+
+        Args:
+            level (int): The level to be above.
+
+        Returns:
+            QuerySet: The matching rows, highest level first.
+        """
+        return self.filter(level__gt=level).order_by("-level")
+
+    def totals(self):
+        """
+        Returns every resource summed over all characters.
+
+        Returns:
+            dict: The total of each resource, keyed like the resources dict.
+        """
+        sums = self.aggregate(**{column: Sum(column) for column in RESOURCE_COLUMNS.values()})
+        return {resource: sums[column] or 0 for resource, column in RESOURCE_COLUMNS.items()}
+
+
+class CharacterProgression(models.Model):
+    """
+    One row per character, holding its level, experience, stats and resources.
+    """
+    character = models.OneToOneField(
+        "objects.ObjectDB", on_delete=models.CASCADE, primary_key=True, related_name="progression"
+    )
+    level = models.PositiveIntegerField(default=1, db_index=True)
+    exp = models.BigIntegerField(default=0)
+    tnl = models.BigIntegerField(default=200)
+    max_level = models.PositiveIntegerField(default=10000)
+    stat_points = models.IntegerField(default=0)
+    failed_rolls = models.PositiveIntegerField(default=0)
+    max_random_number_in_drop_generation = models.BigIntegerField(default=1000000)
+    y = models.BigIntegerField(default=1, help_text="Lowest number the loot rolls of a level up draw.")
+
+    piloting = models.IntegerField(default=1)
+    fortitude = models.IntegerField(default=1)
+    intelligence = models.IntegerField(default=1)
+    luck = models.IntegerField(default=1)
+
+    matter = models.BigIntegerField(default=0, db_index=True)
+    anti_matter = models.BigIntegerField(default=0)
+    singularities = models.BigIntegerField(default=0)
+    gravity_wells = models.BigIntegerField(default=0)
+    dimensions = models.BigIntegerField(default=0)
+
+    objects = ProgressionManager()
+
+    class Meta:
+        verbose_name = "character progression"
+        verbose_name_plural = "character progression"
+
+    def __str__(self):
+        return f"Progression of #{self.character_id}"
+
+    @classmethod
+    def for_character(cls, character):
+        """
+        Returns the row of a character, creating it from the character's old Attributes
+        if it has none.
+
+        Args:
+            character (Character): The character.
+
+        Returns:
+            CharacterProgression: The row of the character.
+        """
+        try:
+            return cls.objects.get(character_id=character.id)
+        except cls.DoesNotExist:
+            row, _ = cls.objects.get_or_create(
+                character_id=character.id, defaults=attribute_columns(character.attributes.get)
+            )
+            return row
+
+    def state_values(self):
+        """
+        Returns the row as the fields of a CharacterState.
+
+        Returns:
+            dict: The field values, with the stats and resources as dicts.
+        """
+        values = {name: getattr(self, name) for name in SCALAR_FIELDS}
+        values["stats"] = {stat: getattr(self, column) for stat, column in STAT_COLUMNS.items()}
+        values["resources"] = {resource: getattr(self, column) for resource, column in RESOURCE_COLUMNS.items()}
+        return values
+
+    @staticmethod
+    def state_columns(changed):
+        """
+        Returns the columns to update for changed CharacterState fields.
+
+        Args:
+            changed (dict): The changed field values, with the stats and resources as dicts.
+
+        Returns:
+            dict: Column values ready for QuerySet.update.
+        """
+        columns = {name: value for name, value in changed.items() if name in SCALAR_FIELDS}
+        for name, mapping in (("stats", STAT_COLUMNS), ("resources", RESOURCE_COLUMNS)):
+            for key, value in changed.get(name, {}).items():
+                if key in mapping:
+                    columns[mapping[key]] = value
+        return columns
+
+
+class LedgerEntry(models.Model):
+    """
+    One change to a counter of a character, recorded by the ResourceLedger when the audit
+    log is on. Entries are only ever added.
+    """
+    character = models.ForeignKey("objects.ObjectDB", on_delete=models.CASCADE, related_name="ledger_entries")
+    name = models.CharField(max_length=64, help_text="Resource, stat or field that changed.")
+    amount = models.BigIntegerField()
+    reason = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "ledger entry"
+        verbose_name_plural = "ledger entries"
+        indexes = [models.Index(fields=["character", "created_at"], name="progression_ledger_char_time")]
+
+    def __str__(self):
+        return f"#{self.character_id} {self.name} {self.amount:+d}"
@@ -0,0 +1,104 @@
+"""
+Offline mining of parked ships.
+
+A ship left in space keeps flying Space Searches while its pilot is away. Nothing runs
+while they are gone: when they puppet the character again the searches flown since
+they left are counted from the elapsed time and the ship's piloting, and the matter
+and singularities of all of them are drawn at once. How many of the maps searched
+roll each probability is a multinomial over starfield.probability_weights, and the
+objects found on the maps of one probability are binomial over all of their cells.
+Both are drawn exactly, so the payout averages what that many searches find one by
+one, and only counts expected to be large are drawn from a normal distribution,
+where it is accurate.
+"""
+from math import floor, log, sqrt
+from random import Random
+from world.world_space.starfield import SPECIAL_EVENT_PROBABILITY, object_chance, probability_weights
+
+EXACT_MEAN = 1000  # Binomial counts expected to be larger than this are drawn from a normal distribution
+
+_RNG = Random()
+
+
+def binomial(trials, chance, rng):
+    """
+    Draws how many of several trials succeed. Exact by skipping geometric gaps between
+    the successes, unless more than EXACT_MEAN of them are expected.
+
+    Args:
+        trials (int): Number of trials.
+        chance (float): Chance that a single trial succeeds.
+        rng (Random): The random number generator to draw with.
+
+    Returns:
+        int: The number of successes.
+    """
+    if trials <= 0 or chance <= 0:
+        return 0
+    if chance >= 1:
+        return trials
+    if chance > 0.5:
+        return trials - binomial(trials, 1 - chance, rng)
+    mean = trials * chance
+    if mean > EXACT_MEAN:
+        return min(max(round(rng.gauss(mean, sqrt(mean * (1 - chance)))), 0), trials)
+    random = rng.random
+    log_miss = log(1.0 - chance)
+    successes = 0
+    index = floor(log(1.0 - random()) / log_miss)
+    while index < trials:
+        successes += 1
+        index += 1 + floor(log(1.0 - random()) / log_miss)
+    return successes
+
+
+def offline_searches(elapsed, piloting, interval, max_time):
+    """
+    Counts the Space Searches a parked ship flies while its pilot is away.
+
+    Args:
+        elapsed (float): Seconds the pilot was away.
+        piloting (int): The piloting stat of the character, one search per interval for each point.
+        interval (float): Seconds a ship takes for one search.
+        max_time (float): Most seconds of absence that count.
+
+    Returns:
+        int: The number of searches flown.
+    """
+    if elapsed <= 0 or interval <= 0:
+        return 0
+    return int(min(elapsed, max_time) * max(piloting, 1) // interval)
+
+
+def sample_offline_gains(searches, cells, rng=None):
+    """
+    Draws the matter and singularities found by many Space Searches in one step.
+
+    Args:
+        searches (int): Number of searches flown.
+        cells (int): Number of cells in a sector.
+        rng (Random, optional): The random number generator to draw with.
+
+    Returns:
+        tuple: The matter and the singularities found.
+    """
+    if searches <= 0:
+        return 0, 0
+    rng = rng if rng is not None else _RNG
+    matter = singularities = 0
+    weights = list(probability_weights().items())
+    maps_left, weight_left = searches, 1.0
+    for number, (probability, weight) in enumerate(weights, 1):
+        # The multinomial as a chain of binomials over the maps not yet assigned, the last probability takes the rest
+        if number == len(weights):
+            maps = maps_left
+        else:
+            maps = binomial(maps_left, min(weight / weight_left, 1.0), rng)
+        maps_left -= maps
+        weight_left -= weight
+        matter += binomial(cells * maps, object_chance(probability), rng)
+        if probability == SPECIAL_EVENT_PROBABILITY:
+            # Every special event field adds its singularity on top
+            matter += maps
+            singularities += maps
+    return matter, singularities
@@ -0,0 +1,209 @@
+"""
+Benchmarks of the space map code at growing sector sizes.
+
+Runs without a game server or database:
+
+    python -m world.world_space.benchmarks
+    python -m world.world_space.benchmarks --update-baseline
+    python -m world.world_space.benchmarks --output results.json --threshold 0.25
+
+Every operation of SpaceRoomsProvider, SpaceDescHandler and SpaceSearchHandler is
+timed on maps generated from a fixed seed at several sector geometries, and reported
+as the time per call and the time per thousand cells, which shows how the cost scales
+with the area of the sector. The results can be written as JSON, and are compared
+with a stored baseline: operations that got slower than the baseline by more than
+the threshold are flagged and make the run exit with status 1.
+
+The baseline in benchmarks_baseline.json was stored on a reference machine. Timings
+only compare on the same hardware, so a CI runner should store its own baseline with
+--update-baseline from a known good commit first, or pass it with --baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from random import Random
+from timeit import Timer
+from world.world_space.geometry import SectorGeometry
+from world.world_space.spacegrid import SpaceGrid, COLOR_CODES, DEFAULT_GLYPH
+from world.world_space.starfield import StarfieldGenerator, SPACE_OBJECTS
+from world.world_space.render import grid_markup
+from typeclasses.spacehandler import SpaceDescHandler, SpaceRoomsProvider, SpaceSearchHandler
+
+GEOMETRIES = (
+    SectorGeometry(75, 25),
+    SectorGeometry(250, 100),
+    SectorGeometry(500, 500),
+    SectorGeometry(1000, 1000),
+)
+TYPICAL_PROBABILITY = 1001  # A common map, about one object per thousand cells
+SEED = 1
+MUTATED_CELLS = 64  # Cells changed and restored by one mutation
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmarks_baseline.json")
+DEFAULT_THRESHOLD = 0.25  # Flag operations more than 25% slower than the baseline
+
+
+def _time(function, budget=0.2):
+    """
+    Times a function, repeating it until it has run for about the budget in seconds.
+
+    Returns:
+        float: The best time of one call in seconds.
+    """
+    timer = Timer(function)
+    number, elapsed = timer.autorange()
+    repeats = max(1, min(5, int(budget / max(elapsed, 1e-9))))
+    return min([elapsed] + timer.repeat(repeat=repeats, number=number)) / number
+
+
+def _mutations(geometry, rng):
+    """
+    Returns seeded change_map elements that place objects in random cells, and the
+    elements that clear the same cells again.
+    """
+    cells = [(rng.randrange(geometry.height), rng.randrange(geometry.width)) for _ in range(MUTATED_CELLS)]
+    place = [(row, col, rng.choice(COLOR_CODES) + rng.choice(SPACE_OBJECTS)) for row, col in cells]
+    clear = [(row, col, COLOR_CODES[0] + DEFAULT_GLYPH) for row, col in cells]
+    return place, clear
+
+
+def benchmark_geometry(geometry, probability=TYPICAL_PROBABILITY, seed=SEED):
+    """
+    Times generation, mutation, render, search, reload and a sensor scan at one geometry.
+
+    Args:
+        geometry (SectorGeometry): The sector size to benchmark.
+        probability (int, optional): The object probability of the generated maps.
+        seed (int, optional): Seed of every random choice, so runs are comparable.
+
+    Returns:
+        dict: Seconds per call of each operation.
+    """
+    generator = StarfieldGenerator(Random(seed), geometry.width, geometry.height)
+    provider = SpaceRoomsProvider(generator=generator)
+    grid = generator.generate(probability)
+    packed = grid.to_bytes()
+    handler = SpaceDescHandler(grid=grid)
+    search = SpaceSearchHandler()
+    place, clear = _mutations(geometry, Random(seed))
+    row, col = geometry.centre()
+    grid.get_spatial()
+
+    def mutate():
+        handler.change_map(place)
+        handler.change_map(clear)
+
+    return {
+        "generate": _time(lambda: generator.generate(probability)),
+        "changespace": _time(provider.changespace),
+        "mutate": _time(mutate),
+        "render": _time(lambda: grid_markup(grid)),
+        "search": _time(lambda: search.search_space(grid)),
+        "loot": _time(lambda: search.search_loot(grid)),
+        "load": _time(lambda: SpaceGrid.from_bytes(packed)),
+        "scan": _time(lambda: grid.spatial.within(row, col, 10)),
+    }
+
+
+def run_suite(geometries=GEOMETRIES, probability=TYPICAL_PROBABILITY, seed=SEED):
+    """
+    Runs the benchmarks at every geometry.
+
+    Returns:
+        dict: The settings of the run under "meta" and the seconds per call of every
+              operation under "results", keyed by geometry as "WIDTHxHEIGHT".
+    """
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "probability": probability,
+            "seed": seed,
+        },
+        "results": {
+            f"{geometry.width}x{geometry.height}": benchmark_geometry(geometry, probability, seed)
+            for geometry in geometries
+        },
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares a run with a baseline run.
+
+    Args:
+        results (dict): A run made by run_suite.
+        baseline (dict): An earlier run made by run_suite.
+        threshold (float, optional): How much slower than the baseline, as a fraction,
+                                     an operation may get before it is flagged.
+
+    Returns:
+        list: (geometry, operation, baseline seconds, seconds, ratio) for every operation
+              that got slower than the threshold allows.
+    """
+    regressions = []
+    for size, operations in results["results"].items():
+        for operation, seconds in operations.items():
+            base = baseline.get("results", {}).get(size, {}).get(operation)
+            if base and seconds / base > 1 + threshold:
+                regressions.append((size, operation, base, seconds, seconds / base))
+    return regressions
+
+
+def _geometry(text):
+    width, _, height = text.lower().partition("x")
+    try:
+        return SectorGeometry(int(width), int(height))
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a sector size like 75x25: {err}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the space map code at several sector sizes.")
+    parser.add_argument("--probability", type=int, default=TYPICAL_PROBABILITY,
+                        help="Object probability of the generated maps, see StarfieldGenerator.roll_probability.")
+    parser.add_argument("--seed", type=int, default=SEED, help="Seed of the generated maps.")
+    parser.add_argument("--size", type=_geometry, action="append", dest="sizes",
+                        help="Sector size to benchmark, like 75x25. Can be given several times.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON file of the baseline run to compare with.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Flag operations slower than the baseline by more than this fraction.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline.")
+    args = parser.parse_args(argv)
+
+    run = run_suite(args.sizes or GEOMETRIES, args.probability, args.seed)
+    print(f"{'sector':>11} {'operation':>11} {'us/call':>12} {'us/1k cells':>12}")
+    for size, operations in run["results"].items():
+        width, _, height = size.partition("x")
+        cells = int(width) * int(height)
+        for operation, seconds in operations.items():
+            print(f"{size:>11} {operation:>11} {seconds * 1e6:>12.2f} {seconds * 1e9 / cells:>12.4f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(run, file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(run, file, indent=2)
+        print(f"Stored the baseline in {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, store one with --update-baseline.")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("meta", {}).get("probability") != args.probability or baseline.get("meta", {}).get("seed") != args.seed:
+        print("The baseline was run with another probability or seed, its timings are not comparable.")
+    regressions = compare(run, baseline, args.threshold)
+    for size, operation, base, seconds, ratio in regressions:
+        print(f"REGRESSION {size} {operation}: {base * 1e6:.2f} -> {seconds * 1e6:.2f} us/call ({ratio:.2f}x)")
+    if regressions:
+        return 1
+    print(f"No operation is more than {args.threshold:.0%} slower than the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
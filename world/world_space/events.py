@@ -0,0 +1,373 @@
+"""
+Timed cosmic events.
+
+Storms and singularity showers are fired into sectors by one global scheduler. The
+events waiting to fire are kept in a heap ordered by their firing time, so scheduling
+and firing an event costs O(log n), and a single timer is armed for the earliest one
+only. The queue is saved on the CosmicEventScheduler script and rearmed when the
+server starts, so scheduled events survive reloads. While an event is active in a
+sector, the Space Searches made there find its effect on top of their usual space.
+"""
+import heapq
+from random import Random
+from time import time
+from twisted.internet.defer import CancelledError
+from evennia.utils import logger
+from evennia.utils.utils import delay
+from typeclasses.scripts import Script
+from world.world_space.starfield import StarfieldGenerator, SINGULARITY_GLYPH, SINGULARITY_COLOR
+
+# What each kind of event does to the searches in its sector, and for how many seconds
+EVENT_TYPES = {
+    "storm": {
+        "duration": 300,
+        "probability": 1100,  # Storms churn up a map of debris on top of the searched space
+        "special": False,
+        "start": "|500An ion storm rolls into the sector, churning up clouds of debris.",
+        "end": "|035The ion storm passes and the sector grows calm.",
+    },
+    "singularity_shower": {
+        "duration": 120,
+        "probability": None,
+        "special": True,  # Every search during a shower finds a singularity
+        "start": "|505A shower of singularities rains through the sector!",
+        "end": "|035The singularity shower fades away.",
+    },
+}
+
+_RNG = Random()
+
+
+def apply_event(kind, grid, rng=None):
+    """
+    Adds the effect of an event to a searched space grid.
+
+    Args:
+        kind (str): The kind of event, a key of EVENT_TYPES.
+        grid (SpaceGrid): The grid to change.
+        rng (Random, optional): The random number generator to roll with.
+
+    Returns:
+        bool: Whether the event gives the search a special event.
+    """
+    effect = EVENT_TYPES[kind]
+    rng = rng if rng is not None else _RNG
+    width = grid.width
+    if effect["probability"]:
+        debris = StarfieldGenerator(rng, width, grid.height).generate(effect["probability"])
+        for row, col, glyph, color in debris.objects():
+            grid.place_object(row * width + col, glyph, color)
+    if effect["special"]:
+        grid.place_object(rng.randrange(width * grid.height), SINGULARITY_GLYPH, SINGULARITY_COLOR)
+    return effect["special"]
+
+
+class EventQueue():
+    """
+    The events waiting to fire, in a heap ordered by firing time. Cancelled events are
+    only dropped from the heap when they reach its top.
+
+    Attributes:
+        events (dict): The waiting events by id.
+        heap (list): (time, id) pairs of the waiting events.
+        next_id (int): Id of the next scheduled event.
+
+    Methods:
+        schedule(at, kind, room_id, coords, ...): Adds an event.
+        cancel(event_id): Removes a waiting event.
+        next_time(): Returns when the earliest event fires.
+        pop_due(now): Removes and returns the events due by now.
+        records(): Returns the waiting events for saving.
+    """
+    def __init__(self, records=(), next_id=1):
+        self.events = {}
+        self.heap = []
+        self.next_id = next_id
+        for event in records:
+            self._push(dict(event))
+
+    def __len__(self):
+        return len(self.events)
+
+    def _push(self, event):
+        self.events[event["id"]] = event
+        heapq.heappush(self.heap, (event["at"], event["id"]))
+        self.next_id = max(self.next_id, event["id"] + 1)
+
+    def schedule(self, at, kind, room_id, coords, duration=0, ending=False, ambient=False):
+        """
+        Adds an event to the queue.
+
+        Args:
+            at (float): Time the event fires, in seconds since the epoch.
+            kind (str): The kind of event, a key of EVENT_TYPES.
+            room_id (int): Id of the room told about the event.
+            coords (tuple): Coordinates of the sector the event happens in.
+            duration (float, optional): Seconds the event lasts once it fires.
+            ending (bool, optional): Whether this is the end of an event that already started.
+            ambient (bool, optional): Whether the scheduler picked the event by itself.
+
+        Returns:
+            int: The id of the event.
+        """
+        event = {
+            "id": self.next_id, "at": at, "kind": kind, "room": room_id, "coords": tuple(coords),
+            "duration": duration, "ending": ending, "ambient": ambient,
+        }
+        self._push(event)
+        return event["id"]
+
+    def cancel(self, event_id):
+        """
+        Removes a waiting event.
+
+        Args:
+            event_id (int): Id of the event.
+
+        Returns:
+            bool: Whether the event was waiting.
+        """
+        if self.events.pop(event_id, None) is None:
+            return False
+        if len(self.heap) > 2 * len(self.events) + 16:
+            # Too many cancelled events still fill the heap, rebuild it from the waiting ones
+            self.heap = [(event["at"], event_id) for event_id, event in self.events.items()]
+            heapq.heapify(self.heap)
+        return True
+
+    def next_time(self):
+        """
+        Returns when the earliest waiting event fires.
+
+        Returns:
+            float or None: The firing time, or None if no event is waiting.
+        """
+        heap = self.heap
+        while heap and heap[0][1] not in self.events:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now):
+        """
+        Removes and returns the events due by a time, earliest first.
+
+        Args:
+            now (float): The current time.
+
+        Returns:
+            list: The due events.
+        """
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, event_id = heapq.heappop(heap)
+            event = self.events.pop(event_id, None)
+            if event is not None:
+                due.append(event)
+        return due
+
+    def records(self):
+        """
+        Returns the waiting events for saving, earliest first.
+
+        Returns:
+            list: The event dicts.
+        """
+        return sorted(self.events.values(), key=lambda event: (event["at"], event["id"]))
+
+
+class CosmicEventScheduler(Script):
+    """
+    A global script that fires scheduled cosmic events into sectors. It has no interval
+    of its own, a single timer is armed for the earliest waiting event instead. Every
+    SPACE_COSMIC_EVENT_INTERVAL seconds on average it also schedules an event into a
+    random sector of space by itself.
+    """
+    def at_script_creation(self):
+        """
+        Called when the script is first created. Marks the script as persistent.
+        """
+        self.key = "cosmic_events"
+        self.desc = "Fires timed cosmic events into sectors of space."
+        self.persistent = True
+        self.db.events = []
+        self.db.next_id = 1
+        self.db.active = {}
+
+    def at_start(self, **kwargs):
+        """
+        Called every time the script starts, also after reloads. Loads the saved queue,
+        fires the events that came due while the server was down and arms the timer.
+        """
+        self.ndb.queue = EventQueue(self.db.events or [], self.db.next_id or 1)
+        self.ndb.timer = None
+        if not any(event["ambient"] for event in self.ndb.queue.events.values()):
+            self.schedule_ambient()
+        self._fire()
+
+    def at_stop(self, **kwargs):
+        """
+        Called when the script stops. Disarms the timer.
+        """
+        self._disarm()
+
+    @property
+    def queue(self):
+        if self.ndb.queue is None:
+            self.ndb.queue = EventQueue(self.db.events or [], self.db.next_id or 1)
+        return self.ndb.queue
+
+    def schedule(self, kind, room, delay_seconds=0, duration=None, ambient=False):
+        """
+        Schedules an event into the sector a room shows.
+
+        Args:
+            kind (str): The kind of event, a key of EVENT_TYPES.
+            room (SpaceRoom): The room showing the sector.
+            delay_seconds (float, optional): Seconds until the event fires.
+            duration (float, optional): Seconds the event lasts, the default of its kind if not given.
+            ambient (bool, optional): Whether the scheduler picked the event by itself.
+
+        Returns:
+            int: The id of the event.
+        """
+        if kind not in EVENT_TYPES:
+            raise ValueError(f"Unknown cosmic event {kind!r}, use one of {', '.join(EVENT_TYPES)}.")
+        if duration is None:
+            duration = EVENT_TYPES[kind]["duration"]
+        event_id = self.queue.schedule(
+            time() + max(delay_seconds, 0), kind, room.id, room.get_sector_coords(), duration, ambient=ambient
+        )
+        self._save()
+        self._arm()
+        return event_id
+
+    def schedule_ambient(self):
+        """
+        Schedules an event of a random kind into a random sector of space, a random time
+        from now averaging SPACE_COSMIC_EVENT_INTERVAL seconds.
+
+        Returns:
+            int or None: The id of the event, or None if ambient events are off or there is no space.
+        """
+        from django.conf import settings
+        from evennia.objects.models import ObjectDB
+
+        interval = getattr(settings, "SPACE_COSMIC_EVENT_INTERVAL", 0)
+        if interval <= 0:
+            return None
+        room = ObjectDB.objects.get_by_tag(key="is_in_space", category="space_room").order_by("?").first()
+        if room is None:
+            return None
+        return self.schedule(_RNG.choice(list(EVENT_TYPES)), room, _RNG.expovariate(1 / interval), ambient=True)
+
+    def cancel(self, event_id):
+        """
+        Cancels a waiting event.
+
+        Args:
+            event_id (int): Id of the event.
+
+        Returns:
+            bool: Whether the event was waiting.
+        """
+        cancelled = self.queue.cancel(event_id)
+        if cancelled:
+            self._save()
+            self._arm()
+        return cancelled
+
+    def pending(self):
+        """
+        Returns the events waiting to fire, earliest first.
+
+        Returns:
+            list: The event dicts.
+        """
+        return self.queue.records()
+
+    def active_event(self, coords):
+        """
+        Returns the kind of event active in a sector.
+
+        Args:
+            coords (tuple): Coordinates of the sector.
+
+        Returns:
+            str or None: The kind of the active event, or None if the sector is calm.
+        """
+        active = self.db.active or {}
+        kind, until = active.get(tuple(coords), (None, 0))
+        return kind if until > time() else None
+
+    def _save(self):
+        self.db.events = self.queue.records()
+        self.db.next_id = self.queue.next_id
+
+    def _disarm(self):
+        timer = self.ndb.timer
+        self.ndb.timer = None
+        if timer is not None and not timer.called:
+            timer.cancel()
+
+    def _arm(self):
+        """
+        Arms the single timer for the earliest waiting event, replacing any armed one.
+        """
+        self._disarm()
+        at = self.queue.next_time()
+        if at is None:
+            return
+        timer = delay(max(at - time(), 0), self._fire)
+        timer.addErrback(lambda failure: failure.trap(CancelledError))
+        self.ndb.timer = timer
+
+    def _fire(self):
+        """
+        Starts and ends every event that is due, then arms the timer for the next one.
+        """
+        self.ndb.timer = None
+        now = time()
+        active = dict(self.db.active or {})
+        for event in self.queue.pop_due(now):
+            try:
+                self._run(event, active, now)
+            except Exception:
+                logger.log_trace(f"Cosmic event {event['id']} ({event['kind']}) failed.")
+        self.db.active = {coords: value for coords, value in active.items() if value[1] > now}
+        self._save()
+        self._arm()
+
+    def _run(self, event, active, now):
+        from evennia import search_object
+
+        kind, coords = event["kind"], event["coords"]
+        effect = EVENT_TYPES.get(kind)
+        if effect is None:
+            return
+        if event["ending"]:
+            if active.get(coords, (None,))[0] == kind:
+                del active[coords]
+            message = effect["end"]
+        else:
+            until = now + event["duration"]
+            active[coords] = (kind, until)
+            self.queue.schedule(until, kind, event["room"], coords, ending=True)
+            if event["ambient"]:
+                self.schedule_ambient()
+            message = effect["start"]
+        rooms = search_object(f"#{event['room']}")
+        if rooms:
+            rooms[0].msg_contents(message)
+
+
+def get_event_scheduler():
+    """
+    Returns the global cosmic event scheduler.
+
+    Returns:
+        CosmicEventScheduler or None: The scheduler, or None if it is not configured.
+    """
+    from evennia import GLOBAL_SCRIPTS
+
+    return GLOBAL_SCRIPTS.get("cosmic_events")
@@ -0,0 +1,182 @@
+"""
+Least recently used cache of rendered sector frames.
+
+Players in the same sector who look at the same window of the same map version get
+the same text, so the rendered frames are shared through this cache instead of being
+rendered for every look. The cache is bounded both by the number of frames and their
+total size, frames expire after a maximum age, and hits and misses are counted.
+
+Frames are cached in the format each kind of client needs, see client_capability.
+"""
+from collections import OrderedDict
+from time import monotonic
+
+
+class FrameCache():
+    """
+    A bounded LRU cache of rendered frames.
+
+    Attributes:
+        max_entries (int): Most frames kept at once.
+        max_chars (int): Most characters of text kept at once.
+        max_age (float): Seconds a frame is kept after it was rendered.
+        hits (int): Number of lookups that found a frame.
+        misses (int): Number of lookups that had to render.
+        evictions (int): Number of frames dropped for size or age.
+
+    Methods:
+        get(key): Returns a cached frame.
+        put(key, frame): Stores a frame.
+        get_or_render(key, render): Returns a cached frame, rendering and storing it on a miss.
+        clear(): Drops every frame.
+        stats(): Returns the cache counters.
+    """
+    def __init__(self, max_entries=256, max_chars=4000000, max_age=300, clock=monotonic):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.max_age = max_age
+        self.clock = clock
+        self.frames = OrderedDict()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, key):
+        """
+        Returns a cached frame and marks it as recently used.
+
+        Args:
+            key (tuple): The frame key.
+
+        Returns:
+            str or None: The frame, or None if it is not cached or has expired.
+        """
+        entry = self.frames.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        created, frame = entry
+        if self.clock() - created > self.max_age:
+            self._drop(key)
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self.frames.move_to_end(key)
+        self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        """
+        Stores a frame, evicting the least recently used frames if the cache is full.
+
+        Args:
+            key (tuple): The frame key.
+            frame (str): The rendered frame.
+        """
+        if key in self.frames:
+            self._drop(key)
+        if len(frame) > self.max_chars:
+            return
+        self.frames[key] = (self.clock(), frame)
+        self.chars += len(frame)
+        while len(self.frames) > self.max_entries or self.chars > self.max_chars:
+            self._drop(next(iter(self.frames)))
+            self.evictions += 1
+
+    def get_or_render(self, key, render):
+        """
+        Returns a cached frame, rendering and storing it on a miss.
+
+        Args:
+            key (tuple): The frame key.
+            render (callable): Called without arguments to render the frame on a miss.
+
+        Returns:
+            str: The frame.
+        """
+        frame = self.get(key)
+        if frame is None:
+            frame = render()
+            self.put(key, frame)
+        return frame
+
+    def clear(self):
+        """
+        Drops every frame. The counters are kept.
+        """
+        self.frames.clear()
+        self.chars = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of frames, characters, hits, misses and evictions, and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "frames": len(self.frames),
+            "chars": self.chars,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _drop(self, key):
+        _, frame = self.frames.pop(key)
+        self.chars -= len(frame)
+
+
+def client_capability(session):
+    """
+    Returns the frame format a session can show: "html" for the webclient, "xterm256" or
+    "ansi" for terminals that support those colours and "markup" for everyone else, whose
+    colours are left for the normal output pipeline to strip.
+
+    Args:
+        session (Session or None): The session to check.
+
+    Returns:
+        str: One of world.world_space.render.FORMATS.
+    """
+    if session is None:
+        return "markup"
+    if session.protocol_key.startswith("webclient"):
+        return "html"
+    flags = session.protocol_flags
+    if flags.get("NOCOLOR"):
+        return "markup"
+    if flags.get("XTERM256"):
+        return "xterm256"
+    if flags.get("ANSI"):
+        return "ansi"
+    return "markup"
+
+
+_FRAMES = None
+
+
+def get_frame_cache():
+    """
+    Returns the shared frame cache, sized by SPACE_FRAME_CACHE_SIZE, SPACE_FRAME_CACHE_CHARS
+    and SPACE_FRAME_CACHE_MAX_AGE in the settings.
+
+    Returns:
+        FrameCache: The shared cache.
+    """
+    global _FRAMES
+    if _FRAMES is None:
+        from django.conf import settings
+
+        _FRAMES = FrameCache(
+            max_entries=getattr(settings, "SPACE_FRAME_CACHE_SIZE", 256),
+            max_chars=getattr(settings, "SPACE_FRAME_CACHE_CHARS", 4000000),
+            max_age=getattr(settings, "SPACE_FRAME_CACHE_MAX_AGE", 300),
+        )
+    return _FRAMES
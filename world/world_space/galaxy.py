@@ -0,0 +1,461 @@
+"""
+Chunked galaxy of procedural sectors.
+
+Sector maps are generated from their seed, so a sector nobody has searched costs
+nothing to keep. The state players leave behind, the sector epoch, the overrides and
+the map built from them, is grouped into chunks of SPACE_GALAXY_CHUNK_SIZE sectors per side. A chunk is loaded
+into memory the first time one of its sectors is needed or a player approaches it,
+changes are written back on the next flush, and chunks nobody has visited for
+SPACE_GALAXY_IDLE_TIME seconds are written back and unloaded. The chunks in memory,
+with the maps built for their sectors, are kept within SPACE_GALAXY_MEMORY_BUDGET
+bytes by unloading the least recently used chunks first.
+
+SpaceRooms show the sector at their sector coordinates, so the galaxy can be far
+larger than the number of rooms and neither the idmapper cache nor the database has
+to hold every sector.
+"""
+from collections import OrderedDict
+from itertools import product
+from time import monotonic
+from evennia.utils import logger
+
+SECTOR_OVERHEAD = 256  # Estimated bytes of a loaded sector state without its map
+OVERRIDE_OVERHEAD = 128  # Estimated bytes of one override
+OBJECT_OVERHEAD = 160  # Estimated bytes of one indexed space object in a built map
+
+
+class SectorState():
+    """
+    The live state of one sector.
+
+    Attributes:
+        coords (tuple): Integer coordinates of the sector.
+        epoch (int or None): The sector epoch, None if space has not been searched yet.
+        overrides (dict): Player made changes, mapping (row, col) to (glyph, color).
+        grid (SpaceGrid or None): The map built for the epoch, if it has been built.
+
+    Methods:
+        size(): Estimates the memory held by the state.
+    """
+    def __init__(self, coords, epoch=None, overrides=None):
+        self.coords = coords
+        self.epoch = epoch
+        self.overrides = dict(overrides) if overrides else {}
+        self.grid = None
+
+    def size(self):
+        """
+        Estimates the memory held by the state, including its map.
+
+        Returns:
+            int: Estimated bytes.
+        """
+        size = SECTOR_OVERHEAD + OVERRIDE_OVERHEAD * len(self.overrides)
+        if self.grid is not None:
+            size += len(self.grid.glyphs) + len(self.grid.colors) + OBJECT_OVERHEAD * len(self.grid.index)
+        return size
+
+
+class GalaxyChunk():
+    """
+    A square of sectors loaded and saved together.
+
+    Attributes:
+        coords (tuple): Coordinates of the chunk.
+        sectors (dict): The loaded SectorStates keyed by sector coordinates.
+        dirty (bool): The chunk has changes that have not been saved.
+        last_access (float): When a sector of the chunk was last used.
+
+    Methods:
+        size(): Estimates the memory held by the chunk.
+        to_record(): Returns the state worth saving.
+        from_record(coords, record, now): Rebuilds a chunk from a saved record.
+    """
+    def __init__(self, coords, now=0):
+        self.coords = coords
+        self.sectors = {}
+        self.dirty = False
+        self.last_access = now
+
+    def size(self):
+        """
+        Estimates the memory held by the chunk.
+
+        Returns:
+            int: Estimated bytes.
+        """
+        return sum(state.size() for state in self.sectors.values())
+
+    def to_record(self):
+        """
+        Returns the state worth saving: the epoch, overrides and built map of every sector
+        that has been searched or changed. Untouched sectors are left to their seed.
+
+        Returns:
+            dict: (epoch, overrides, grid) tuples keyed by sector coordinates, the grid
+                  being None for sectors whose map has not been built.
+        """
+        return {
+            coords: (state.epoch, dict(state.overrides), state.grid)
+            for coords, state in self.sectors.items()
+            if state.epoch is not None or state.overrides
+        }
+
+    @classmethod
+    def from_record(cls, coords, record, now=0):
+        """
+        Rebuilds a chunk from a record made by to_record. Stores that do not keep maps may
+        give (epoch, overrides) tuples instead.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+            record (dict): The saved record, or None for a chunk never saved.
+            now (float, optional): The time of the load.
+
+        Returns:
+            GalaxyChunk: The loaded chunk.
+        """
+        chunk = cls(coords, now)
+        for sector_coords, (epoch, overrides, *grid) in (record or {}).items():
+            state = chunk.sectors[tuple(sector_coords)] = SectorState(tuple(sector_coords), epoch, overrides)
+            state.grid = grid[0] if grid else None
+        return chunk
+
+
+class ScriptChunkStore():
+    """
+    Saves chunk records as Attributes on the spacemap_flusher global script, one Attribute
+    per chunk that holds any state. Maps are not saved, they are rebuilt from the seed.
+
+    Methods:
+        load(coords): Returns the saved record of a chunk.
+        save(coords, record): Saves the record of a chunk.
+    """
+    category = "galaxy_chunk"
+
+    def _script(self):
+        from evennia import GLOBAL_SCRIPTS
+
+        return GLOBAL_SCRIPTS.spacemap_flusher
+
+    @staticmethod
+    def _key(coords):
+        return ",".join(str(value) for value in coords)
+
+    def load(self, coords):
+        """
+        Returns the saved record of a chunk.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+
+        Returns:
+            dict or None: The record, or None if the chunk was never saved.
+        """
+        return self._script().attributes.get(self._key(coords), category=self.category)
+
+    def save(self, coords, record):
+        """
+        Saves the record of a chunk. Chunks without state are removed from the store.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+            record (dict): The record made by GalaxyChunk.to_record.
+        """
+        attributes = self._script().attributes
+        if record:
+            record = {sector: (epoch, overrides) for sector, (epoch, overrides, _) in record.items()}
+            attributes.add(self._key(coords), record, category=self.category)
+        else:
+            attributes.remove(self._key(coords), category=self.category)
+
+
+class GalaxyManager():
+    """
+    Loads, saves and unloads the chunks of the galaxy.
+
+    Attributes:
+        store: Where chunk records are saved, with load(coords) and save(coords, record) methods.
+        chunk_size (int): Number of sectors per side of a chunk.
+        memory_budget (int): Estimated bytes the loaded chunks may hold.
+        idle_time (float): Seconds after which a chunk nobody used is unloaded.
+        chunks (OrderedDict): The loaded chunks, least recently used first.
+
+    Methods:
+        chunk_coords(coords): Returns the coordinates of the chunk holding a sector.
+        get_chunk(coords): Returns a chunk, loading it if needed.
+        sector(coords): Returns the live state of a sector.
+        approach(coords, radius): Loads the chunks around a sector.
+        set_sector(coords, epoch, overrides, grid): Replaces the state of a sector.
+        set_grid(coords, grid): Keeps the map built for a sector.
+        mark_dirty(coords): Schedules the chunk of a sector to be saved.
+        memory(): Estimates the memory held by the loaded chunks.
+        flush(): Saves every changed chunk.
+        unload(coords): Saves and unloads a chunk.
+        evict(): Unloads the chunks that have been idle too long.
+        stats(): Returns counters of the loaded galaxy.
+    """
+    def __init__(self, store=None, chunk_size=8, memory_budget=64 * 1024 * 1024, idle_time=600, clock=monotonic):
+        self.store = store if store is not None else ScriptChunkStore()
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget
+        self.idle_time = idle_time
+        self.clock = clock
+        self.chunks = OrderedDict()
+        self.loads = 0
+        self.unloads = 0
+
+    def chunk_coords(self, coords):
+        """
+        Returns the coordinates of the chunk holding a sector.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+
+        Returns:
+            tuple: Coordinates of the chunk.
+        """
+        return tuple(value // self.chunk_size for value in coords)
+
+    def get_chunk(self, coords):
+        """
+        Returns a chunk and marks it as recently used, loading it if needed.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+
+        Returns:
+            GalaxyChunk: The chunk.
+        """
+        now = self.clock()
+        chunk = self.chunks.get(coords)
+        if chunk is None:
+            chunk = self.chunks[coords] = GalaxyChunk.from_record(coords, self.store.load(coords), now)
+            self.loads += 1
+            self._enforce_budget(keep=coords)
+        else:
+            self.chunks.move_to_end(coords)
+        chunk.last_access = now
+        return chunk
+
+    def sector(self, coords):
+        """
+        Returns the live state of a sector. Changes made to it must be followed by mark_dirty.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+
+        Returns:
+            SectorState: The state of the sector.
+        """
+        coords = tuple(coords)
+        chunk = self.get_chunk(self.chunk_coords(coords))
+        state = chunk.sectors.get(coords)
+        if state is None:
+            state = chunk.sectors[coords] = SectorState(coords)
+        return state
+
+    def approach(self, coords, radius=1):
+        """
+        Loads the chunks within a number of chunks of a sector, so they are ready before
+        anyone travels into them.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+            radius (int, optional): Number of chunks to load around the chunk of the sector.
+        """
+        centre = self.chunk_coords(tuple(coords))
+        for offsets in product(range(-radius, radius + 1), repeat=len(centre)):
+            self.get_chunk(tuple(value + offset for value, offset in zip(centre, offsets)))
+        # The sector approached stays the most recently used
+        self.get_chunk(centre)
+
+    def set_sector(self, coords, epoch, overrides, grid=None):
+        """
+        Replaces the state of a sector and schedules it to be saved.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+            epoch (int): The new sector epoch.
+            overrides (dict): The new overrides.
+            grid (SpaceGrid, optional): The map built for the new state.
+
+        Returns:
+            SectorState: The state of the sector.
+        """
+        state = self.sector(coords)
+        state.epoch = epoch
+        state.overrides = overrides
+        state.grid = grid
+        self.mark_dirty(coords)
+        self._enforce_budget(keep=self.chunk_coords(state.coords))
+        return state
+
+    def set_grid(self, coords, grid):
+        """
+        Keeps the map built for a sector. The map is saved with the next save of its chunk
+        if the store keeps maps, otherwise it is rebuilt from the seed when needed.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+            grid (SpaceGrid): The map built for the current state of the sector.
+
+        Returns:
+            SectorState: The state of the sector.
+        """
+        state = self.sector(coords)
+        state.grid = grid
+        self._enforce_budget(keep=self.chunk_coords(state.coords))
+        return state
+
+    def mark_dirty(self, coords):
+        """
+        Schedules the chunk holding a sector to be saved on the next flush.
+
+        Args:
+            coords (tuple): Integer coordinates of the sector.
+        """
+        self.get_chunk(self.chunk_coords(tuple(coords))).dirty = True
+
+    def memory(self):
+        """
+        Estimates the memory held by the loaded chunks.
+
+        Returns:
+            int: Estimated bytes.
+        """
+        return sum(chunk.size() for chunk in self.chunks.values())
+
+    def flush(self):
+        """
+        Saves every changed chunk.
+
+        Returns:
+            int: The number of chunks saved.
+        """
+        saved = 0
+        for chunk in list(self.chunks.values()):
+            if chunk.dirty and self._save(chunk):
+                saved += 1
+        return saved
+
+    def unload(self, coords):
+        """
+        Saves a chunk if it changed and removes it from memory. A chunk that cannot be
+        saved stays loaded.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+
+        Returns:
+            bool: True if the chunk was unloaded.
+        """
+        chunk = self.chunks.get(coords)
+        if chunk is None:
+            return False
+        if chunk.dirty and not self._save(chunk):
+            return False
+        del self.chunks[coords]
+        self.unloads += 1
+        return True
+
+    def evict(self, now=None):
+        """
+        Unloads the chunks nobody has used for idle_time seconds.
+
+        Args:
+            now (float, optional): The current time.
+
+        Returns:
+            int: The number of chunks unloaded.
+        """
+        now = self.clock() if now is None else now
+        idle = [coords for coords, chunk in self.chunks.items() if now - chunk.last_access > self.idle_time]
+        return sum(1 for coords in idle if self.unload(coords))
+
+    def stats(self):
+        """
+        Returns counters of the loaded galaxy.
+
+        Returns:
+            dict: The number of loaded chunks, sectors and built maps, the estimated memory,
+                  and the number of chunk loads and unloads.
+        """
+        sectors = [state for chunk in self.chunks.values() for state in chunk.sectors.values()]
+        return {
+            "chunks": len(self.chunks),
+            "sectors": len(sectors),
+            "maps": sum(1 for state in sectors if state.grid is not None),
+            "memory": self.memory(),
+            "loads": self.loads,
+            "unloads": self.unloads,
+        }
+
+    def _save(self, chunk):
+        try:
+            self.store.save(chunk.coords, chunk.to_record())
+        except Exception:
+            logger.log_trace(f"Could not save galaxy chunk {chunk.coords}.")
+            return False
+        chunk.dirty = False
+        return True
+
+    def _enforce_budget(self, keep):
+        """
+        Unloads the least recently used chunks, except the chunk in use, until the loaded
+        chunks fit in the memory budget.
+        """
+        if len(self.chunks) < 2:
+            return
+        memory = self.memory()
+        for coords in list(self.chunks):
+            if memory <= self.memory_budget:
+                break
+            if coords == keep:
+                continue
+            size = self.chunks[coords].size()
+            if self.unload(coords):
+                memory -= size
+
+
+_GALAXY = None
+
+
+def get_galaxy():
+    """
+    Returns the shared galaxy manager, configured by SPACE_GALAXY_CHUNK_SIZE,
+    SPACE_GALAXY_MEMORY_BUDGET and SPACE_GALAXY_IDLE_TIME in the settings. The chunks
+    are saved in the sector store file SPACE_SECTOR_STORE, or as Attributes if it is None.
+
+    Returns:
+        GalaxyManager: The shared galaxy.
+    """
+    global _GALAXY
+    if _GALAXY is None:
+        from django.conf import settings
+
+        chunk_size = getattr(settings, "SPACE_GALAXY_CHUNK_SIZE", 8)
+        store = ScriptChunkStore()
+        path = getattr(settings, "SPACE_SECTOR_STORE", None)
+        if path:
+            from world.world_space.geometry import get_geometry
+            from world.world_space.sectorstore import SectorStore, SectorChunkStore, DEFAULT_MAX_OVERRIDES
+
+            geometry = get_geometry()
+            sectors = SectorStore(
+                path, geometry.width, geometry.height,
+                getattr(settings, "SPACE_SECTOR_STORE_OVERRIDES", DEFAULT_MAX_OVERRIDES),
+            )
+            if not sectors.keeps_grids:
+                logger.log_warn(
+                    f"Sector store {path} holds {sectors.record_width}x{sectors.record_height} maps but sectors are"
+                    f" {geometry.width}x{geometry.height}, maps are rebuilt from the seed instead of stored."
+                )
+            store = SectorChunkStore(sectors, chunk_size, fallback=store)
+        _GALAXY = GalaxyManager(
+            store=store,
+            chunk_size=chunk_size,
+            memory_budget=getattr(settings, "SPACE_GALAXY_MEMORY_BUDGET", 64 * 1024 * 1024),
+            idle_time=getattr(settings, "SPACE_GALAXY_IDLE_TIME", 600),
+        )
+    return _GALAXY
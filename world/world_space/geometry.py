@@ -0,0 +1,98 @@
+"""
+Sector geometry configuration.
+
+The size of a sector is set once with SPACE_SECTOR_WIDTH and SPACE_SECTOR_HEIGHT in
+the settings, and generation, search and rendering all read it from here.
+"""
+from world.world_space.spacegrid import SIZE_OF_SPACE, NUM_OF_LINES
+
+MAX_SECTOR_SIZE = 65535  # Largest width or height a packed SpaceGrid can hold
+
+
+class SectorGeometry():
+    """
+    The dimensions of a sector of space.
+
+    Attributes:
+        width (int): Number of cells in a row.
+        height (int): Number of rows.
+
+    Methods:
+        cells(): Number of cells in the sector.
+        centre(): The cell in the middle of the sector.
+        contains(row, col): Checks that a cell lies inside the sector.
+        from_settings(): Reads the geometry from the game settings.
+    """
+    def __init__(self, width=SIZE_OF_SPACE, height=NUM_OF_LINES):
+        if not (0 < width <= MAX_SECTOR_SIZE and 0 < height <= MAX_SECTOR_SIZE):
+            raise ValueError(f"Sector size {width}x{height} must be between 1 and {MAX_SECTOR_SIZE} cells per side.")
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return f"SectorGeometry({self.width}, {self.height})"
+
+    def __eq__(self, other):
+        return isinstance(other, SectorGeometry) and (self.width, self.height) == (other.width, other.height)
+
+    def cells(self):
+        """
+        Returns the number of cells in the sector.
+
+        Returns:
+            int: Width times height.
+        """
+        return self.width * self.height
+
+    def centre(self):
+        """
+        Returns the cell in the middle of the sector.
+
+        Returns:
+            tuple: The (row, col) of the centre cell.
+        """
+        return self.height // 2, self.width // 2
+
+    def contains(self, row, col):
+        """
+        Checks that a cell lies inside the sector.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+
+        Returns:
+            bool: True if the cell is inside the sector.
+        """
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Reads the geometry from SPACE_SECTOR_WIDTH and SPACE_SECTOR_HEIGHT in the game settings.
+
+        Returns:
+            SectorGeometry: The configured geometry.
+        """
+        from django.conf import settings
+
+        return cls(
+            getattr(settings, "SPACE_SECTOR_WIDTH", SIZE_OF_SPACE),
+            getattr(settings, "SPACE_SECTOR_HEIGHT", NUM_OF_LINES),
+        )
+
+
+_GEOMETRY = None
+
+
+def get_geometry():
+    """
+    Returns the configured sector geometry, reading the settings the first time.
+
+    Returns:
+        SectorGeometry: The configured geometry.
+    """
+    global _GEOMETRY
+    if _GEOMETRY is None:
+        _GEOMETRY = SectorGeometry.from_settings()
+    return _GEOMETRY
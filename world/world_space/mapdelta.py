@@ -0,0 +1,85 @@
+"""
+Delta updates of space maps.
+
+A MapFrame remembers what a client was last shown of a space map: the window, the
+objects inside it and where the ship was drawn. Comparing the frame of a new map to
+the last one sent gives the few cells that changed, which clients that asked for it
+receive over OOB instead of a full redraw of the map.
+"""
+from world.world_space.spacegrid import COLOR_CODES
+from world.world_space.viewport import SHIP_TOKEN
+
+SHIP_CELL = (SHIP_TOKEN[-1], SHIP_TOKEN[1:-1])
+EMPTY_CELL = ("o", COLOR_CODES[0][1:])
+
+
+class MapFrame():
+    """
+    What a client was shown of a space map.
+
+    Attributes:
+        top (int): Grid row shown in the first row of the window.
+        left (int): Grid column shown in the first column of the window.
+        height (int): Number of rows shown.
+        width (int): Number of cells shown in a row.
+        cells (dict): Maps the (row, col) of every non-empty cell shown to its (glyph, colour) pair,
+                      with the colour given as an xterm "rgb" string.
+
+    Methods:
+        from_grid(grid, top, left, height, width, ship): Captures the frame of a grid.
+        diff(other): Lists the cells that changed from another frame.
+    """
+    def __init__(self, top, left, height, width, cells):
+        self.top = top
+        self.left = left
+        self.height = height
+        self.width = width
+        self.cells = cells
+
+    @classmethod
+    def from_grid(cls, grid, top, left, height, width, ship=None):
+        """
+        Captures the frame of a window of a grid, looking only at the objects inside it.
+
+        Args:
+            grid (SpaceGrid): The grid shown.
+            top (int): Grid row shown in the first row of the window.
+            left (int): Grid column shown in the first column of the window.
+            height (int): Number of rows shown.
+            width (int): Number of cells shown in a row.
+            ship (tuple, optional): The (row, col) the ship is drawn in.
+
+        Returns:
+            MapFrame: The captured frame.
+        """
+        height, width = min(height, grid.height), min(width, grid.width)
+        cells = {
+            (row, col): (glyph, COLOR_CODES[color][1:])
+            for row, col, glyph, color in grid.get_spatial().in_rect(top, left, top + height, left + width)
+        }
+        if ship is not None:
+            cells[tuple(ship)] = SHIP_CELL
+        return cls(top, left, height, width, cells)
+
+    def diff(self, other):
+        """
+        Lists the cells that changed from another frame.
+
+        Args:
+            other (MapFrame): The frame shown before this one.
+
+        Returns:
+            list or None: [row, col, glyph, colour] lists with the row and column counted from the
+                          top left of the window, or None if the window itself moved and the map
+                          has to be redrawn in full.
+        """
+        if (self.top, self.left, self.height, self.width) != (other.top, other.left, other.height, other.width):
+            return None
+        changes = []
+        for position, cell in self.cells.items():
+            if other.cells.get(position) != cell:
+                changes.append([position[0] - self.top, position[1] - self.left, *cell])
+        for position in other.cells:
+            if position not in self.cells:
+                changes.append([position[0] - self.top, position[1] - self.left, *EMPTY_CELL])
+        return changes
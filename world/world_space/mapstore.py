@@ -0,0 +1,34 @@
+"""
+Write-behind saving of live space maps.
+
+Sector state is changed in memory, in the chunks of the galaxy, and only the chunks
+that changed are written to the sector store together on an interval by the
+SpaceMapFlusher script, and when the server reloads or shuts down, so a crash costs
+at most one flush window instead of every Space Search writing to the database.
+The same script unloads the galaxy chunks nobody has visited for a while.
+"""
+from typeclasses.scripts import Script
+from world.world_space.galaxy import get_galaxy
+
+
+class SpaceMapFlusher(Script):
+    """
+    A global script that saves the changed galaxy chunks and unloads the idle ones on an
+    interval. The interval is set by SPACEMAP_FLUSH_INTERVAL in the settings. Without a
+    sector store file the saved chunks are kept as Attributes of this script.
+    """
+    def at_script_creation(self):
+        """
+        Called when the script is first created. Marks the script as persistent.
+        """
+        self.key = "spacemap_flusher"
+        self.desc = "Saves changed space maps to the database."
+        self.persistent = True
+
+    def at_repeat(self):
+        """
+        Called at each interval. Saves every changed chunk and unloads the idle ones.
+        """
+        galaxy = get_galaxy()
+        galaxy.flush()
+        galaxy.evict()
@@ -0,0 +1,401 @@
+"""
+Navigation between sectors of space.
+
+Sectors linked by exits form a directed graph. Every exit counts as one jump. For each
+hub, a room tagged `nav_hub` in the `space_room` category such as the home ship
+airlock, a distance field keeps the number of jumps from every sector to the hub and
+the exit to take next. The distance to a hub is a lookup, and the route to it only
+follows the next hops.
+
+Routes between any two sectors are found with A*. The hub fields double as its
+heuristic: going from a sector to the goal can never be shorter than going from the
+sector to a hub minus going from the goal to that hub. When exits are added or removed
+the fields are repaired from the changed exit, which only touches the sectors whose
+distances change, so the graph never has to be rebuilt while the server runs.
+"""
+from heapq import heappop, heappush
+
+INF = float("inf")
+SPACE_TAG = ("is_in_space", "space_room")
+HUB_TAG = ("nav_hub", "space_room")
+
+
+class DistanceField():
+    """
+    The distances from every sector to one hub, with the next sector on the way there.
+
+    Attributes:
+        hub (int): The id of the hub.
+        dist (dict): Distance to the hub of every sector that can reach it.
+        next (dict): The next sector on the way to the hub.
+        children (dict): For every sector, the sectors whose next sector it is, for repairs.
+
+    Methods:
+        build(graph): Computes the field from scratch.
+        exit_added(graph, source, destination, cost): Repairs the field after an exit was added.
+        exit_removed(graph, source, destination): Repairs the field after an exit was removed.
+    """
+    def __init__(self, hub):
+        self.hub = hub
+        self.dist = {hub: 0}
+        self.next = {}
+        self.children = {}
+
+    def build(self, graph):
+        """
+        Computes the field from scratch with Dijkstra's algorithm over the reversed exits.
+
+        Args:
+            graph (SectorGraph): The graph.
+        """
+        self.dist = {self.hub: 0}
+        self.next = {}
+        self.children = {}
+        self._relax(graph, [(0, self.hub)])
+
+    def exit_added(self, graph, source, destination, cost):
+        """
+        Repairs the field after an exit was added or got cheaper. Only the sectors that
+        get closer to the hub are visited.
+        """
+        distance = self.dist.get(destination, INF) + cost
+        if distance < self.dist.get(source, INF):
+            self.dist[source] = distance
+            self._link(source, destination)
+            self._relax(graph, [(distance, source)])
+
+    def exit_removed(self, graph, source, destination):
+        """
+        Repairs the field after an exit was removed or got dearer. If the exit was on the
+        way to the hub, the sectors that went through it look for a new way from their
+        neighbours that were not affected.
+        """
+        if self.next.get(source) != destination:
+            return
+        affected = set()
+        stack = [source]
+        while stack:
+            node = stack.pop()
+            affected.add(node)
+            stack.extend(self.children.get(node, ()))
+        for node in affected:
+            del self.dist[node]
+            self._unlink(node)
+        heap = []
+        for node in affected:
+            best, best_next = INF, None
+            for neighbour, (cost, _) in graph.succ.get(node, {}).items():
+                if neighbour not in affected and neighbour in self.dist and self.dist[neighbour] + cost < best:
+                    best, best_next = self.dist[neighbour] + cost, neighbour
+            if best_next is not None:
+                self.dist[node] = best
+                self._link(node, best_next)
+                heappush(heap, (best, node))
+        self._relax(graph, heap)
+
+    def _relax(self, graph, heap):
+        """
+        Runs Dijkstra's algorithm backwards along the exits from the sectors in the heap.
+        """
+        dist = self.dist
+        while heap:
+            distance, node = heappop(heap)
+            if distance > dist.get(node, INF):
+                continue
+            for previous, cost in graph.pred.get(node, {}).items():
+                new_distance = distance + cost
+                if new_distance < dist.get(previous, INF):
+                    dist[previous] = new_distance
+                    self._link(previous, node)
+                    heappush(heap, (new_distance, previous))
+
+    def _link(self, node, next_node):
+        self._unlink(node)
+        self.next[node] = next_node
+        self.children.setdefault(next_node, set()).add(node)
+
+    def _unlink(self, node):
+        old = self.next.pop(node, None)
+        if old is not None:
+            self.children[old].discard(node)
+
+
+class SectorGraph():
+    """
+    The sectors of space and the exits between them.
+
+    Attributes:
+        nodes (set): The ids of the sectors.
+        succ (dict): For every sector, the (cost, exit id) of the cheapest exit to each neighbour.
+        pred (dict): For every sector, the cost of the cheapest exit from each neighbour.
+        exits (dict): The (source, destination, cost) of every exit, keyed by exit id.
+        fields (dict): The DistanceField of every hub, keyed by hub id.
+
+    Methods:
+        add_node(node): Adds a sector.
+        remove_node(node): Removes a sector and its exits.
+        add_exit(exit_id, source, destination, cost): Adds an exit.
+        remove_exit(exit_id): Removes an exit.
+        add_hub(hub): Makes a sector a hub and computes its distance field.
+        remove_hub(hub): Stops keeping the distance field of a hub.
+        distance_to_hub(node, hub): Returns the jumps from a sector to a hub.
+        route_to_hub(node, hub): Returns the exits to take to a hub.
+        route(start, goal): Returns the exits to take between two sectors.
+    """
+    def __init__(self):
+        self.nodes = set()
+        self.succ = {}
+        self.pred = {}
+        self.exits = {}
+        self.pair_exits = {}
+        self.fields = {}
+
+    def add_node(self, node):
+        """
+        Adds a sector.
+
+        Args:
+            node (int): The id of the sector room.
+        """
+        self.nodes.add(node)
+
+    def remove_node(self, node):
+        """
+        Removes a sector, its exits and its distance field if it is a hub.
+
+        Args:
+            node (int): The id of the sector room.
+        """
+        if node in self.fields:
+            self.remove_hub(node)
+        pairs = [(node, neighbour) for neighbour in self.succ.get(node, {})]
+        pairs.extend((neighbour, node) for neighbour in self.pred.get(node, {}))
+        for pair in pairs:
+            for exit_id in list(self.pair_exits.get(pair, ())):
+                self.remove_exit(exit_id)
+        self.nodes.discard(node)
+        self.succ.pop(node, None)
+        self.pred.pop(node, None)
+
+    def add_exit(self, exit_id, source, destination, cost=1):
+        """
+        Adds an exit, or moves it if it is already known, and repairs the distance fields.
+
+        Args:
+            exit_id (int): The id of the exit.
+            source (int): The id of the sector the exit is in.
+            destination (int): The id of the sector the exit leads to.
+            cost (int, optional): The cost of taking the exit.
+        """
+        if exit_id in self.exits:
+            self.remove_exit(exit_id)
+        self.nodes.update((source, destination))
+        self.exits[exit_id] = (source, destination, cost)
+        self.pair_exits.setdefault((source, destination), {})[exit_id] = cost
+        current = self.succ.get(source, {}).get(destination)
+        if current is None or cost < current[0]:
+            self.succ.setdefault(source, {})[destination] = (cost, exit_id)
+            self.pred.setdefault(destination, {})[source] = cost
+            for field in self.fields.values():
+                field.exit_added(self, source, destination, cost)
+
+    def remove_exit(self, exit_id):
+        """
+        Removes an exit and repairs the distance fields.
+
+        Args:
+            exit_id (int): The id of the exit.
+
+        Returns:
+            bool: True if the exit was known.
+        """
+        known = self.exits.pop(exit_id, None)
+        if known is None:
+            return False
+        source, destination, _ = known
+        pair = self.pair_exits[(source, destination)]
+        del pair[exit_id]
+        current_cost, current_exit = self.succ[source][destination]
+        if current_exit != exit_id:
+            return True
+        if pair:
+            # Another exit between the same sectors takes over
+            best_exit = min(pair, key=pair.get)
+            self.succ[source][destination] = (pair[best_exit], best_exit)
+            self.pred[destination][source] = pair[best_exit]
+            if pair[best_exit] == current_cost:
+                return True
+        else:
+            del self.pair_exits[(source, destination)]
+            del self.succ[source][destination]
+            del self.pred[destination][source]
+        for field in self.fields.values():
+            field.exit_removed(self, source, destination)
+        return True
+
+    def add_hub(self, hub):
+        """
+        Makes a sector a hub and computes its distance field.
+
+        Args:
+            hub (int): The id of the sector room.
+        """
+        self.nodes.add(hub)
+        field = self.fields[hub] = DistanceField(hub)
+        field.build(self)
+
+    def remove_hub(self, hub):
+        """
+        Stops keeping the distance field of a hub.
+
+        Args:
+            hub (int): The id of the sector room.
+        """
+        self.fields.pop(hub, None)
+
+    def distance_to_hub(self, node, hub):
+        """
+        Returns the number of jumps from a sector to a hub.
+
+        Args:
+            node (int): The id of the sector room.
+            hub (int): The id of the hub.
+
+        Returns:
+            int or None: The distance, or None if the hub cannot be reached.
+        """
+        return self.fields[hub].dist.get(node)
+
+    def route_to_hub(self, node, hub):
+        """
+        Returns the exits to take from a sector to a hub, following the next hops of the hub's field.
+
+        Args:
+            node (int): The id of the sector room.
+            hub (int): The id of the hub.
+
+        Returns:
+            list or None: The (exit id, sector id) of every jump, or None if the hub cannot be reached.
+        """
+        field = self.fields[hub]
+        if node not in field.dist:
+            return None
+        steps = []
+        while node != hub:
+            next_node = field.next[node]
+            steps.append((self.succ[node][next_node][1], next_node))
+            node = next_node
+        return steps
+
+    def route(self, start, goal):
+        """
+        Returns the exits to take between two sectors. Routes to hubs follow the hub's
+        field, other routes are searched with A* using the hub fields as the heuristic.
+
+        Args:
+            start (int): The id of the sector room to leave from.
+            goal (int): The id of the sector room to go to.
+
+        Returns:
+            list or None: The (exit id, sector id) of every jump, or None if there is no route.
+        """
+        if start == goal:
+            return []
+        if goal in self.fields:
+            return self.route_to_hub(start, goal)
+        landmarks = [(field.dist, field.dist[goal]) for field in self.fields.values() if goal in field.dist]
+
+        def heuristic(node):
+            estimate = 0
+            for dist, goal_distance in landmarks:
+                distance = dist.get(node)
+                if distance is None:
+                    # The goal reaches this hub but the node does not, so it cannot reach the goal
+                    return INF
+                if distance - goal_distance > estimate:
+                    estimate = distance - goal_distance
+            return estimate
+
+        cost_so_far = {start: 0}
+        came_from = {}
+        heap = [(heuristic(start), 0, start)]
+        while heap:
+            _, cost, node = heappop(heap)
+            if node == goal:
+                steps = []
+                while node != start:
+                    previous, exit_id = came_from[node]
+                    steps.append((exit_id, node))
+                    node = previous
+                steps.reverse()
+                return steps
+            if cost > cost_so_far[node]:
+                continue
+            for neighbour, (exit_cost, exit_id) in self.succ.get(node, {}).items():
+                new_cost = cost + exit_cost
+                if new_cost < cost_so_far.get(neighbour, INF):
+                    estimate = heuristic(neighbour)
+                    if estimate == INF:
+                        continue
+                    cost_so_far[neighbour] = new_cost
+                    came_from[neighbour] = (node, exit_id)
+                    heappush(heap, (new_cost + estimate, new_cost, neighbour))
+        return None
+
+
+def is_nav_node(obj):
+    """
+    Checks if an object is a sector of the navigation graph: a room in space or a hub.
+
+    Args:
+        obj (Object or None): The object to check.
+
+    Returns:
+        bool: True if the object belongs in the graph.
+    """
+    return obj is not None and (obj.tags.has(SPACE_TAG[0], category=SPACE_TAG[1])
+                                or obj.tags.has(HUB_TAG[0], category=HUB_TAG[1]))
+
+
+def build_sector_graph():
+    """
+    Builds the graph of every room in space and every hub, and the exits between them,
+    from the database. Only ids are read, no typeclasses are loaded.
+
+    Returns:
+        SectorGraph: The graph with the distance fields of every hub.
+    """
+    from evennia.objects.models import ObjectDB
+
+    def tagged(key, category):
+        return ObjectDB.objects.filter(db_tags__db_key=key, db_tags__db_category=category)
+
+    nodes = (tagged(*SPACE_TAG) | tagged(*HUB_TAG)).distinct()
+    graph = SectorGraph()
+    graph.nodes.update(nodes.values_list("id", flat=True))
+    node_ids = nodes.values("id")
+    exits = ObjectDB.objects.filter(db_location__in=node_ids, db_destination__in=node_ids)
+    for exit_id, source, destination in exits.values_list("id", "db_location_id", "db_destination_id"):
+        graph.add_exit(exit_id, source, destination)
+    for hub in tagged(*HUB_TAG).values_list("id", flat=True):
+        graph.add_hub(hub)
+    return graph
+
+
+_GRAPH = None
+
+
+def get_sector_graph(build=True):
+    """
+    Returns the shared sector graph, building it from the database the first time.
+
+    Args:
+        build (bool, optional): Build the graph if it has not been built yet.
+
+    Returns:
+        SectorGraph or None: The graph, or None if it has not been built and build is False.
+    """
+    global _GRAPH
+    if _GRAPH is None and build:
+        _GRAPH = build_sector_graph()
+    return _GRAPH
@@ -0,0 +1,170 @@
+"""
+Background pre-generation of sector maps.
+
+Building a sector map on the reactor thread stalls every other player for as long as
+the generation takes, which grows with the sector size. The maps a sector will need
+next are predictable: a Space Search moves a sector to its next epoch, whose map only
+depends on the seed. So whenever a sector map is built, the map of its next epoch is
+generated ahead of time in a pool of worker processes and kept in a bounded buffer
+until the sector asks for it. If the map is not ready in time it is built inline, as
+before.
+
+The pre-generation service is started by server_services_plugins with
+SPACE_PREGEN_WORKERS worker processes and keeps up to SPACE_PREGEN_BUFFER maps.
+"""
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from twisted.application.service import Service
+from world.world_space.spacegrid import SpaceGrid
+from world.world_space.starfield import StarfieldGenerator
+from world.world_space.sectors import sector_seed
+
+
+def generate_sector(galaxy_seed, coords, epoch, width, height):
+    """
+    Generates the map of a sector epoch without overrides. Runs in a worker process.
+
+    Returns:
+        tuple: The packed SpaceGrid, see SpaceGrid.to_bytes, and whether a special event occurred.
+    """
+    generator = StarfieldGenerator(Random(sector_seed(galaxy_seed, coords, epoch)), width, height)
+    grid, special_event_occurred = generator.generate_map()
+    return grid.to_bytes(), special_event_occurred
+
+
+class SectorPregenerator():
+    """
+    Generates sector maps ahead of time in a process pool.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        capacity (int): Most maps kept ready or in progress at once.
+        maps (OrderedDict): Futures of the maps, oldest first, keyed by sector and epoch.
+        hits (int): Number of maps taken ready from the buffer.
+        misses (int): Number of maps that had to be built inline.
+
+    Methods:
+        start(): Starts the worker processes.
+        stop(): Stops the worker processes and drops the buffer.
+        request(sector, epoch): Starts generating the map of a sector epoch.
+        take(sector): Returns the ready map of a sector.
+    """
+    def __init__(self, workers=2, capacity=256):
+        self.workers = workers
+        self.capacity = capacity
+        self.pool = None
+        self.maps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """
+        Starts the worker processes. Workers are spawned rather than forked so they do not
+        inherit the threads and sockets of the server.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        """
+        Stops the worker processes and drops the buffer.
+        """
+        for future in self.maps.values():
+            future.cancel()
+        self.maps.clear()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    @staticmethod
+    def _key(sector, epoch):
+        return sector.galaxy_seed, sector.coords, epoch, sector.width, sector.height
+
+    def request(self, sector, epoch):
+        """
+        Starts generating the map of a sector epoch, dropping the oldest map if the buffer is full.
+
+        Args:
+            sector (ProceduralSector): The sector.
+            epoch (int): The epoch to generate.
+        """
+        key = self._key(sector, epoch)
+        if self.pool is None or key in self.maps:
+            return
+        while len(self.maps) >= self.capacity:
+            _, future = self.maps.popitem(last=False)
+            future.cancel()
+        self.maps[key] = self.pool.submit(generate_sector, *key)
+
+    def take(self, sector):
+        """
+        Returns the ready map of a sector at its current epoch. Maps still being generated
+        are left to finish and the caller builds the map itself.
+
+        Args:
+            sector (ProceduralSector): The sector, without overrides.
+
+        Returns:
+            tuple or None: The SpaceGrid and whether a special event occurred, or None if
+                           no map is ready.
+        """
+        key = self._key(sector, sector.epoch)
+        future = self.maps.get(key)
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            self.misses += 1
+            return None
+        del self.maps[key]
+        self.hits += 1
+        packed, special_event_occurred = future.result()
+        return SpaceGrid.from_bytes(packed), special_event_occurred
+
+
+class SectorPregenService(Service):
+    """
+    Twisted service that runs the shared SectorPregenerator while the server is up.
+    """
+    name = "sector_pregen"
+
+    def __init__(self, pregenerator):
+        self.pregenerator = pregenerator
+
+    def startService(self):
+        super().startService()
+        self.pregenerator.start()
+
+    def stopService(self):
+        self.pregenerator.stop()
+        return super().stopService()
+
+
+_PREGENERATOR = None
+
+
+def get_pregenerator():
+    """
+    Returns the running pre-generator.
+
+    Returns:
+        SectorPregenerator or None: The pre-generator, or None if the service is not running.
+    """
+    if _PREGENERATOR is None or _PREGENERATOR.pool is None:
+        return None
+    return _PREGENERATOR
+
+
+def make_service(workers, capacity):
+    """
+    Makes the pre-generation service and the shared pre-generator it runs.
+
+    Args:
+        workers (int): Number of worker processes.
+        capacity (int): Most maps kept ready or in progress at once.
+
+    Returns:
+        SectorPregenService: The service, to be added to the server.
+    """
+    global _PREGENERATOR
+    _PREGENERATOR = SectorPregenerator(workers, capacity)
+    return SectorPregenService(_PREGENERATOR)
@@ -0,0 +1,130 @@
+"""
+Render stage for space maps.
+
+Cells are turned into colour markup run by run: a colour code is only written when
+the colour changes, so the long runs of empty |000o space cost one code instead of
+one per cell. Rendered markup can then be converted once into the ANSI, xterm256 or
+HTML text a client needs, and those conversions are cached per map version by the
+grid and viewport renderers.
+"""
+import re
+from world.world_space.spacegrid import BORDER_COLOR, COLOR_CODES, DEFAULT_COLOR, DEFAULT_GLYPH
+
+FORMATS = ("markup", "ansi", "xterm256", "html")
+
+_RUNS = re.compile(rb"(.)\1*", re.DOTALL)
+
+
+def compact_cells(colors, glyphs, current=None):
+    """
+    Renders a run of cells, writing a colour code only where the colour changes.
+
+    Args:
+        colors (bytes): Colour index of every cell.
+        glyphs (str): Glyph of every cell.
+        current (str, optional): The colour code already active before the first cell.
+
+    Returns:
+        str: The colour markup of the cells.
+    """
+    parts = []
+    for run in _RUNS.finditer(colors):
+        code = COLOR_CODES[colors[run.start()]]
+        if code != current:
+            parts.append(code)
+            current = code
+        parts.append(glyphs[run.start():run.end()])
+    return "".join(parts)
+
+
+def convert_markup(markup, fmt):
+    """
+    Converts colour markup into the text sent to a kind of client.
+
+    Args:
+        markup (str): Evennia colour markup.
+        fmt (str): One of FORMATS. "markup" leaves the text as it is, "ansi" and "xterm256"
+                   give text with ANSI escape codes for 16 and 256 colour terminals, and
+                   "html" gives HTML for web pages.
+
+    Returns:
+        str: The converted text.
+    """
+    if fmt == "markup":
+        return markup
+    if fmt == "html":
+        from evennia.utils.text2html import parse_html
+
+        return parse_html(markup)
+    if fmt in ("ansi", "xterm256"):
+        from evennia.utils.ansi import parse_ansi
+
+        return parse_ansi(markup, xterm256=fmt == "xterm256")
+    raise ValueError(f"Unknown space map format {fmt!r}, expected one of {', '.join(FORMATS)}.")
+
+
+def render_grid(grid, fmt="markup"):
+    """
+    Renders a whole grid, including the border, in a format. Each format is rendered at
+    most once per version of the grid.
+
+    Args:
+        grid (SpaceGrid): The grid to render.
+        fmt (str, optional): One of FORMATS.
+
+    Returns:
+        str: The rendered space map.
+    """
+    if grid.render_cache_version != grid.version:
+        grid.render_cache = {}
+        grid.render_cache_version = grid.version
+    rendered = grid.render_cache.get(fmt)
+    if rendered is None:
+        markup = grid.render_cache.get("markup")
+        if markup is None:
+            markup = grid.render_cache["markup"] = grid_markup(grid)
+        rendered = grid.render_cache[fmt] = convert_markup(markup, fmt)
+    return rendered
+
+
+def grid_markup(grid):
+    """
+    Renders the colour markup of a whole grid. Only the objects are visited: rows without
+    objects share one string and the empty space between objects is written as runs.
+    """
+    width = grid.width
+    empty_code = COLOR_CODES[DEFAULT_COLOR]
+    object_rows = {}
+    for cell, (glyph, color) in grid.index.positions.items():
+        row, col = divmod(cell, width)
+        object_rows.setdefault(row, []).append((col, glyph, COLOR_CODES[color]))
+    empty_row = BORDER_COLOR + "!" + empty_code + DEFAULT_GLYPH * width + BORDER_COLOR + "!"
+    lines = [BORDER_COLOR + "0" + "-" * width + "0"]
+    for row in range(grid.height):
+        objects = object_rows.get(row)
+        if objects is None:
+            lines.append(empty_row)
+            continue
+        objects.sort()
+        parts = [BORDER_COLOR, "!"]
+        current = None
+        next_col = 0
+        for col, glyph, code in objects:
+            if col > next_col:
+                if current != empty_code:
+                    parts.append(empty_code)
+                    current = empty_code
+                parts.append(DEFAULT_GLYPH * (col - next_col))
+            if code != current:
+                parts.append(code)
+                current = code
+            parts.append(glyph)
+            next_col = col + 1
+        if next_col < width:
+            if current != empty_code:
+                parts.append(empty_code)
+            parts.append(DEFAULT_GLYPH * (width - next_col))
+        parts.append(BORDER_COLOR + "!")
+        lines.append("".join(parts))
+    lines.append(BORDER_COLOR + "0" + "-" * width + "0|n")
+    return "\n".join(lines)
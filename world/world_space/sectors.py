@@ -0,0 +1,115 @@
+"""
+Procedural space sectors.
+
+The map of a sector is a pure function of the galaxy seed, the sector coordinates and
+the sector epoch, so it never has to be stored and can be rebuilt on demand anywhere.
+Changes made by players are kept as a small set of overrides on top of the generated
+map. Advancing the epoch rolls a fresh map and drops the overrides of the old one.
+"""
+from hashlib import blake2b
+from random import Random
+from world.world_space.spacegrid import COLOR_INDEXES, DEFAULT_COLOR, SIZE_OF_SPACE, NUM_OF_LINES
+from world.world_space.starfield import StarfieldGenerator
+
+
+def sector_seed(galaxy_seed, coords, epoch) -> int:
+    """
+    Derives the random seed of a sector.
+
+    Args:
+        galaxy_seed (int): Seed shared by the whole galaxy.
+        coords (tuple): Integer coordinates of the sector.
+        epoch (int): How many times the sector map has been rerolled.
+
+    Returns:
+        int: A 64 bit seed unique to the sector and epoch.
+    """
+    key = ":".join(str(value) for value in (galaxy_seed, *coords, epoch))
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ProceduralSector():
+    """
+    A sector of space whose map is generated from its seed.
+
+    Attributes:
+        galaxy_seed (int): Seed shared by the whole galaxy.
+        coords (tuple): Integer coordinates of the sector.
+        epoch (int): How many times the sector map has been rerolled.
+        overrides (dict): Player made changes, mapping (row, col) to (glyph, color).
+        width (int): Number of cells in a row of the sector.
+        height (int): Number of rows of the sector.
+
+    Methods:
+        seed(): Returns the random seed of the current epoch.
+        build(): Generates the sector map with the overrides applied.
+        change_map(new_elements): Records player made changes as overrides.
+        advance(): Moves the sector to its next epoch.
+    """
+    def __init__(self, galaxy_seed, coords, epoch=0, overrides=None, width=SIZE_OF_SPACE, height=NUM_OF_LINES):
+        self.galaxy_seed = galaxy_seed
+        self.coords = tuple(coords)
+        self.epoch = epoch
+        self.overrides = dict(overrides) if overrides else {}
+        self.width = width
+        self.height = height
+
+    def seed(self) -> int:
+        """
+        Returns the random seed of the current epoch.
+
+        Returns:
+            int: The seed of the sector.
+        """
+        return sector_seed(self.galaxy_seed, self.coords, self.epoch)
+
+    def build(self):
+        """
+        Generates the sector map with the overrides applied. Building the same sector
+        and epoch always gives the same map and special event.
+
+        Returns:
+            tuple: The SpaceGrid of the sector and whether a special event occurred.
+        """
+        generator = StarfieldGenerator(Random(self.seed()), self.width, self.height)
+        grid, special_event_occurred = generator.generate_map()
+        for (row, col), (glyph, color) in self.overrides.items():
+            # Overrides made before the sector geometry shrank fall outside the map
+            if grid.in_bounds(row, col):
+                grid.set_cell(row, col, glyph, color)
+        return grid, special_event_occurred
+
+    def change_map(self, new_elements, grid=None):
+        """
+        Records player made changes as overrides, and applies them to a built grid if given.
+
+        Args:
+            new_elements (list of tuples): (row, col, element) tuples as taken by SpaceDescHandler.change_map.
+            grid (SpaceGrid, optional): A grid built from this sector to update as well.
+
+        Returns:
+            list: The (row, col) cells that were changed.
+        """
+        changed = []
+        for row, col, new_element in new_elements:
+            if not (0 <= row < self.height and 0 <= col < self.width):
+                continue
+            glyph, color = new_element[-1], COLOR_INDEXES.get(new_element[:-1])
+            if color is None:
+                color = grid.get_cell(row, col)[1] if grid is not None else DEFAULT_COLOR
+            self.overrides[(row, col)] = (glyph, color)
+            if grid is not None:
+                grid.set_cell(row, col, glyph, color)
+            changed.append((row, col))
+        return changed
+
+    def advance(self):
+        """
+        Moves the sector to its next epoch, which rerolls its map and drops the overrides.
+
+        Returns:
+            int: The new epoch.
+        """
+        self.epoch += 1
+        self.overrides = {}
+        return self.epoch
@@ -0,0 +1,417 @@
+"""
+Memory-mapped binary store of sector state.
+
+Every stored sector takes one fixed size record in a single file, so the record of a
+sector is found with an offset into the file and read as a slice of the memory map
+instead of a database query and an unpickle. A record holds:
+
+    x, y, epoch        three signed 64 bit integers, an epoch of -1 means never searched
+    flags              one byte, see FLAG_USED, FLAG_GRID and FLAG_TRUNCATED
+    override count     two bytes, after one padding byte
+    overrides          max_overrides slots of row, col (two bytes each), glyph and colour
+    glyphs, colors     one byte per cell each, when FLAG_GRID is set
+
+All numbers are little endian. The file starts with a header giving the sector size
+and the number of override slots, so every record in a file has the same size. The
+offset index from coordinates to records is rebuilt from the record headers when the
+file is opened, and deleted records are reused.
+
+A file made for another sector size than the one asked for, because the sector
+geometry changed since, keeps its record layout but only serves the epochs and
+overrides: its maps are of the old size, so none are read or stored and the maps are
+rebuilt from the seed instead.
+
+The galaxy saves its chunks here through SectorChunkStore. Space maps rooms used to
+keep as their desc are moved in with import_room_descs and written back with
+export_room_descs, for example from `evennia shell`.
+"""
+import mmap
+import os
+import struct
+from world.world_space.spacegrid import SpaceGrid
+
+MAGIC = b"SGSECTR1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHHHI")
+HEADER_SIZE = 64
+RECORD_HEADER = struct.Struct("<qqqBxH")
+FLAGS_OFFSET = struct.calcsize("<qqq")  # Where the flags byte sits in a record
+OVERRIDE = struct.Struct("<HHBB")
+DEFAULT_MAX_OVERRIDES = 64
+
+FLAG_USED = 1  # The record holds a sector, otherwise it is free for reuse
+FLAG_GRID = 2  # The record holds the cells of the sector map
+FLAG_TRUNCATED = 4  # The overrides did not fit in the slots and only the map holds them all
+
+NO_EPOCH = -1
+
+
+class SectorStore():
+    """
+    A file of fixed size sector records accessed through mmap.
+
+    Attributes:
+        path (str): The file the records are kept in.
+        width (int): Number of cells in a row of the sector maps.
+        height (int): Number of rows of the sector maps.
+        max_overrides (int): Number of override slots in a record, as laid out in the file.
+        record_width (int): Number of cells in a row of the maps the records have room for.
+        record_height (int): Number of rows of the maps the records have room for.
+        keeps_grids (bool): Whether the records fit maps of the sector size, otherwise only
+                            epochs and overrides are read and stored.
+        record_size (int): Size of one record in bytes.
+        index (dict): Record numbers keyed by sector coordinates.
+
+    Methods:
+        read(coords): Returns the stored state of a sector.
+        fits(overrides, grid): Whether the state of a sector can be stored.
+        write(coords, epoch, overrides, grid): Stores the state of a sector.
+        delete(coords): Removes a sector.
+        flush(): Writes the changed pages of the file to disk.
+        close(): Flushes and closes the file.
+    """
+    def __init__(self, path, width, height, max_overrides=DEFAULT_MAX_OVERRIDES):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        self.file = open(path, "r+b" if exists else "w+b")
+        record_width, record_height = width, height
+        if exists:
+            magic, version, record_width, record_height, max_overrides, capacity = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                self.file.close()
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} sector store.")
+        else:
+            capacity = 0
+            self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, width, height, max_overrides, capacity).ljust(HEADER_SIZE, b"\0"))
+            self.file.flush()
+        self.width = width
+        self.height = height
+        self.record_width = record_width
+        self.record_height = record_height
+        self.keeps_grids = (record_width, record_height) == (width, height)
+        self.max_overrides = max_overrides
+        self.cells = record_width * record_height
+        self.grid_offset = RECORD_HEADER.size + OVERRIDE.size * max_overrides
+        self.record_size = self.grid_offset + 2 * self.cells
+        self.capacity = capacity
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.index = {}
+        self.free = []
+        for record in range(capacity):
+            x, y, _, flags, _ = RECORD_HEADER.unpack_from(self.map, self._offset(record))
+            if flags & FLAG_USED:
+                self.index[(x, y)] = record
+            else:
+                self.free.append(record)
+        self.free.reverse()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, coords):
+        return tuple(coords) in self.index
+
+    def read(self, coords):
+        """
+        Returns the stored state of a sector.
+
+        Args:
+            coords (tuple): The (x, y) coordinates of the sector.
+
+        Returns:
+            tuple or None: The epoch (None if never searched), the overrides and the SpaceGrid
+                           (None if the map was not stored or is of another size than the
+                           sectors), or None if the sector is not stored.
+        """
+        record = self.index.get(tuple(coords))
+        if record is None:
+            return None
+        offset = self._offset(record)
+        _, _, epoch, flags, count = RECORD_HEADER.unpack_from(self.map, offset)
+        overrides = {}
+        for slot in OVERRIDE.iter_unpack(self.map[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + OVERRIDE.size * count]):
+            row, col, glyph, color = slot
+            overrides[(row, col)] = (chr(glyph), color)
+        grid = None
+        if flags & FLAG_GRID and self.keeps_grids:
+            start = offset + self.grid_offset
+            grid = SpaceGrid(self.width, self.height)
+            grid.glyphs[:] = self.map[start:start + self.cells]
+            grid.colors[:] = self.map[start + self.cells:start + 2 * self.cells]
+            grid.reindex()
+        return (None if epoch == NO_EPOCH else epoch), overrides, grid
+
+    def fits(self, overrides, grid=None):
+        """
+        Returns whether the state of a sector can be stored. Overrides that do not fit in
+        the slots need a stored map to keep them.
+
+        Args:
+            overrides (dict): Player made changes, mapping (row, col) to (glyph, color).
+            grid (SpaceGrid, optional): The sector map.
+
+        Returns:
+            bool: True if write can store the sector.
+        """
+        return len(overrides) <= self.max_overrides or (grid is not None and self.keeps_grids)
+
+    def write(self, coords, epoch, overrides, grid=None):
+        """
+        Stores the state of a sector, replacing any earlier record of it.
+
+        Args:
+            coords (tuple): The (x, y) coordinates of the sector.
+            epoch (int or None): The sector epoch.
+            overrides (dict): Player made changes, mapping (row, col) to (glyph, color).
+            grid (SpaceGrid, optional): The sector map, stored so it never has to be rebuilt.
+                                        Not stored if the records have no room for maps of
+                                        the sector size.
+
+        Raises:
+            ValueError: If the coordinates are not two integers, the map is not the size of
+                        the store, or there are more overrides than slots and no map to hold them.
+        """
+        coords = tuple(coords)
+        if len(coords) != 2:
+            raise ValueError(f"Sector coordinates {coords} must be two integers.")
+        if grid is not None and (grid.width, grid.height) != (self.width, self.height):
+            raise ValueError(f"A {grid.width}x{grid.height} map does not fit a {self.width}x{self.height} sector store.")
+        if not self.fits(overrides, grid):
+            raise ValueError(f"Sector {coords} has more than {self.max_overrides} overrides and no map to keep them.")
+        if not self.keeps_grids:
+            grid = None
+        flags = FLAG_USED
+        if grid is not None:
+            flags |= FLAG_GRID
+        if len(overrides) > self.max_overrides:
+            flags |= FLAG_TRUNCATED
+        record = self.index.get(coords)
+        if record is None:
+            record = self._allocate()
+            self.index[coords] = record
+        offset = self._offset(record)
+        slots = list(overrides.items())[:self.max_overrides]
+        RECORD_HEADER.pack_into(self.map, offset, coords[0], coords[1], NO_EPOCH if epoch is None else epoch, flags, len(slots))
+        slot_offset = offset + RECORD_HEADER.size
+        for (row, col), (glyph, color) in slots:
+            OVERRIDE.pack_into(self.map, slot_offset, row, col, ord(glyph), color or 0)
+            slot_offset += OVERRIDE.size
+        if grid is not None:
+            start = offset + self.grid_offset
+            self.map[start:start + self.cells] = grid.glyphs
+            self.map[start + self.cells:start + 2 * self.cells] = grid.colors
+
+    def delete(self, coords):
+        """
+        Removes a sector. Its record is reused by the next sector stored.
+
+        Args:
+            coords (tuple): The (x, y) coordinates of the sector.
+
+        Returns:
+            bool: True if the sector was stored.
+        """
+        record = self.index.pop(tuple(coords), None)
+        if record is None:
+            return False
+        self.map[self._offset(record) + FLAGS_OFFSET] = 0
+        self.free.append(record)
+        return True
+
+    def flush(self):
+        """
+        Writes the changed pages of the file to disk.
+        """
+        self.map.flush()
+
+    def close(self):
+        """
+        Flushes and closes the file.
+        """
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def _offset(self, record):
+        return HEADER_SIZE + record * self.record_size
+
+    def _allocate(self):
+        """
+        Returns a free record, doubling the file when it is full.
+        """
+        if not self.free:
+            capacity = max(self.capacity * 2, 16)
+            self.map.flush()
+            self.map.close()
+            self.file.truncate(HEADER_SIZE + capacity * self.record_size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            HEADER.pack_into(
+                self.map, 0, MAGIC, FORMAT_VERSION, self.record_width, self.record_height, self.max_overrides, capacity
+            )
+            self.free = list(range(capacity - 1, self.capacity - 1, -1))
+            self.capacity = capacity
+        return self.free.pop()
+
+
+class SectorChunkStore():
+    """
+    Saves the chunks of the galaxy in a SectorStore, one record per sector with state.
+
+    Chunks saved before the galaxy was moved to a sector store are still read from the
+    fallback store until they are saved again. Chunks with a sector the store cannot
+    keep, with more overrides than slots and no stored map to hold them, are saved whole
+    in the fallback store instead.
+
+    Attributes:
+        store (SectorStore): Where the sectors are kept.
+        chunk_size (int): Number of sectors per side of a chunk.
+        fallback: A store with load(coords) and save(coords, record) to read older chunks
+                  from and to keep chunks the store cannot.
+
+    Methods:
+        load(coords): Returns the saved record of a chunk.
+        save(coords, record): Saves the record of a chunk.
+    """
+    def __init__(self, store, chunk_size, fallback=None):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.fallback = fallback
+        self.from_fallback = set()
+        self.chunk_sectors = {}
+        for coords in store.index:
+            self.chunk_sectors.setdefault(self._chunk(coords), set()).add(coords)
+
+    def _chunk(self, coords):
+        return tuple(value // self.chunk_size for value in coords)
+
+    def load(self, coords):
+        """
+        Returns the saved record of a chunk.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+
+        Returns:
+            dict or None: (epoch, overrides, grid) tuples keyed by sector coordinates, or None
+                          if the chunk was never saved.
+        """
+        sectors = self.chunk_sectors.get(tuple(coords))
+        if sectors:
+            record = {}
+            for sector in sectors:
+                state = self.store.read(sector)
+                if state is not None:
+                    record[sector] = state
+            if record:
+                return record
+        if self.fallback is not None:
+            record = self.fallback.load(coords)
+            if record:
+                self.from_fallback.add(tuple(coords))
+            return record
+        return None
+
+    def save(self, coords, record):
+        """
+        Saves the record of a chunk, removing the sectors that no longer have any state.
+        Every sector is checked before anything is changed.
+
+        Args:
+            coords (tuple): Coordinates of the chunk.
+            record (dict): The record made by GalaxyChunk.to_record.
+
+        Raises:
+            ValueError: If the store cannot keep a sector of the chunk and there is no fallback store.
+        """
+        coords = tuple(coords)
+        size = (self.store.width, self.store.height)
+        writes = {}
+        for sector, (epoch, overrides, grid) in record.items():
+            # Maps of another size, made before the sector geometry changed, are rebuilt from the seed instead
+            if grid is not None and (grid.width, grid.height) != size:
+                grid = None
+            writes[tuple(sector)] = (epoch, overrides, grid)
+        in_fallback = not all(self.store.fits(overrides, grid) for _, overrides, grid in writes.values())
+        if in_fallback:
+            if self.fallback is None:
+                raise ValueError(f"Chunk {coords} has a sector with more overrides than the sector store can keep.")
+            self.fallback.save(coords, record)
+            self.from_fallback.add(coords)
+            writes = {}
+
+        sectors = self.chunk_sectors.setdefault(coords, set())
+        for sector in sectors - set(writes):
+            self.store.delete(sector)
+            sectors.discard(sector)
+        for sector, (epoch, overrides, grid) in writes.items():
+            self.store.write(sector, epoch, overrides, grid)
+            sectors.add(sector)
+        if not sectors:
+            del self.chunk_sectors[coords]
+        self.store.flush()
+        if not in_fallback and coords in self.from_fallback:
+            self.fallback.save(coords, None)
+            self.from_fallback.discard(coords)
+
+
+def import_room_descs(rooms=None, galaxy=None):
+    """
+    Moves the space maps SpaceRooms kept as their desc into the galaxy, as the map of the
+    first epoch of the room's sector. Sectors that already have a map are left alone. The
+    maps are only kept if the galaxy saves to a SectorStore, which stores the cells.
+
+    Args:
+        rooms (iterable, optional): The rooms to import, by default every room tagged is_in_space.
+        galaxy (GalaxyManager, optional): The galaxy to import into, by default the shared one.
+
+    Returns:
+        tuple: The number of rooms imported and a list of (room, error) for the rooms that failed.
+    """
+    from world.world_space.galaxy import get_galaxy
+
+    galaxy = galaxy or get_galaxy()
+    rooms = _space_rooms() if rooms is None else rooms
+    imported, failed = 0, []
+    for room in rooms:
+        desc = room.db.desc
+        if not desc or not isinstance(desc, str) or "!" not in desc:
+            continue
+        coords = room.get_sector_coords()
+        if galaxy.sector(coords).epoch is not None:
+            continue
+        try:
+            grid = SpaceGrid.from_markup(desc)
+        except (ValueError, KeyError) as err:
+            failed.append((room, str(err)))
+            continue
+        galaxy.set_sector(coords, 0, {}, grid)
+        imported += 1
+    galaxy.flush()
+    return imported, failed
+
+
+def export_room_descs(rooms=None):
+    """
+    Writes the current space map of SpaceRooms back into their desc as colour markup,
+    the format import_room_descs reads.
+
+    Args:
+        rooms (iterable, optional): The rooms to export, by default every room tagged is_in_space.
+
+    Returns:
+        int: The number of rooms whose desc was written.
+    """
+    rooms = _space_rooms() if rooms is None else rooms
+    exported = 0
+    for room in rooms:
+        grid = room.get_space(None)
+        if grid is not None:
+            room.db.desc = grid.render()
+            exported += 1
+    return exported
+
+
+def _space_rooms():
+    from evennia import search_tag
+
+    return search_tag("is_in_space", category="space_room")
@@ -0,0 +1,364 @@
+"""
+Compact grid storage for space maps.
+
+A space map used to be a list of strings packed with `|000o` colour tokens. The
+SpaceGrid keeps one byte for the glyph and one byte for the colour of every cell
+instead, so generation, mutation and counting never have to touch colour codes.
+ANSI markup is only produced when the grid is rendered.
+
+Every grid also carries an index of the space objects it holds, which is kept up
+to date as cells change so counting and listing objects never scans the map.
+"""
+import re
+from itertools import count
+from world.world_space.spatial import SpatialHash
+
+SIZE_OF_SPACE = 75  # Number of cells in one row of space
+NUM_OF_LINES = 25  # Number of rows of space
+
+DEFAULT_GLYPH = "o"  # Empty space is drawn as a black 'o'
+DEFAULT_COLOR = 0  # Index of |000 in COLOR_CODES
+BORDER_COLOR = "|055"
+
+# All 216 xterm colours, indexed by r * 36 + g * 6 + b
+COLOR_CODES = tuple("|{}{}{}".format(r, g, b) for r in range(6) for g in range(6) for b in range(6))
+COLOR_INDEXES = {code: index for index, code in enumerate(COLOR_CODES)}
+
+_DEFAULT_GLYPH_BYTE = ord(DEFAULT_GLYPH)
+_OBJECT_GLYPHS = re.compile(b"[^" + DEFAULT_GLYPH.encode("ascii") + b"]")
+_SERIALS = count(1)
+_MARKUP_TOKENS = re.compile(r"\|(\d\d\d)|\|.|([^|])")
+
+
+def color_index(red, green, blue):
+    """
+    Converts an xterm colour triple into an index into COLOR_CODES.
+
+    Args:
+        red (int): Red component between 0 and 5.
+        green (int): Green component between 0 and 5.
+        blue (int): Blue component between 0 and 5.
+
+    Returns:
+        int: The colour index between 0 and 215.
+    """
+    return red * 36 + green * 6 + blue
+
+
+class SpaceObjectIndex():
+    """
+    Index of the space objects in a grid.
+
+    Attributes:
+        positions (dict): Maps the cell index of every object to its glyph and colour index.
+        glyph_counts (dict): Number of objects of each glyph.
+        color_counts (dict): Number of objects of each colour index.
+
+    Methods:
+        add(cell, glyph, color): Adds an object to the index.
+        remove(cell): Removes the object in a cell from the index.
+        clear(): Empties the index.
+    """
+    def __init__(self):
+        self.positions = {}
+        self.glyph_counts = {}
+        self.color_counts = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, cell, glyph, color):
+        """
+        Adds an object to the index, replacing any object already in the cell.
+
+        Args:
+            cell (int): Cell index of the object.
+            glyph (str): Glyph of the object.
+            color (int): Colour index of the object.
+        """
+        if cell in self.positions:
+            self.remove(cell)
+        self.positions[cell] = (glyph, color)
+        self.glyph_counts[glyph] = self.glyph_counts.get(glyph, 0) + 1
+        self.color_counts[color] = self.color_counts.get(color, 0) + 1
+
+    def remove(self, cell):
+        """
+        Removes the object in a cell from the index.
+
+        Args:
+            cell (int): Cell index of the object.
+        """
+        glyph, color = self.positions.pop(cell)
+        self._decrement(self.glyph_counts, glyph)
+        self._decrement(self.color_counts, color)
+
+    def clear(self):
+        """
+        Empties the index.
+        """
+        self.positions.clear()
+        self.glyph_counts.clear()
+        self.color_counts.clear()
+
+    @staticmethod
+    def _decrement(counts, key):
+        if counts[key] == 1:
+            del counts[key]
+        else:
+            counts[key] -= 1
+
+
+class SpaceGrid():
+    """
+    A fixed size map of space backed by two bytearrays.
+
+    Cells are addressed by (row, col) starting at the top left cell inside the
+    border. Every cell holds a glyph and a colour index; cells holding the default
+    glyph are empty space, everything else is a space object.
+
+    Attributes:
+        width (int): Number of cells in a row.
+        height (int): Number of rows.
+        glyphs (bytearray): The glyph of every cell, row by row.
+        colors (bytearray): The colour index of every cell, row by row.
+        index (SpaceObjectIndex): The space objects in the grid.
+        spatial (SpatialHash): Spatial index of the objects, built on first use by get_spatial.
+        serial (int): Tells this grid apart from every other grid made by the process.
+        version (int): Counts the changes made to the cells, so renders of the grid can be reused.
+        render_cache (dict): Renders of the grid at render_cache_version, keyed by format.
+
+    Methods:
+        in_bounds(row, col): Checks that a cell lies inside the grid.
+        get_cell(row, col): Returns the glyph and colour of a cell.
+        set_cell(row, col, glyph, color): Places a glyph in a cell.
+        clear_cell(row, col): Resets a cell to empty space.
+        place_object(cell, glyph, color): Places an object by its cell index.
+        count_objects(): Counts the cells that are not empty space.
+        objects(): Yields every space object in the grid.
+        reindex(): Rebuilds the object index from the cells.
+        get_spatial(): Returns the spatial index of the objects.
+        render(): Returns the grid as colour coded text.
+        to_bytes(): Packs the grid into bytes for storage.
+        from_bytes(data): Rebuilds a grid packed by to_bytes.
+        from_markup(text): Rebuilds a grid from a space map rendered as colour markup.
+    """
+    def __init__(self, width=SIZE_OF_SPACE, height=NUM_OF_LINES):
+        self.width = width
+        self.height = height
+        self.glyphs = bytearray(DEFAULT_GLYPH, "ascii") * (width * height)
+        self.colors = bytearray(width * height)
+        self.index = SpaceObjectIndex()
+        self.spatial = None
+        self.serial = next(_SERIALS)
+        self.version = 0
+        self.render_cache = {}
+        self.render_cache_version = None
+
+    def in_bounds(self, row, col):
+        """
+        Checks that a cell lies inside the grid.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+
+        Returns:
+            bool: True if the cell is inside the grid.
+        """
+        return 0 <= row < self.height and 0 <= col < self.width
+
+    def get_cell(self, row, col):
+        """
+        Returns the glyph and colour of a cell.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+
+        Returns:
+            tuple: The glyph (str) and colour index (int) of the cell.
+        """
+        index = row * self.width + col
+        return chr(self.glyphs[index]), self.colors[index]
+
+    def set_cell(self, row, col, glyph, color=None):
+        """
+        Places a glyph in a cell.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+            glyph (str): A single character to draw in the cell.
+            color (int, optional): Colour index of the cell. Keeps the current colour if not given.
+                                   Empty space always takes the default colour.
+        """
+        index = row * self.width + col
+        if glyph == DEFAULT_GLYPH:
+            # Empty space is always drawn in the default colour
+            self.glyphs[index] = _DEFAULT_GLYPH_BYTE
+            self.colors[index] = DEFAULT_COLOR
+            self.version += 1
+            if index in self.index.positions:
+                self.index.remove(index)
+                if self.spatial is not None:
+                    self.spatial.remove(row, col)
+        else:
+            self.place_object(index, glyph, self.colors[index] if color is None else color)
+
+    def place_object(self, cell, glyph, color):
+        """
+        Places a space object by its cell index and adds it to the object index.
+
+        Args:
+            cell (int): Index of the cell, row * width + col.
+            glyph (str): A single character other than the empty space glyph.
+            color (int): Colour index of the object.
+        """
+        self.glyphs[cell] = ord(glyph)
+        self.colors[cell] = color
+        self.version += 1
+        self.index.add(cell, glyph, color)
+        if self.spatial is not None:
+            row, col = divmod(cell, self.width)
+            self.spatial.add(row, col, glyph, color)
+
+    def clear_cell(self, row, col):
+        """
+        Resets a cell to empty space.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+        """
+        self.set_cell(row, col, DEFAULT_GLYPH, DEFAULT_COLOR)
+
+    def count_objects(self):
+        """
+        Counts the cells that are not empty space.
+
+        Returns:
+            int: The number of space objects in the grid.
+        """
+        return len(self.index)
+
+    def objects(self):
+        """
+        Yields every space object in the grid.
+
+        Yields:
+            tuple: The row, column, glyph and colour index of each object.
+        """
+        width = self.width
+        for cell, (glyph, color) in self.index.positions.items():
+            row, col = divmod(cell, width)
+            yield row, col, glyph, color
+
+    def reindex(self):
+        """
+        Rebuilds the object index from the cells, for grids whose bytes were written directly.
+        """
+        self.index.clear()
+        self.spatial = None
+        self.version += 1
+        colors = self.colors
+        for match in _OBJECT_GLYPHS.finditer(self.glyphs):
+            cell = match.start()
+            self.index.add(cell, chr(self.glyphs[cell]), colors[cell])
+
+    def get_spatial(self):
+        """
+        Returns the spatial index of the objects, building it the first time. Once built
+        it is kept up to date as cells change.
+
+        Returns:
+            SpatialHash: The spatial index.
+        """
+        if self.spatial is None:
+            self.spatial = SpatialHash.from_grid(self)
+        return self.spatial
+
+    def render(self, fmt="markup"):
+        """
+        Returns the grid as colour coded text, including the border.
+
+        Args:
+            fmt (str, optional): The output format, see world.world_space.render.FORMATS.
+
+        Returns:
+            str: The rendered space map.
+        """
+        from world.world_space.render import render_grid
+
+        return render_grid(self, fmt)
+
+    def to_bytes(self):
+        """
+        Packs the grid into bytes so it can be stored in an Attribute.
+
+        Returns:
+            bytes: The packed grid.
+        """
+        return self.width.to_bytes(2, "big") + self.height.to_bytes(2, "big") + bytes(self.glyphs) + bytes(self.colors)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuilds a grid packed by to_bytes.
+
+        Args:
+            data (bytes): The packed grid.
+
+        Returns:
+            SpaceGrid: The unpacked grid.
+        """
+        width = int.from_bytes(data[0:2], "big")
+        height = int.from_bytes(data[2:4], "big")
+        cells = width * height
+        grid = cls(width, height)
+        grid.glyphs[:] = data[4:4 + cells]
+        grid.colors[:] = data[4 + cells:4 + 2 * cells]
+        grid.reindex()
+        return grid
+
+    @classmethod
+    def from_markup(cls, text):
+        """
+        Rebuilds a grid from a space map rendered as colour markup, including the space maps
+        rooms used to keep as their desc. The first and last lines are the border, every
+        other line is one row of cells between two '!' border characters.
+
+        Args:
+            text (str): The rendered space map.
+
+        Returns:
+            SpaceGrid: The grid drawn by the markup.
+
+        Raises:
+            ValueError: If the text is not a space map with rows of equal length.
+        """
+        lines = text.split("\n")[1:-1]
+        rows = []
+        for line in lines:
+            start, end = line.find("!"), line.rfind("!")
+            if start == end:
+                raise ValueError("A space map row must lie between two '!' border characters.")
+            color = DEFAULT_COLOR
+            cells = []
+            for match in _MARKUP_TOKENS.finditer(line[start + 1:end]):
+                code, glyph = match.groups()
+                if code is not None:
+                    color = COLOR_INDEXES["|" + code]
+                elif glyph is not None:
+                    cells.append((glyph, color))
+            rows.append(cells)
+        if not rows or any(len(cells) != len(rows[0]) for cells in rows) or not rows[0]:
+            raise ValueError("A space map needs at least one row, and all rows must be the same length.")
+        grid = cls(len(rows[0]), len(rows))
+        for row, cells in enumerate(rows):
+            offset = row * grid.width
+            for col, (glyph, color) in enumerate(cells):
+                grid.glyphs[offset + col] = ord(glyph)
+                grid.colors[offset + col] = DEFAULT_COLOR if glyph == DEFAULT_GLYPH else color
+        grid.reindex()
+        return grid
@@ -0,0 +1,177 @@
+"""
+Spatial index over the space objects of a grid.
+
+Objects are hashed into square buckets of cells, so a radius scan only looks at the
+buckets overlapping the scan and a nearest object search walks outwards ring by ring
+until nothing closer can exist. The cost of a scan depends on the area scanned and the
+objects found, not on the size of the sector.
+"""
+from math import hypot
+
+BUCKET_SIZE = 8  # Width and height of a bucket in cells
+
+
+class SpatialHash():
+    """
+    A uniform grid hash of space objects.
+
+    Attributes:
+        bucket_size (int): Width and height of a bucket in cells.
+        buckets (dict): Maps (bucket row, bucket col) to a dict of (row, col) -> (glyph, color).
+
+    Methods:
+        add(row, col, glyph, color): Adds an object.
+        remove(row, col): Removes an object.
+        within(row, col, radius, glyphs): Finds the objects within a radius.
+        in_rect(top, left, bottom, right): Finds the objects inside a rectangle.
+        nearest(row, col, glyphs, max_radius): Finds the closest object.
+    """
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self.buckets = {}
+
+    @classmethod
+    def from_grid(cls, grid, bucket_size=BUCKET_SIZE):
+        """
+        Builds a spatial hash of the objects in a grid.
+
+        Args:
+            grid (SpaceGrid): The grid to index.
+            bucket_size (int, optional): Width and height of a bucket in cells.
+
+        Returns:
+            SpatialHash: The new spatial hash.
+        """
+        spatial = cls(bucket_size)
+        for row, col, glyph, color in grid.objects():
+            spatial.add(row, col, glyph, color)
+        return spatial
+
+    def add(self, row, col, glyph, color):
+        """
+        Adds an object, replacing any object already in the cell.
+
+        Args:
+            row (int): Row of the object.
+            col (int): Column of the object.
+            glyph (str): Glyph of the object.
+            color (int): Colour index of the object.
+        """
+        key = (row // self.bucket_size, col // self.bucket_size)
+        self.buckets.setdefault(key, {})[(row, col)] = (glyph, color)
+
+    def remove(self, row, col):
+        """
+        Removes an object if there is one in the cell.
+
+        Args:
+            row (int): Row of the object.
+            col (int): Column of the object.
+        """
+        key = (row // self.bucket_size, col // self.bucket_size)
+        bucket = self.buckets.get(key)
+        if bucket and bucket.pop((row, col), None) is not None and not bucket:
+            del self.buckets[key]
+
+    def within(self, row, col, radius, glyphs=None):
+        """
+        Finds the objects within a radius of a cell.
+
+        Args:
+            row (int): Row of the centre of the scan.
+            col (int): Column of the centre of the scan.
+            radius (float): Largest distance in cells to include.
+            glyphs (set, optional): Only include objects with these glyphs.
+
+        Returns:
+            list: (distance, row, col, glyph, color) tuples sorted by distance.
+        """
+        size = self.bucket_size
+        reach = int(radius)
+        found = []
+        for bucket_row in range((row - reach) // size, (row + reach) // size + 1):
+            for bucket_col in range((col - reach) // size, (col + reach) // size + 1):
+                found.extend(self._scan_bucket(bucket_row, bucket_col, row, col, radius, glyphs))
+        found.sort()
+        return found
+
+    def in_rect(self, top, left, bottom, right):
+        """
+        Finds the objects inside a rectangle of cells.
+
+        Args:
+            top (int): First row of the rectangle.
+            left (int): First column of the rectangle.
+            bottom (int): Row just below the rectangle.
+            right (int): Column just right of the rectangle.
+
+        Returns:
+            list: (row, col, glyph, color) tuples of the objects inside.
+        """
+        size = self.bucket_size
+        found = []
+        for bucket_row in range(top // size, (bottom - 1) // size + 1):
+            for bucket_col in range(left // size, (right - 1) // size + 1):
+                bucket = self.buckets.get((bucket_row, bucket_col))
+                if not bucket:
+                    continue
+                for (row, col), (glyph, color) in bucket.items():
+                    if top <= row < bottom and left <= col < right:
+                        found.append((row, col, glyph, color))
+        return found
+
+    def nearest(self, row, col, glyphs=None, max_radius=None):
+        """
+        Finds the object closest to a cell by searching rings of buckets outwards.
+
+        Args:
+            row (int): Row to search from.
+            col (int): Column to search from.
+            glyphs (set, optional): Only consider objects with these glyphs.
+            max_radius (float, optional): Give up beyond this distance.
+
+        Returns:
+            tuple or None: (distance, row, col, glyph, color) of the closest object, or None.
+        """
+        if not self.buckets:
+            return None
+        size = self.bucket_size
+        centre_row, centre_col = row // size, col // size
+        rows = [key[0] for key in self.buckets]
+        cols = [key[1] for key in self.buckets]
+        max_ring = max(abs(centre_row - min(rows)), abs(centre_row - max(rows)),
+                       abs(centre_col - min(cols)), abs(centre_col - max(cols)))
+        limit = float("inf") if max_radius is None else max_radius
+        best = None
+        for ring in range(max_ring + 1):
+            # Anything in this ring or beyond is at least this far away
+            if (ring - 1) * size > (best[0] if best else limit):
+                break
+            for bucket_row, bucket_col in self._ring(centre_row, centre_col, ring):
+                for candidate in self._scan_bucket(bucket_row, bucket_col, row, col, limit, glyphs):
+                    if best is None or candidate < best:
+                        best = candidate
+        return best
+
+    def _scan_bucket(self, bucket_row, bucket_col, row, col, radius, glyphs):
+        bucket = self.buckets.get((bucket_row, bucket_col))
+        if not bucket:
+            return
+        for (obj_row, obj_col), (glyph, color) in bucket.items():
+            if glyphs is not None and glyph not in glyphs:
+                continue
+            distance = hypot(obj_row - row, obj_col - col)
+            if distance <= radius:
+                yield distance, obj_row, obj_col, glyph, color
+
+    @staticmethod
+    def _ring(centre_row, centre_col, ring):
+        if ring == 0:
+            yield centre_row, centre_col
+            return
+        for offset in range(-ring, ring + 1):
+            yield centre_row - ring, centre_col + offset
+            yield centre_row + ring, centre_col + offset
+        for offset in range(-ring + 1, ring):
+            yield centre_row + offset, centre_col - ring
+            yield centre_row + offset, centre_col + ring
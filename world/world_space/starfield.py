@@ -0,0 +1,177 @@
+"""
+Starfield generation engine for space maps.
+
+Every cell of a fresh map becomes a space object with the same small chance, so
+instead of rolling once per cell the generator draws the gap to the next object
+from a geometric distribution. Generating a map costs one draw per object placed
+rather than one per cell, and many maps can be generated in one batch call.
+"""
+from math import floor, log
+from random import Random
+from world.world_space.spacegrid import SpaceGrid, COLOR_CODES, SIZE_OF_SPACE, NUM_OF_LINES, color_index
+
+# The glyphs a map is made of, and the kind of loot each one is
+SPACE_OBJECT_TYPES = {
+    "*": "Star shards",
+    "'": "Comet ice",
+    ".": "Stardust",
+    "`": "Hull debris",
+}
+SPACE_OBJECTS = tuple(SPACE_OBJECT_TYPES)
+
+# Special event fields hold a singularity on top of their ordinary objects
+SINGULARITY_GLYPH = "@"
+SINGULARITY_COLOR = color_index(5, 0, 5)
+LOOT_TYPES = dict(SPACE_OBJECT_TYPES, **{SINGULARITY_GLYPH: "Singularity"})
+
+# Classes of objects that sensors can look for
+OBJECT_CLASSES = {
+    "singularity": {SINGULARITY_GLYPH},
+    "star": {"*"},
+    "comet": {"'"},
+    "dust": {"."},
+    "debris": {"`"},
+}
+CHANCE_OF_CHANGE = 1000  # A cell changes when randint(1, probability) >= this value
+COMMON_PROBABILITIES = (990, 1001)  # Most maps roll their probability in this range
+UNCOMMON_ODDS = 101  # One map in this many is uncommon, half busy and half special
+BUSY_PROBABILITY = 1010
+SPECIAL_EVENT_PROBABILITY = 2000
+
+_NUMBER_OF_COLORS = len(COLOR_CODES)
+
+
+def object_chance(probability):
+    """
+    Returns the chance that a single cell becomes a space object.
+
+    Args:
+        probability (int): The upper bound of the per cell roll, see StarfieldGenerator.roll_probability.
+
+    Returns:
+        float: The chance between 0 and 1.
+    """
+    return max(0, probability - CHANCE_OF_CHANGE + 1) / probability
+
+
+def probability_weights():
+    """
+    Returns the chance of every probability StarfieldGenerator.roll_probability can roll.
+
+    Returns:
+        dict: The chance between 0 and 1 of each probability.
+    """
+    low, high = COMMON_PROBABILITIES
+    common = (UNCOMMON_ODDS - 1) / UNCOMMON_ODDS / (high - low + 1)
+    weights = {probability: common for probability in range(low, high + 1)}
+    weights[BUSY_PROBABILITY] = weights.get(BUSY_PROBABILITY, 0) + 0.5 / UNCOMMON_ODDS
+    weights[SPECIAL_EVENT_PROBABILITY] = weights.get(SPECIAL_EVENT_PROBABILITY, 0) + 0.5 / UNCOMMON_ODDS
+    return weights
+
+
+class StarfieldGenerator():
+    """
+    Generates randomized space grids.
+
+    Attributes:
+        rng (Random): The random number generator used for every roll.
+        width (int): Number of cells in a row of the generated grids.
+        height (int): Number of rows of the generated grids.
+
+    Methods:
+        roll_probability(): Rolls the object probability of a new map.
+        generate(probability): Generates a single space grid.
+        generate_map(): Generates a space grid and rolls its special event.
+        generate_batch(count): Generates several space grids at once.
+    """
+    def __init__(self, rng=None, width=SIZE_OF_SPACE, height=NUM_OF_LINES):
+        self.rng = rng if rng is not None else Random()
+        self.width = width
+        self.height = height
+
+    def roll_probability(self) -> int:
+        """
+        Rolls the object probability of a new map. Most maps are nearly empty, one in a
+        hundred is busier and a few are dense special event fields.
+
+        Returns:
+            int: The upper bound of the per cell roll.
+        """
+        randint = self.rng.randint
+        if randint(0, UNCOMMON_ODDS - 1) != 1:
+            return randint(*COMMON_PROBABILITIES)
+        return BUSY_PROBABILITY if randint(0, 1) != 1 else SPECIAL_EVENT_PROBABILITY
+
+    def generate(self, probability=None):
+        """
+        Generates a single space grid.
+
+        Args:
+            probability (int, optional): The upper bound of the per cell roll. Rolled if not given.
+
+        Returns:
+            SpaceGrid: The generated grid.
+        """
+        if probability is None:
+            probability = self.roll_probability()
+        grid = SpaceGrid(self.width, self.height)
+        chance = object_chance(probability)
+        if chance <= 0:
+            return grid
+        place_object = grid.place_object
+        cells = grid.width * grid.height
+        random = self.rng.random
+        randrange = self.rng.randrange
+        if chance >= 1:
+            positions = range(cells)
+        else:
+            positions = self._object_positions(cells, log(1.0 - chance), random)
+        for index in positions:
+            place_object(index, SPACE_OBJECTS[randrange(len(SPACE_OBJECTS))], randrange(_NUMBER_OF_COLORS))
+        return grid
+
+    def generate_map(self):
+        """
+        Generates a space grid and rolls its special event. A special event field holds a
+        singularity in a random cell.
+
+        Returns:
+            tuple: The SpaceGrid and whether a special event occurred.
+        """
+        grid = self.generate()
+        special_event_occurred = self.roll_probability() == SPECIAL_EVENT_PROBABILITY
+        if special_event_occurred:
+            grid.place_object(self.rng.randrange(grid.width * grid.height), SINGULARITY_GLYPH, SINGULARITY_COLOR)
+        return grid, special_event_occurred
+
+    def generate_batch(self, count):
+        """
+        Generates several space grids at once, each with its own rolled probability and special event.
+
+        Args:
+            count (int): Number of grids to generate.
+
+        Returns:
+            list: A list of (SpaceGrid, bool) tuples holding each grid and whether a special event occurred.
+        """
+        return [self.generate_map() for _ in range(count)]
+
+    @staticmethod
+    def _object_positions(cells, log_miss, random):
+        """
+        Yields the cells that become space objects by skipping geometric gaps.
+
+        Args:
+            cells (int): Number of cells in the grid.
+            log_miss (float): Natural log of the chance that a cell stays empty.
+            random (callable): Returns uniform floats in [0, 1).
+
+        Yields:
+            int: Index of the next cell holding a space object.
+        """
+        index = -1
+        while True:
+            index += 1 + floor(log(1.0 - random()) / log_miss)
+            if index >= cells:
+                return
+            yield index
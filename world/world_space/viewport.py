@@ -0,0 +1,147 @@
+"""
+Viewports onto large sectors.
+
+A viewport shows a window of a sector centred on the looker's ship, sized to the
+looker's terminal. It keeps the cells of the window it last drew, so when the ship
+moves only the strip of cells that scrolls into view is copied from the grid and the
+cost of a redraw depends on the terminal size rather than the sector size. The
+finished text is kept per format until the window, the ship or the map changes.
+"""
+from world.world_space.spacegrid import BORDER_COLOR
+from world.world_space.render import compact_cells, convert_markup
+
+SHIP_TOKEN = "|555^"  # Drawn on top of the cell holding the looker's ship
+
+
+class Viewport():
+    """
+    A window onto a SpaceGrid.
+
+    Attributes:
+        height (int): Number of rows shown.
+        width (int): Number of cells shown in a row.
+        top (int): Grid row shown in the first row of the window.
+        left (int): Grid column shown in the first column of the window.
+        rows (list): The (colors, glyphs) of every row in the window.
+        grid (SpaceGrid): The grid the rows were copied from.
+        version (int): The version of the grid the rows were copied from.
+        ship (tuple): The cell the ship was drawn in.
+        output (dict): The rendered window keyed by format.
+
+    Methods:
+        origin_for(grid, row, col): Returns the window position centred on a cell.
+        render(grid, row, col, fmt): Renders the window centred on a cell.
+    """
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.top = 0
+        self.left = 0
+        self.rows = None
+        self.grid = None
+        self.version = None
+        self.ship = None
+        self.output = {}
+
+    def origin_for(self, grid, row, col):
+        """
+        Returns the window position centred on a cell, kept inside the grid.
+
+        Args:
+            grid (SpaceGrid): The grid to show.
+            row (int): Row to centre on.
+            col (int): Column to centre on.
+
+        Returns:
+            tuple: The top row and left column of the window.
+        """
+        top = min(max(row - self.height // 2, 0), max(grid.height - self.height, 0))
+        left = min(max(col - self.width // 2, 0), max(grid.width - self.width, 0))
+        return top, left
+
+    def render(self, grid, row, col, fmt="markup"):
+        """
+        Renders the window centred on a cell, with the ship drawn in that cell. If the
+        grid has not changed since the last render only the cells that scrolled into
+        view are copied from it.
+
+        Args:
+            grid (SpaceGrid): The grid to show.
+            row (int): Row of the ship.
+            col (int): Column of the ship.
+            fmt (str, optional): The output format, see world.world_space.render.FORMATS.
+
+        Returns:
+            str: The rendered window, including the border.
+        """
+        height, width = min(self.height, grid.height), min(self.width, grid.width)
+        top, left = self.origin_for(grid, row, col)
+        grid_changed = self.grid is not grid or self.version != grid.version
+        if self.rows is None or grid_changed or len(self.rows) != height or len(self.rows[0][0]) != width:
+            self.rows = [self._cells(grid, top + offset, left, left + width) for offset in range(height)]
+        elif (top, left) != (self.top, self.left):
+            self._pan(grid, top, left, height, width)
+        if grid_changed or (top, left) != (self.top, self.left) or self.ship != (row, col):
+            self.output = {}
+        self.top, self.left = top, left
+        self.grid, self.version = grid, grid.version
+        self.ship = (row, col)
+
+        rendered = self.output.get(fmt)
+        if rendered is None:
+            markup = self.output.get("markup")
+            if markup is None:
+                markup = self.output["markup"] = self._markup(row - top, col - left, width)
+            rendered = self.output[fmt] = convert_markup(markup, fmt)
+        return rendered
+
+    def _markup(self, ship_row, ship_col, width):
+        """
+        Renders the colour markup of the cached window with the ship drawn in its cell.
+        """
+        lines = [BORDER_COLOR + "0" + "-" * width + "0"]
+        for offset, (colors, glyphs) in enumerate(self.rows):
+            if offset == ship_row and 0 <= ship_col < width:
+                cells = (
+                    compact_cells(colors[:ship_col], glyphs[:ship_col])
+                    + SHIP_TOKEN
+                    + compact_cells(colors[ship_col + 1:], glyphs[ship_col + 1:], current=SHIP_TOKEN[:-1])
+                )
+            else:
+                cells = compact_cells(colors, glyphs)
+            lines.append(BORDER_COLOR + "!" + cells + BORDER_COLOR + "!")
+        lines.append(BORDER_COLOR + "0" + "-" * width + "0|n")
+        return "\n".join(lines)
+
+    def _pan(self, grid, top, left, height, width):
+        """
+        Moves the cached window to a new position, copying only the cells that scroll into view.
+        """
+        shift_rows, shift_cols = top - self.top, left - self.left
+        if abs(shift_rows) >= height or abs(shift_cols) >= width:
+            self.rows = [self._cells(grid, top + offset, left, left + width) for offset in range(height)]
+            return
+        if shift_cols > 0:
+            for offset, (colors, glyphs) in enumerate(self.rows):
+                new_colors, new_glyphs = self._cells(grid, self.top + offset, self.left + width, left + width)
+                self.rows[offset] = (colors[shift_cols:] + new_colors, glyphs[shift_cols:] + new_glyphs)
+        elif shift_cols < 0:
+            for offset, (colors, glyphs) in enumerate(self.rows):
+                new_colors, new_glyphs = self._cells(grid, self.top + offset, left, self.left)
+                self.rows[offset] = (new_colors + colors[:shift_cols], new_glyphs + glyphs[:shift_cols])
+        if shift_rows > 0:
+            self.rows = self.rows[shift_rows:] + [
+                self._cells(grid, grid_row, left, left + width) for grid_row in range(self.top + height, top + height)
+            ]
+        elif shift_rows < 0:
+            self.rows = [
+                self._cells(grid, grid_row, left, left + width) for grid_row in range(top, self.top)
+            ] + self.rows[:shift_rows]
+
+    @staticmethod
+    def _cells(grid, row, start, end):
+        """
+        Copies the colours and glyphs of the cells from start up to end in a grid row.
+        """
+        offset = row * grid.width
+        return bytes(grid.colors[offset + start:offset + end]), grid.glyphs[offset + start:offset + end].decode("ascii")